@@ -14,6 +14,7 @@ import WeatherWidget from "./components/WeatherWidget";
 import MapWidget from "./components/MapWidget";
 import CodeExecutionWidget from "./components/CodeExecutionWidget";
 import SearchResultsWidget from "./components/SearchResultsWidget"; // **** IMPORT NEW WIDGET ****
+import { WIRE_CODECS, createWireDecoder } from "./wireCodec";
 
 // Import CSS
 import "./App.css";
@@ -158,14 +159,18 @@ function App() {
     isPlaying.current = true;
     setVisualizerStatus(VISUALIZER_STATUS.SPEAKING);
     setStatusText("Ada is speaking...");
-    const base64Chunk = audioQueue.current.shift();
+    const audioChunk = audioQueue.current.shift();
 
     try {
-      const binaryString = window.atob(base64Chunk);
-      const len = binaryString.length;
-      const bytes = new Uint8Array(len);
-      for (let i = 0; i < len; i++) {
-        bytes[i] = binaryString.charCodeAt(i);
+      let bytes = audioChunk; // Raw PCM bytes with the msgpack wire codec
+      if (typeof audioChunk === "string") {
+        // JSON wire codec: base64 string
+        const binaryString = window.atob(audioChunk);
+        const len = binaryString.length;
+        bytes = new Uint8Array(len);
+        for (let i = 0; i < len; i++) {
+          bytes[i] = binaryString.charCodeAt(i);
+        }
       }
       // Assuming PCM 16-bit signed little-endian (common from ElevenLabs pcm_24000)
       const pcmData = new Int16Array(bytes.buffer);
@@ -495,7 +500,10 @@ function App() {
     socket.current = io(SERVER_URL, {
       reconnectionAttempts: 5, // Try to reconnect a few times
       transports: ["websocket"], // Prefer WebSocket
+      auth: { codecs: WIRE_CODECS }, // Server answers with a wire_codec event
     });
+    // Payloads may arrive as msgpack packets; decode them in arrival order
+    const decoded = createWireDecoder();
 
     // --- Socket Event Handlers ---
     const handleConnect = () => {
@@ -509,6 +517,10 @@ function App() {
       if (!isMutedRef.current && startRecognitionRef.current) {
         startRecognitionRef.current();
       }
+      // Let the server open its upstream connections before the first turn
+      if (!isMutedRef.current) {
+        socket.current.emit("client_ready");
+      }
     };
 
     const handleDisconnect = (reason) => {
@@ -649,18 +661,33 @@ function App() {
       }
     };
 
+    const handleWireCodec = (data) => {
+      console.log("Server wire codec:", data?.codec);
+    };
+
+    // Decoding wrappers, kept so the same references can be removed on cleanup
+    const onStatus = decoded(handleStatus);
+    const onError = decoded(handleErrorEvent);
+    const onTextChunk = decoded(handleTextChunk);
+    const onAudioChunk = decoded(handleAudioChunk);
+    const onWeatherUpdate = decoded(handleWeatherUpdate);
+    const onMapUpdate = decoded(handleMapUpdate);
+    const onExecutableCode = decoded(handleExecutableCode);
+    const onSearchResultsUpdate = decoded(handleSearchResultsUpdate);
+
     // --- Assign Socket Listeners ---
     socket.current.on("connect", handleConnect);
     socket.current.on("disconnect", handleDisconnect);
     socket.current.on("connect_error", handleConnectError);
-    socket.current.on("status", handleStatus);
-    socket.current.on("error", handleErrorEvent);
-    socket.current.on("receive_text_chunk", handleTextChunk);
-    socket.current.on("receive_audio_chunk", handleAudioChunk);
-    socket.current.on("weather_update", handleWeatherUpdate); // Listen for weather
-    socket.current.on("map_update", handleMapUpdate); // Listen for map
-    socket.current.on("executable_code_received", handleExecutableCode); // Listen for code
-    socket.current.on("search_results_update", handleSearchResultsUpdate); // Listen for search results
+    socket.current.on("wire_codec", handleWireCodec);
+    socket.current.on("status", onStatus);
+    socket.current.on("error", onError);
+    socket.current.on("receive_text_chunk", onTextChunk);
+    socket.current.on("receive_audio_chunk", onAudioChunk);
+    socket.current.on("weather_update", onWeatherUpdate); // Listen for weather
+    socket.current.on("map_update", onMapUpdate); // Listen for map
+    socket.current.on("executable_code_received", onExecutableCode); // Listen for code
+    socket.current.on("search_results_update", onSearchResultsUpdate); // Listen for search results
 
     // --- Cleanup Function ---
     return () => {
@@ -670,14 +697,15 @@ function App() {
         socket.current.off("connect", handleConnect);
         socket.current.off("disconnect", handleDisconnect);
         socket.current.off("connect_error", handleConnectError);
-        socket.current.off("status", handleStatus);
-        socket.current.off("error", handleErrorEvent);
-        socket.current.off("receive_text_chunk", handleTextChunk);
-        socket.current.off("receive_audio_chunk", handleAudioChunk);
-        socket.current.off("weather_update", handleWeatherUpdate);
-        socket.current.off("map_update", handleMapUpdate);
-        socket.current.off("executable_code_received", handleExecutableCode);
-        socket.current.off("search_results_update", handleSearchResultsUpdate);
+        socket.current.off("wire_codec", handleWireCodec);
+        socket.current.off("status", onStatus);
+        socket.current.off("error", onError);
+        socket.current.off("receive_text_chunk", onTextChunk);
+        socket.current.off("receive_audio_chunk", onAudioChunk);
+        socket.current.off("weather_update", onWeatherUpdate);
+        socket.current.off("map_update", onMapUpdate);
+        socket.current.off("executable_code_received", onExecutableCode);
+        socket.current.off("search_results_update", onSearchResultsUpdate);
 
         // Disconnect the socket
         socket.current.disconnect();
@@ -823,6 +851,11 @@ function App() {
     // Ensure audio context is active
     resumeAudioContext();
 
+    // Unmuting means the user is about to talk; warm up the server session
+    if (isMuted && socket.current?.connected) {
+      socket.current.emit("client_ready");
+    }
+
     // Update state - the useEffect for isMuted will handle starting/stopping recognition
     setIsMuted((prevMuted) => !prevMuted);
 
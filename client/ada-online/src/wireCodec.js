@@ -0,0 +1,123 @@
+// src/wireCodec.js
+// Decodes server events sent with the compact "msgpack" wire codec
+// (server/wire_codec.py). JSON events pass through untouched.
+
+// Offered to the server on connect, in order of preference
+export const WIRE_CODECS = ["msgpack", "json"];
+
+const PACKET_PLAIN = 0x00;
+const PACKET_DEFLATE = 0x01; // zlib stream follows
+
+const textDecoder = new TextDecoder();
+
+// Minimal MessagePack decoder covering everything msgpack.packb produces
+// for our payloads: nil, bool, ints, floats, str, bin, arrays and maps.
+function unpack(bytes) {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let offset = 0;
+
+  const str = (length) => {
+    const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+    offset += length;
+    return value;
+  };
+  const bin = (length) => {
+    const value = bytes.slice(offset, offset + length); // Copy so the buffer is aligned for Int16Array
+    offset += length;
+    return value;
+  };
+  const array = (length) => {
+    const value = new Array(length);
+    for (let i = 0; i < length; i++) value[i] = read();
+    return value;
+  };
+  const map = (length) => {
+    const value = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      value[key] = read();
+    }
+    return value;
+  };
+  const u8 = () => view.getUint8(offset++);
+  const u16 = () => {
+    const value = view.getUint16(offset);
+    offset += 2;
+    return value;
+  };
+  const u32 = () => {
+    const value = view.getUint32(offset);
+    offset += 4;
+    return value;
+  };
+
+  function read() {
+    const type = u8();
+    if (type <= 0x7f) return type; // positive fixint
+    if (type >= 0xe0) return type - 0x100; // negative fixint
+    if ((type & 0xf0) === 0x80) return map(type & 0x0f);
+    if ((type & 0xf0) === 0x90) return array(type & 0x0f);
+    if ((type & 0xe0) === 0xa0) return str(type & 0x1f);
+    let value;
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return bin(u8());
+      case 0xc5: return bin(u16());
+      case 0xc6: return bin(u32());
+      case 0xca: value = view.getFloat32(offset); offset += 4; return value;
+      case 0xcb: value = view.getFloat64(offset); offset += 8; return value;
+      case 0xcc: return u8();
+      case 0xcd: return u16();
+      case 0xce: return u32();
+      case 0xcf: value = Number(view.getBigUint64(offset)); offset += 8; return value;
+      case 0xd0: value = view.getInt8(offset); offset += 1; return value;
+      case 0xd1: value = view.getInt16(offset); offset += 2; return value;
+      case 0xd2: value = view.getInt32(offset); offset += 4; return value;
+      case 0xd3: value = Number(view.getBigInt64(offset)); offset += 8; return value;
+      case 0xd9: return str(u8());
+      case 0xda: return str(u16());
+      case 0xdb: return str(u32());
+      case 0xdc: return array(u16());
+      case 0xdd: return array(u32());
+      case 0xde: return map(u16());
+      case 0xdf: return map(u32());
+      default:
+        throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+  }
+
+  return read();
+}
+
+async function inflate(bytes) {
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("deflate"));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+// Returns the event payload as a plain object, whichever codec sent it
+export async function decodeWire(payload) {
+  if (!(payload instanceof ArrayBuffer || ArrayBuffer.isView(payload))) {
+    return payload; // JSON event
+  }
+  const packet = payload instanceof ArrayBuffer
+    ? new Uint8Array(payload)
+    : new Uint8Array(payload.buffer, payload.byteOffset, payload.byteLength);
+  const body = packet.subarray(1);
+  if (packet[0] === PACKET_DEFLATE) return unpack(await inflate(body));
+  if (packet[0] === PACKET_PLAIN) return unpack(body);
+  throw new Error(`Unknown wire packet type ${packet[0]}`);
+}
+
+// Wraps event handlers so decoded payloads are delivered in arrival order,
+// even when some of them need an async decompression step.
+export function createWireDecoder() {
+  let pending = Promise.resolve();
+  return (handler) => (payload) => {
+    pending = pending
+      .then(() => decodeWire(payload))
+      .then(handler)
+      .catch((e) => console.error("Error decoding server event:", e));
+  };
+}
@@ -8,6 +8,8 @@ import base64
 import websockets
 from dotenv import load_dotenv
 import google.generativeai as genai
+from frame_buffer import FrameRingBuffer
+from location_index import LocationIndex
 
 class ADA:
     def __init__(self, google_api_key, elevenlabs_api_key, maps_api_key):
@@ -17,7 +19,6 @@ class ADA:
         
         # Initialize Google Gemini
         genai.configure(api_key=self.google_api_key)
-        self.client = genai.Client(api_key=self.google_api_key)
         
         # Set up model configuration
         self.model = genai.GenerativeModel(
@@ -35,9 +36,11 @@ class ADA:
         # Initialize conversation history
         self.chat_session = self.model.start_chat(history=[])
         
-        # Video frame buffer
-        self.video_frames = []
-        self.max_frames = 5  # Keep only the most recent frames
+        # Video frame buffer (recent frames scored by sharpness)
+        self.video_frames = FrameRingBuffer(max_frames=5)
+        
+        # Place aliases learned from directions; keys this instance's lookups into the shared cache
+        self.location_index = LocationIndex()
         
         # ElevenLabs WebSocket
         self.tts_websocket = None
@@ -144,12 +147,8 @@ class ADA:
             # Decode base64 image
             image_bytes = base64.b64decode(frame_data)
             
-            # Add to frame buffer
-            self.video_frames.append(image_bytes)
-            
-            # Keep only the most recent frames
-            if len(self.video_frames) > self.max_frames:
-                self.video_frames.pop(0)
+            # Add to frame buffer (oldest frames fall off automatically)
+            self.video_frames.add(image_bytes)
             
             return True
         except Exception as e:
@@ -162,9 +161,10 @@ class ADA:
             # Include video frames if available
             content_parts = [text]
             
-            # Add the most recent video frame if available
-            if self.video_frames:
-                content_parts.append(self.video_frames[-1])
+            # Add the sharpest recent video frame if available
+            best_frame = self.video_frames.best()
+            if best_frame:
+                content_parts.append(best_frame[1])
             
             # Generate response
             response = self.chat_session.send_message(content_parts)
@@ -211,13 +211,16 @@ class ADA:
         """Execute the get_weather function"""
         import python_weather
         import asyncio
+        from place_services import get_weather_service
         
         location = args.get("location", "New York")
+        weather_service = get_weather_service() # Cached per normalized place across calls
         
         async def get_weather_async():
-            client = python_weather.Client()
-            weather = await client.get(location)
-            await client.close()
+            try:
+                weather = await weather_service.get(location, unit=python_weather.METRIC)
+            finally:
+                await weather_service.close() # The client can't outlive this asyncio.run() loop
             
             current = weather.current
             result = {
@@ -233,7 +236,7 @@ class ADA:
     
     def _execute_get_travel_duration(self, args):
         """Execute the get_travel_duration function"""
-        import googlemaps
+        from place_services import get_maps_service
         
         origin = args.get("origin", "")
         destination = args.get("destination", "")
@@ -242,8 +245,10 @@ class ADA:
             return {"error": "Origin and destination are required"}
         
         try:
-            gmaps = googlemaps.Client(key=self.maps_api_key)
-            directions = gmaps.directions(origin, destination)
+            maps_service = get_maps_service(self.maps_api_key) # Shared client and directions cache
+            if maps_service is None:
+                return {"error": "Invalid Google Maps API key"}
+            directions = maps_service.directions(origin, destination, index=self.location_index)
             
             if not directions:
                 return {"error": "No directions found"}
@@ -269,7 +274,7 @@ class ADA:
     
     def _execute_search_web(self, args):
         """Execute the search_web function"""
-        from googlesearch import search
+        from search_providers import get_search_provider
         import aiohttp
         from bs4 import BeautifulSoup
         import asyncio
@@ -281,9 +286,7 @@ class ADA:
         
         try:
             # Get search results
-            search_results = []
-            for j in search(query, num=5, stop=5, pause=1):
-                search_results.append(j)
+            search_results = asyncio.run(get_search_provider().search(query, num_results=5))
             
             # Extract content from each URL
             results = []
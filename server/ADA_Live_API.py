@@ -4,13 +4,23 @@ import websockets
 import json
 import base64
 import torch
-import python_weather
 import asyncio
 from google.genai import types
 from google.genai.types import Tool, GoogleSearch, Part, Blob, Content
+from frame_pipeline import get_frame_pipeline
+from live_session import ReconnectingLiveSession
+from audio_processing import PcmResampler, VoiceActivityGate, SEND_SAMPLE_RATE
+from wire_codec import get_codec
+from genai_clients import get_genai_client
+from session_limits import (ByteBudget, BudgetedQueue, compact_history, restore_history, BLOCK, DROP_OLDEST, COALESCE,
+                            INPUT_QUEUE_SIZE, RESPONSE_QUEUE_SIZE)
+from outbound import OutboundScheduler, TextBatcher, AUDIO, TEXT, BULK
+from place_services import get_weather_service, get_maps_service
+from location_index import LocationIndex
+from resilience import ClientLimits, get_upstream, RateLimitedError
+from deadlines import Deadline, run_tool
 import asyncio
 from google import genai 
-import googlemaps
 from datetime import datetime 
 import os
 from dotenv import load_dotenv
@@ -30,13 +40,27 @@ CHANNELS = 1
 RECEIVE_SAMPLE_RATE = 24000
 CHUNK_SIZE = 1024
 MAX_QUEUE_SIZE = 10
+TTS_INACTIVITY_TIMEOUT = 180 # Seconds ElevenLabs keeps an unused socket open (its maximum)
+TTS_MIN_CONNECTION_SECONDS = 2 # Shorter-lived TTS connections count as failures and back off
+AUDIO_INPUT_QUEUE_SIZE = 50 # Mic chunks buffered while the session is busy or reconnecting
+MIC_VAD = os.getenv("ADA_MIC_VAD", "1") != "0" # Only forward speech from streamed mic audio
+
+# "elevenlabs": Gemini answers in text and ElevenLabs speaks it (default)
+# "native": Gemini streams its own PCM audio plus transcripts, no second hop
+AUDIO_MODE = os.getenv("ADA_AUDIO_MODE", "elevenlabs")
+NATIVE_VOICE_NAME = os.getenv("ADA_NATIVE_VOICE") # Optional prebuilt Gemini voice, e.g. "Kore"
+AUDIO_MODES = ("elevenlabs", "native")
 
 class ADA:
-    def __init__(self, socketio_instance=None, client_sid=None):
+    def __init__(self, socketio_instance=None, client_sid=None, audio_mode=AUDIO_MODE, wire_codec="json"):
         # --- Initialization ---
         print("initializing ADA for web...")
         self.socketio = socketio_instance
         self.client_sid = client_sid
+        if audio_mode not in AUDIO_MODES:
+            print(f"Error: Unknown audio mode '{audio_mode}', using 'elevenlabs'.")
+            audio_mode = "elevenlabs"
+        self.audio_mode = audio_mode
         self.Maps_api_key = MAPS_API_KEY
 
         if torch.cuda.is_available():
@@ -46,7 +70,7 @@ class ADA:
             self.device = "cpu"
             print("CUDA is not available. Using CPU.")
 
-        self.client = genai.Client(api_key=GOOGLE_API_KEY, http_options={'api_version': 'v1beta'})
+        self.client = get_genai_client(GOOGLE_API_KEY, 'v1beta') # Shared by every session in this process
         self.model = "gemini-2.0-flash-live-001" # Or your chosen model
 
         # --- Function Declarations (Keep as before) ---
@@ -96,7 +120,12 @@ class ADA:
             system_instruction=types.Content(
                 parts=[types.Part(text=self.system_behavior)]
             ),
-            response_modalities=["TEXT"],
+            response_modalities=["AUDIO"] if self.audio_mode == "native" else ["TEXT"],
+            # Transcripts of native audio feed the chat pane and the replay history
+            output_audio_transcription=types.AudioTranscriptionConfig() if self.audio_mode == "native" else None,
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=NATIVE_VOICE_NAME))
+            ) if self.audio_mode == "native" and NATIVE_VOICE_NAME else None,
             # ---> ADD the new function declaration to the tools list <---
             tools=[self.google_search_tool, types.Tool(code_execution=types.ToolCodeExecution,function_declarations=[
                 self.get_weather_func,
@@ -106,71 +135,91 @@ class ADA:
         # --- End Configuration ---
 
         # Queues and tasks
-        self.latest_video_frame_data_url = None # If using single-frame logic
-        self.video_frame_queue = asyncio.Queue(maxsize=MAX_QUEUE_SIZE) # If using streaming logic
-        self.input_queue = asyncio.Queue()
-        self.response_queue = asyncio.Queue()
-        self.audio_output_queue = asyncio.Queue()
+        self.byte_budget = ByteBudget() # Hard cap on bytes queued across this session's queues
+        self.video_frame_queue = BudgetedQueue(self.byte_budget, MAX_QUEUE_SIZE, DROP_OLDEST) # Only recent frames matter
+        self.frame_pipeline = get_frame_pipeline() # Shared resize/re-encode worker pool
+        # Every stage is bounded; a full queue blocks, drops its oldest item or merges text (see BudgetedQueue)
+        self.input_queue = BudgetedQueue(self.byte_budget, INPUT_QUEUE_SIZE, BLOCK) # Holds back further client input
+        self.response_queue = BudgetedQueue(self.byte_budget, RESPONSE_QUEUE_SIZE, COALESCE) # Slow TTS merges text, then stalls the model stream
+        self.audio_input_queue = BudgetedQueue(self.byte_budget, AUDIO_INPUT_QUEUE_SIZE, DROP_OLDEST) # 16 kHz mic PCM for Gemini
+        self.hibernated_history = None # Compressed history while hibernating
+        self.audio_resampler = None # Created for the client's mic sample rate
+        self.vad = VoiceActivityGate(sample_rate=SEND_SAMPLE_RATE) if MIC_VAD else None
 
         self.gemini_session = None
+        # Reconnecting wrapper around the live connection; senders await its connected state
+        self.live_session = ReconnectingLiveSession(self.client, self.model, self.config, status_callback=self.emit_status,
+                                                    upstream=get_upstream("gemini"))
         self.tts_websocket = None
+        # Prioritized emits to this client: audio, then text, then widget payloads
+        self.outbound = OutboundScheduler(socketio_instance, client_sid, codec=get_codec(wire_codec))
+        self.text_batcher = TextBatcher(self.outbound) # Coalesces text deltas into fewer emits
+        self.rate_limits = ClientLimits() # This client's share of each upstream's rate, plus the shared circuit breakers
+        self.weather_service = get_weather_service() # Long-lived weather client, cached per normalized place
+        self.maps_service = get_maps_service(MAPS_API_KEY) if MAPS_API_KEY else None # Shared Maps client with directions cache
+        self.location_index = LocationIndex() # Place aliases learned from this client's directions; may be user-relative
         self.tasks = []
         # --- End of __init__ ---
 
     async def get_weather(self, location: str) -> dict | None:
-        """ Fetches current weather and emits update via SocketIO. """
-        async with python_weather.Client(unit=python_weather.IMPERIAL) as client:
-            try:
-                weather = await client.get(location)
-                weather_data = {
-                    'location': location,
-                    'current_temp_f': weather.temperature,
-                    'precipitation': weather.precipitation, # Added precipitation
-                    'description': weather.description,
-                }
-                print(f"Weather data fetched: {weather_data}")
-
-                # --- Emit weather_update from here ---
-                if self.socketio and self.client_sid:
-                    print(f"--- Emitting weather_update event for SID: {self.client_sid} ---")
-                    self.socketio.emit('weather_update', weather_data, room=self.client_sid)
-                # --- End Emit ---
+        """ Fetches current weather (cached per normalized place) and emits update via SocketIO. """
+        try:
+            weather = self.weather_service.cached(location)
+            if weather is None: # Only actual lookups count against the weather rate limit
+                async with self.rate_limits.guard("weather"):
+                    weather = await self.weather_service.get(location)
+            weather_data = {
+                'location': location,
+                'current_temp_f': weather.temperature,
+                'precipitation': weather.precipitation, # Added precipitation
+                'description': weather.description,
+            }
+            print(f"Weather data fetched: {weather_data}")
+
+            # --- Emit weather_update from here ---
+            if self.socketio and self.client_sid:
+                print(f"--- Emitting weather_update event for SID: {self.client_sid} ---")
+                self._emit_widget('weather_update', weather_data, key='weather_update')
+            # --- End Emit ---
 
-                return weather_data # Still return data for Gemini
+            return weather_data # Still return data for Gemini
 
-            except Exception as e:
-                print(f"Error fetching weather for {location}: {e}")
-                return {"error": f"Could not fetch weather for {location}."} # Return error info
+        except Exception as e:
+            print(f"Error fetching weather for {location}: {e}")
+            return {"error": f"Could not fetch weather for {location}."} # Return error info
 
     def _sync_get_travel_duration(self, origin: str, destination: str, mode: str = "driving") -> str:
         # ... (Keep the full implementation of this synchronous helper function) ...
-         if not self.Maps_api_key or self.Maps_api_key == "YOUR_PROVIDED_KEY": # Check the actual key
+         if not self.maps_service or self.Maps_api_key == "YOUR_PROVIDED_KEY": # Check the actual key
             print("Error: Google Maps API Key is missing or invalid.")
             return "Error: Missing or invalid Google Maps API Key configuration."
          try:
-            gmaps = googlemaps.Client(key=self.Maps_api_key)
             now = datetime.now()
             print(f"Requesting directions: From='{origin}', To='{destination}', Mode='{mode}'")
-            directions_result = gmaps.directions(origin, destination, mode=mode, departure_time=now)
-            if directions_result:
-                leg = directions_result[0]['legs'][0]
-                duration_text = "Not available"
-                if mode == "driving" and 'duration_in_traffic' in leg:
-                    duration_text = leg['duration_in_traffic']['text']
-                    result = f"Estimated travel duration ({mode}, with current traffic): {duration_text}"
-                elif 'duration' in leg:
-                     duration_text = leg['duration']['text']
-                     result = f"Estimated travel duration ({mode}): {duration_text}"
-                else:
-                    result = f"Duration information not found in response for {mode}."
-                print(f"Directions Result: {result}")
-                return result
-            else:
-                print(f"No route found from {origin} to {destination} via {mode}.")
-                return f"Could not find a route from {origin} to {destination} via {mode}."
+            directions_result = self.maps_service.directions(origin, destination, mode=mode, departure_time=now,
+                                                            index=self.location_index)
+            return self._describe_travel_duration(directions_result, origin, destination, mode)
          except Exception as e:
             print(f"An unexpected error occurred during travel duration lookup: {e}")
-            return f"An unexpected error occurred: {e}"
+            raise # Counted against the Maps circuit breaker by the caller
+
+    def _describe_travel_duration(self, directions_result: list, origin: str, destination: str, mode: str) -> str:
+        if directions_result:
+            leg = directions_result[0]['legs'][0]
+            duration_text = "Not available"
+            if mode == "driving" and 'duration_in_traffic' in leg:
+                duration_text = leg['duration_in_traffic']['text']
+                result = f"Estimated travel duration ({mode}, with current traffic): {duration_text}"
+            elif 'duration' in leg:
+                 duration_text = leg['duration']['text']
+                 result = f"Estimated travel duration ({mode}): {duration_text}"
+            else:
+                result = f"Duration information not found in response for {mode}."
+            print(f"Directions Result: {result}")
+            return result
+        else:
+            print(f"No route found from {origin} to {destination} via {mode}.")
+            return f"Could not find a route from {origin} to {destination} via {mode}."
 
     async def get_travel_duration(self, origin: str, destination: str, mode: str = "driving") -> dict:
         """ Async wrapper to get travel duration and emit map update via SocketIO. """
@@ -179,9 +228,14 @@ class ADA:
             mode = "driving"
 
         try:
-            result_string = await asyncio.to_thread(
-                self._sync_get_travel_duration, origin, destination, mode
-            )
+            cached = self.maps_service.cached(origin, destination, mode, self.location_index) if self.maps_service else None
+            if cached is not None: # Never call Maps on the event loop, even if the entry expires meanwhile
+                result_string = self._describe_travel_duration(cached, origin, destination, mode)
+            else:
+                async with self.rate_limits.guard("maps"):
+                    result_string = await asyncio.to_thread(
+                        self._sync_get_travel_duration, origin, destination, mode
+                    )
 
             # --- Emit map_update from here ---
             if self.socketio and self.client_sid and not result_string.startswith("Error"): # Only emit if successful
@@ -190,7 +244,7 @@ class ADA:
                     'origin': origin
                 }
                 print(f"--- Emitting map_update event for SID: {self.client_sid} ---")
-                self.socketio.emit('map_update', map_payload, room=self.client_sid)
+                self._emit_widget('map_update', map_payload, key='map_update')
             # --- End Emit ---
 
             return {"duration_result": result_string} # Still return result for Gemini
@@ -200,7 +254,7 @@ class ADA:
             return {"duration_result": f"Failed to execute travel duration request: {e}"}
 
     async def clear_queues(self, text=""):
-        queues_to_clear = [self.response_queue, self.audio_output_queue]
+        queues_to_clear = [self.response_queue]
         # Add self.video_frame_queue back if using streaming logic
         # queues_to_clear.append(self.video_frame_queue)
         for q in queues_to_clear:
@@ -213,17 +267,59 @@ class ADA:
         print(f"Processing input: '{message}', Final Turn: {is_final_turn_input}")
         if is_final_turn_input:
              await self.clear_queues() # Clear only before final input
-        await self.input_queue.put((message, is_final_turn_input))
+        if not await self.input_queue.put((message, is_final_turn_input)):
+            print(f"Input rejected for SID {self.client_sid}: session byte budget exhausted.")
+            if self.socketio and self.client_sid:
+                self.outbound.emit('error', {'message': 'Too much pending input; please try again.'}, TEXT)
+
+    def _client_backed_up(self) -> bool:
+        """ Speech or text to this client is backing up; optional work is skipped until it drains. """
+        return self.outbound.congested(AUDIO) or self.outbound.congested(TEXT)
+
+    def _emit_widget(self, event, data, key=None):
+        """ Queues an optional widget payload, unless the client's link is backed up. """
+        if self._client_backed_up():
+            print(f"Skipping {event} for SID {self.client_sid}: client link congested.")
+            return
+        self.outbound.emit(event, data, BULK, key=key)
 
     async def process_video_frame(self, frame_data_url):
         """ Processes incoming video frame data URL """
-        if self.video_frame_queue.full():
+        if self._client_backed_up():
+            return # Frames are optional; don't spend time on them while replies queue up
+        await self.video_frame_queue.put(frame_data_url) # Replaces the oldest frame when full
+
+    async def process_audio_chunk(self, pcm: bytes, sample_rate: int = SEND_SAMPLE_RATE):
+        """ Resamples a mic PCM chunk from the client to 16 kHz and queues it for the live session. """
+        if not pcm:
+            return
+        if sample_rate != SEND_SAMPLE_RATE:
+            if not self.audio_resampler or self.audio_resampler.src_rate != sample_rate:
+                self.audio_resampler = PcmResampler(sample_rate, SEND_SAMPLE_RATE)
+            pcm = self.audio_resampler.process(pcm)
+        items = self.vad.process(pcm) if self.vad else [pcm]
+        for item in items:
+            self.audio_input_queue.put_nowait(item) # Drops the oldest audio rather than grow without bound
+
+    async def run_audio_sender(self):
+        """ Streams queued mic audio into the live session as realtime input. """
+        print("Audio input sender task running...")
+        while True:
             try:
-                self.video_frame_queue.get_nowait() # Discard oldest
-                print("video")
-            except asyncio.QueueEmpty:
-                pass
-        await self.video_frame_queue.put(frame_data_url)
+                pcm = await self.audio_input_queue.get()
+                if pcm is VoiceActivityGate.END:
+                    audio_input = types.LiveClientRealtimeInput(audio_stream_end=True) # End of speech segment
+                else:
+                    audio_input = {"data": pcm, "mime_type": f"audio/pcm;rate={SEND_SAMPLE_RATE}"}
+                sent = await self.live_session.send(audio_input, end_of_turn=False)
+                self.audio_input_queue.task_done()
+                if not sent:
+                    break
+            except asyncio.CancelledError:
+                print("Audio input sender task cancelled.")
+                break
+            except Exception as e:
+                print(f"Error sending audio chunk to Gemini: {e}")
 
     async def clear_video_queue(self):
         """ Clears any remaining frames from the video queue. """
@@ -247,22 +343,23 @@ class ADA:
         print("Video frame sender task running...")
         while True:
             try:
-                if not self.gemini_session:
-                     await asyncio.sleep(0.1) # Short wait if session not ready
-                     continue
-
                 frame_data_url = await self.video_frame_queue.get()
 
                 try:
                     header, encoded = frame_data_url.split(",", 1)
                     frame_bytes = base64.b64decode(encoded)
+                    frame = await self.frame_pipeline.process(frame_bytes)
+                    if frame is None: # Pipeline saturated, skip this frame
+                        self.video_frame_queue.task_done()
+                        continue
                     frame_input = {
-                        "data": frame_bytes,      # Send raw bytes
-                        "mime_type": "image/jpeg" # Assuming JPEG from frontend
+                        "data": frame.data,          # Send normalized raw bytes
+                        "mime_type": frame.mime_type
                     }
-                    # Send frame dictionary WITHOUT marking end of turn
-                    await self.gemini_session.send(input=frame_input, end_of_turn=False)
-                    print("Frame sent to Gemini.") # Verbose
+                    # Blocks until the session is connected; False means it closed for good
+                    if not await self.live_session.send(frame_input, end_of_turn=False):
+                        self.video_frame_queue.task_done()
+                        break
                 except ValueError:
                     print(f"Error splitting frame data URL: {frame_data_url[:100]}...") # Log prefix
                 except base64.binascii.Error as b64_error:
@@ -277,121 +374,173 @@ class ADA:
                 break
             except Exception as e:
                 print(f"Error in video frame sender loop: {e}")
-                await asyncio.sleep(1) # Avoid tight loop on errors
-
-    async def run_gemini_session(self):
-        """Manages the Gemini conversation session, handling text, video, and tool calls."""
-        print("Starting Gemini session manager...")
-        try:
-            async with self.client.aio.live.connect(model=self.model, config=self.config) as session:
-                self.gemini_session = session
-                print("Gemini session connected.")
-
-                video_sender_task = asyncio.create_task(self.run_video_sender())
-                # Add task immediately to ensure it's managed if session setup fails later
-                self.tasks.append(video_sender_task)
-                print("Video sender task started.")
-
-                while True: # Loop to process text inputs
-                    message, is_final_turn_input = await self.input_queue.get()
+        print("Video frame sender finished.")
 
-                    if not self.gemini_session: # Check session validity
-                        print("Gemini session is not active.")
-                        self.input_queue.task_done(); continue
-
-                    if message.strip() and is_final_turn_input:
-                        print(f"Sending FINAL text input to Gemini: {message}")
-                        await self.gemini_session.send(input=message, end_of_turn=True)
-                        print("Final text message sent to Gemini, waiting for response...")
+    async def handle_tool_call(self, function_call_details, deadline: Deadline):
+        """
+        Runs one requested function within the turn's deadline and sends its
+        FunctionResponse back on the live session (a timeout or partial result
+        if it overran).
+        """
+        tool_call_id = function_call_details.id
+        tool_call_name = function_call_details.name
+        tool_call_args = dict(function_call_details.args)
 
-                        full_response_text = ""
-                        async for response in self.gemini_session.receive():
-                            try:
-                                if (response.server_content and
-                                    response.server_content.model_turn and
-                                    response.server_content.model_turn.parts and
-                                    response.server_content.model_turn.parts[0].executable_code):
-
-                                    executable_code = response.server_content.model_turn.parts[0].executable_code
-                                    code_string = executable_code.code
-                                    language = str(executable_code.language) # Get language as string
-                                    print(f"--- Received Executable Code ({language}) ---")
-                                    print(code_string)
-                                    print("------------------------------------------")
+        if tool_call_name in self.available_functions:
+            function_to_call = self.available_functions[tool_call_name]
+            function_result = await run_tool(tool_call_name, function_to_call, tool_call_args, deadline)
+        else:
+            print(f"Error: Unknown function called: {tool_call_name}")
+            function_result = {"error": f"Function {tool_call_name} not found or implemented."}
 
-                                    if self.socketio and self.client_sid:
-                                        code_payload = {
-                                            'code': code_string,
-                                            'language': language
-                                        }
-                                        print(f"--- Emitting executable_code_received event for SID: {self.client_sid} ---")
-                                        self.socketio.emit('executable_code_received', code_payload, room=self.client_sid)
-                                    continue
-                            except (AttributeError, IndexError, TypeError) as e:
-                                pass
-
-                            if response.tool_call:
-                                function_call_details = response.tool_call.function_calls[0]
-                                tool_call_id = function_call_details.id
-                                tool_call_name = function_call_details.name
-                                tool_call_args = dict(function_call_details.args)
-
-                                #print(f"--- Received Tool Call ID: {tool_call_id} ---")
-                                #print(f"--- Received Tool Call: {tool_call_name} with args: {tool_call_args} ---")
-
-                                if tool_call_name in self.available_functions:
-                                    function_to_call = self.available_functions[tool_call_name]
-                                    try:
-                                        function_result = await function_to_call(**tool_call_args)
-
-                                        func_resp = types.FunctionResponse(
-                                            id=tool_call_id,
-                                            name=tool_call_name,
-                                            response={"content": function_result} # Send back the result
-                                        )
-                                        #print(f"--- Sending Tool Response for {tool_call_name} (ID: {tool_call_id}) ---")
-                                        await self.gemini_session.send(input=func_resp, end_of_turn=False)
-
-                                    except Exception as e:
-                                        print(f"Error executing function {tool_call_name}: {e}")
-                                        break # Exit inner loop on error
-                                else:
-                                    print(f"Error: Unknown function called: {tool_call_name}")
-                                    break # Exit inner loop
+        func_resp = types.FunctionResponse(
+            id=tool_call_id,
+            name=tool_call_name,
+            response={"content": function_result} # Send back the result
+        )
+        await self.live_session.send(func_resp, end_of_turn=False)
 
-                            elif response.text: # Handle text response
-                                text_chunk = response.text
-                                if self.socketio and self.client_sid:
-                                    self.socketio.emit('receive_text_chunk', {'text': text_chunk}, room=self.client_sid)
-                                await self.response_queue.put(text_chunk)
-                                full_response_text += text_chunk
+    async def run_receiver(self, session):
+        """
+        Continuously drains session.receive(), independent of anything being sent.
+        Returns when the server asks us to go away so the session reconnects.
+        """
+        print("Gemini receive task running...")
+        self.gemini_session = session
+        tool_tasks = set()
+        turn_text = ""
+        try:
+            while True:
+                async for response in session.receive():
+                    if response.session_resumption_update:
+                        self.live_session.update_resumption(response.session_resumption_update)
+                        continue
+                    if response.go_away:
+                        print(f"Gemini asked to close the session (time left: {response.go_away.time_left}).")
+                        return
 
-                        await self.response_queue.put(None) # Signal TTS end
-                        #print("\nEnd of Gemini response stream for this turn.")
+                    try:
+                        if (response.server_content and
+                            response.server_content.model_turn and
+                            response.server_content.model_turn.parts and
+                            response.server_content.model_turn.parts[0].executable_code):
+
+                            executable_code = response.server_content.model_turn.parts[0].executable_code
+                            code_string = executable_code.code
+                            language = str(executable_code.language) # Get language as string
+                            print(f"--- Received Executable Code ({language}) ---")
+                            print(code_string)
+                            print("------------------------------------------")
+
+                            if self.socketio and self.client_sid:
+                                code_payload = {
+                                    'code': code_string,
+                                    'language': language
+                                }
+                                print(f"--- Emitting executable_code_received event for SID: {self.client_sid} ---")
+                                self._emit_widget('executable_code_received', code_payload)
+                            continue
+                    except (AttributeError, IndexError, TypeError) as e:
+                        pass
+
+                    if response.tool_call:
+                        # Run tools in their own tasks so receiving never waits on them; they share one budget
+                        deadline = Deadline()
+                        for function_call_details in response.tool_call.function_calls:
+                            task = asyncio.create_task(self.handle_tool_call(function_call_details, deadline))
+                            tool_tasks.add(task)
+                            task.add_done_callback(tool_tasks.discard)
+
+                    elif self.audio_mode == "native":
+                        # Native audio: PCM goes straight to the client, transcripts to the chat pane
+                        if response.data and self.socketio and self.client_sid:
+                            await self.outbound.send('receive_audio_chunk', {'audio': response.data}, AUDIO)
+                        server_content = response.server_content
+                        transcription = server_content.output_transcription if server_content else None
+                        if transcription and transcription.text:
+                            if self.socketio and self.client_sid:
+                                await self.text_batcher.add(transcription.text)
+                            turn_text += transcription.text
+
+                    elif response.text: # Handle text response
+                        text_chunk = response.text
+                        if self.socketio and self.client_sid:
+                            await self.text_batcher.add(text_chunk)
+                        await self.response_queue.put(text_chunk)
+                        turn_text += text_chunk
+
+                # receive() ends after turn_complete
+                await self.text_batcher.flush()
+                self.live_session.record_turn("model", turn_text)
+                turn_text = ""
+                if self.audio_mode != "native":
+                    await self.response_queue.put(None) # Signal TTS end
+        finally:
+            for task in tool_tasks:
+                task.cancel()
+            if turn_text: # Dropped mid-turn; close out what was spoken so far
+                self.text_batcher.flush_nowait()
+                self.live_session.record_turn("model", turn_text)
+                if self.audio_mode != "native":
+                    await self.response_queue.put(None)
+            self.gemini_session = None
+
+    async def run_input_sender(self):
+        """ Sends queued text inputs; responses are handled by the receive task. """
+        print("Text input sender task running...")
+        while True:
+            message, is_final_turn_input = await self.input_queue.get()
+            if message.strip() and is_final_turn_input:
+                try:
+                    await self.rate_limits.buckets["gemini"].acquire() # This client's share of the Gemini rate
+                except RateLimitedError as e:
+                    print(f"Dropping text input for SID {self.client_sid}: {e}")
+                    if self.socketio and self.client_sid:
+                        self.outbound.emit('error', {'message': f'Too many requests: {e}'}, TEXT)
+                    self.input_queue.task_done()
+                    continue
+                print(f"Sending FINAL text input to Gemini: {message}")
+                # Blocks (holding the message) while the session is reconnecting
+                if not await self.live_session.send(message, end_of_turn=True):
+                    self.input_queue.task_done()
+                    break
+                self.live_session.record_turn("user", message)
+            self.input_queue.task_done() # Mark input processed
 
-                    self.input_queue.task_done() # Mark input processed
+    def emit_status(self, message):
+        if self.socketio and self.client_sid:
+            self.outbound.emit('status', {'message': message}, TEXT)
 
+    async def run_gemini_session(self):
+        """
+        Manages the Gemini conversation session. The live connection is re-established
+        with backoff if it drops; each connection gets its own receive task.
+        """
+        print("Starting Gemini session manager...")
+        try:
+            await self.live_session.run(self.run_receiver)
         except asyncio.CancelledError:
             print("Gemini session task cancelled.")
         except Exception as e:
             print(f"Error in Gemini session manager: {e}")
             if self.socketio and self.client_sid:
-                self.socketio.emit('error', {'message': f'Gemini session error: {e}'}, room=self.client_sid)
+                self.outbound.emit('error', {'message': f'Gemini session error: {e}'}, TEXT)
         finally:
             print("Gemini session manager finished.")
-            video_task = next((t for t in self.tasks if hasattr(t, 'get_coro') and t.get_coro().__name__ == 'run_video_sender'), None)
-            if video_task and not video_task.done():
-                 print("Cancelling video sender task from Gemini session finally block.")
-                 video_task.cancel()
             self.gemini_session = None # Mark session as inactive
 
     async def run_tts_and_audio_out(self):
         print("Starting TTS and Audio Output manager...")
-        uri = f"wss://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream-input?model_id=eleven_flash_v2_5&output_format=pcm_24000"
+        uri = f"wss://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream-input?model_id=eleven_flash_v2_5&output_format=pcm_24000&inactivity_timeout={TTS_INACTIVITY_TIMEOUT}"
+        loop = asyncio.get_running_loop()
+        attempt = 0 # Consecutive failed connections, for backoff
         while True:
             try:
-                async with websockets.connect(uri) as websocket:
+                async with self.rate_limits.guard("elevenlabs"):
+                    websocket = await websockets.connect(uri)
+                async with websocket:
                     self.tts_websocket = websocket
+                    connected_at = loop.time()
                     print("ElevenLabs WebSocket Connected.")
                     await websocket.send(json.dumps({"text": " ", "voice_settings": {"stability": 0.4, "similarity_boost": 0.8, "speed": 1.1}, "xi_api_key": ELEVENLABS_API_KEY,}))
                     async def tts_listener():
@@ -402,7 +551,7 @@ class ADA:
                                 if data.get("audio"):
                                     audio_chunk = base64.b64decode(data["audio"])
                                     if self.socketio and self.client_sid:
-                                        self.socketio.emit('receive_audio_chunk', {'audio': base64.b64encode(audio_chunk).decode('utf-8')}, room=self.client_sid)
+                                        await self.outbound.send('receive_audio_chunk', {'audio': audio_chunk}, AUDIO)
                                 elif data.get('isFinal'): pass
                         except websockets.exceptions.ConnectionClosedOK: print("TTS WebSocket listener closed normally.")
                         except websockets.exceptions.ConnectionClosedError as e: print(f"TTS WebSocket listener closed error: {e}")
@@ -412,10 +561,25 @@ class ADA:
                     listener_task = asyncio.create_task(tts_listener())
                     try:
                         while True:
-                            text_chunk = await self.response_queue.get()
+                            # Wait for text, but reconnect (and re-prime) right away if the socket closes while idle
+                            next_text = asyncio.ensure_future(self.response_queue.get())
+                            await asyncio.wait({next_text, listener_task}, return_when=asyncio.FIRST_COMPLETED)
+                            if not next_text.done():
+                                next_text.cancel()
+                                print("TTS WebSocket closed while idle; reconnecting.")
+                                if loop.time() - connected_at < TTS_MIN_CONNECTION_SECONDS:
+                                    # Closed right after connecting; count it as a failure and back off
+                                    get_upstream("elevenlabs").breaker.record_failure()
+                                    await self._wait_tts_retry(attempt)
+                                    attempt += 1
+                                else:
+                                    attempt = 0
+                                break
+                            text_chunk = next_text.result()
                             if text_chunk is None:
                                 print("End of text stream signal received for TTS.")
                                 await websocket.send(json.dumps({"text": ""}))
+                                attempt = 0
                                 break
                             if text_chunk:
                                 await websocket.send(json.dumps({"text": text_chunk + " ", "generation_config": { "chunk_length_schedule": [120, 160, 250, 290] }}))
@@ -428,22 +592,48 @@ class ADA:
                                 if not listener_task.cancelled(): await asyncio.wait_for(listener_task, timeout=5.0)
                             except asyncio.TimeoutError: print("Timeout waiting for TTS listener.")
                             except asyncio.CancelledError: print("TTS listener task already cancelled.")
-            except websockets.exceptions.ConnectionClosedError as e: print(f"ElevenLabs WebSocket connection error: {e}. Reconnecting..."); await asyncio.sleep(5)
+            except websockets.exceptions.ConnectionClosedError as e: print(f"ElevenLabs WebSocket connection error: {e}. Reconnecting..."); await self._wait_tts_retry(attempt); attempt += 1
             except asyncio.CancelledError: print("TTS main task cancelled."); break
-            except Exception as e: print(f"Error in TTS main loop: {e}"); await asyncio.sleep(5)
+            except Exception as e: print(f"Error in TTS main loop: {e}"); await self._wait_tts_retry(attempt); attempt += 1
             finally:
                  if self.tts_websocket:
                      try: await self.tts_websocket.close()
                      except Exception: pass
                  self.tts_websocket = None
 
+    async def _wait_tts_retry(self, attempt):
+        """
+        Waits before reconnecting to ElevenLabs. While its circuit is open, text
+        queued for speech is discarded so replies keep streaming as text only.
+        """
+        upstream = get_upstream("elevenlabs")
+        delay = upstream.retry_delay(attempt)
+        print(f"Reconnecting to ElevenLabs in {delay:.1f}s...")
+        if not upstream.breaker.is_open:
+            await asyncio.sleep(delay)
+            return
+        try:
+            await asyncio.wait_for(self._discard_tts_text(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _discard_tts_text(self):
+        while True:
+            await self.response_queue.get()
+            self.response_queue.task_done()
+
     async def start_all_tasks(self):
         print("Starting ADA background tasks...")
         if not self.tasks:
             loop = asyncio.get_running_loop()
+            self.outbound.start()
+            self.live_session.reset() # In case a previous run closed it; history is kept
             gemini_task = loop.create_task(self.run_gemini_session())
-            tts_task = loop.create_task(self.run_tts_and_audio_out())
-            self.tasks = [gemini_task, tts_task]
+            input_task = loop.create_task(self.run_input_sender())
+            audio_task = loop.create_task(self.run_audio_sender())
+            self.tasks = [gemini_task, input_task, audio_task]
+            if self.audio_mode == "elevenlabs": # Native audio mode needs no TTS hop
+                self.tasks.append(loop.create_task(self.run_tts_and_audio_out()))
             # Add video sender task here if using streaming logic
             if hasattr(self, 'video_frame_queue'):
                video_sender_task = loop.create_task(self.run_video_sender())
@@ -452,6 +642,26 @@ class ADA:
         else:
             print("ADA tasks already running.")
 
+    def queue_stats(self) -> dict:
+        """ High-water marks and drop/merge/block counts of this session's queues. """
+        return {"input": self.input_queue.stats, "response": self.response_queue.stats,
+                "audio_input": self.audio_input_queue.stats,
+                "video": self.video_frame_queue.stats, "outbound": self.outbound.stats}
+
+    def hibernate(self):
+        """ Frees per-session memory of an idle, stopped session; wake() restores what is needed. """
+        for q in (self.video_frame_queue, self.input_queue, self.response_queue, self.audio_input_queue):
+            q.clear()
+        self.hibernated_history = compact_history(self.live_session.history)
+        self.live_session.history.clear()
+        # The server forgets the session long before a hibernated one wakes; the compacted history is replayed instead
+        self.live_session.resumption_handle = None
+        self.audio_resampler = None
+
+    def wake(self):
+        self.live_session.history.extend(restore_history(self.hibernated_history))
+        self.hibernated_history = None
+
     async def stop_all_tasks(self):
         print("Stopping ADA background tasks...")
         tasks_to_cancel = list(self.tasks)
@@ -459,9 +669,11 @@ class ADA:
             if task and not task.done(): task.cancel()
         await asyncio.gather(*[t for t in tasks_to_cancel if t], return_exceptions=True)
         self.tasks = []
+        await self.outbound.stop()
         if self.tts_websocket:
             try: await self.tts_websocket.close(code=1000)
             except Exception as e: print(f"Error closing TTS websocket during stop: {e}")
             finally: self.tts_websocket = None
         self.gemini_session = None
+        print(f"Queue stats: {self.queue_stats()}")
         print("ADA tasks stopped.")
\ No newline at end of file
@@ -2,20 +2,30 @@
 import asyncio
 import base64
 import torch
-import python_weather
 import asyncio
 from google.genai import types
 import asyncio
 from google import genai 
-import googlemaps
 from datetime import datetime 
 import os
 from dotenv import load_dotenv
 import websockets
 import json
-from googlesearch import search as Google_Search_sync
 import aiohttp # For async HTTP requests
 from bs4 import BeautifulSoup # For HTML parsing
+from frame_buffer import FrameRingBuffer, split_data_url
+from frame_pipeline import get_frame_pipeline
+from wire_codec import get_codec
+from genai_clients import get_genai_client
+from session_limits import (ByteBudget, BudgetedQueue, compact_history, restore_history, BLOCK, COALESCE,
+                            INPUT_QUEUE_SIZE, RESPONSE_QUEUE_SIZE)
+from outbound import OutboundScheduler, TextBatcher, AUDIO, TEXT, BULK
+from place_services import get_weather_service, get_maps_service
+from location_index import LocationIndex
+from resilience import ClientLimits, get_upstream, UpstreamUnavailable
+from deadlines import Deadline, run_tool
+from page_cache import get_page_cache
+from search_providers import get_search_provider
 
 load_dotenv()
 
@@ -33,11 +43,13 @@ CHANNELS = 1
 RECEIVE_SAMPLE_RATE = 24000
 CHUNK_SIZE = 1024
 MAX_QUEUE_SIZE = 1
+TTS_INACTIVITY_TIMEOUT = 180 # Seconds ElevenLabs keeps an unused socket open (its maximum)
+TTS_MIN_CONNECTION_SECONDS = 2 # Shorter-lived TTS connections count as failures and back off
 
 MODEL_ID = "eleven_flash_v2_5" # Example model - check latest recommended models
 
 class ADA:
-    def __init__(self, socketio_instance=None, client_sid=None):
+    def __init__(self, socketio_instance=None, client_sid=None, wire_codec="json"):
         # --- Initialization ---
         print("initializing ADA for web...")
         self.socketio = socketio_instance
@@ -112,74 +124,91 @@ class ADA:
             ]  # <--- End the list here
         )
 
-        self.client = genai.Client(api_key=GOOGLE_API_KEY)
+        self.client = get_genai_client(GOOGLE_API_KEY) # Shared by every session in this process
         self.model = "gemini-2.0-flash" # Or your chosen model
         self.chat = self.client.aio.chats.create(model=self.model, config=self.config)
 
         # Queues and tasks
-        self.latest_video_frame_data_url = None # If using single-frame logic
-        self.input_queue = asyncio.Queue()
-        self.response_queue = asyncio.Queue()
-        self.audio_output_queue = asyncio.Queue()
+        self.frame_buffer = FrameRingBuffer() # Recent frames scored by sharpness
+        self.frame_pipeline = get_frame_pipeline() # Shared resize/re-encode worker pool
+        self.byte_budget = ByteBudget() # Hard cap on bytes queued across this session's queues
+        # Every stage is bounded; a full queue blocks, drops its oldest item or merges text (see BudgetedQueue)
+        self.input_queue = BudgetedQueue(self.byte_budget, INPUT_QUEUE_SIZE, BLOCK) # Holds back further client input
+        self.response_queue = BudgetedQueue(self.byte_budget, RESPONSE_QUEUE_SIZE, COALESCE) # Slow TTS merges text, then stalls the model stream
+        self.hibernated_history = None # Compressed text history while hibernating
 
         self.gemini_session = None
         self.tts_websocket = None
+        # Prioritized emits to this client: audio, then text, then widget payloads
+        self.outbound = OutboundScheduler(socketio_instance, client_sid, codec=get_codec(wire_codec))
+        self.text_batcher = TextBatcher(self.outbound) # Coalesces text deltas into fewer emits
+        self.rate_limits = ClientLimits() # This client's share of each upstream's rate, plus the shared circuit breakers
+        self.weather_service = get_weather_service() # Long-lived weather client, cached per normalized place
+        self.maps_service = get_maps_service(MAPS_API_KEY) if MAPS_API_KEY else None # Shared Maps client with directions cache
+        self.location_index = LocationIndex() # Place aliases learned from this client's directions; may be user-relative
+        self.page_cache = get_page_cache() # Extracted search pages, shared on disk by all workers
+        self.search_provider = get_search_provider() # Configured async search backend, with caching
         self.tasks = []
         # --- End of __init__ ---
 
     async def get_weather(self, location: str) -> dict | None:
-        """ Fetches current weather and emits update via SocketIO. """
-        async with python_weather.Client(unit=python_weather.IMPERIAL) as client:
-            try:
-                weather = await client.get(location)
-                weather_data = {
-                    'location': location,
-                    'current_temp_f': weather.temperature,
-                    'precipitation': weather.precipitation, # Added precipitation
-                    'description': weather.description,
-                }
-                print(f"Weather data fetched: {weather_data}")
-
-                # --- Emit weather_update from here ---
-                if self.socketio and self.client_sid:
-                    print(f"--- Emitting weather_update event for SID: {self.client_sid} ---")
-                    self.socketio.emit('weather_update', weather_data, room=self.client_sid)
-                # --- End Emit ---
+        """ Fetches current weather (cached per normalized place) and emits update via SocketIO. """
+        try:
+            weather = self.weather_service.cached(location)
+            if weather is None: # Only actual lookups count against the weather rate limit
+                async with self.rate_limits.guard("weather"):
+                    weather = await self.weather_service.get(location)
+            weather_data = {
+                'location': location,
+                'current_temp_f': weather.temperature,
+                'precipitation': weather.precipitation, # Added precipitation
+                'description': weather.description,
+            }
+            print(f"Weather data fetched: {weather_data}")
+
+            # --- Emit weather_update from here ---
+            if self.socketio and self.client_sid:
+                print(f"--- Emitting weather_update event for SID: {self.client_sid} ---")
+                self._emit_widget('weather_update', weather_data, key='weather_update')
+            # --- End Emit ---
 
-                return weather_data # Still return data for Gemini
+            return weather_data # Still return data for Gemini
 
-            except Exception as e:
-                print(f"Error fetching weather for {location}: {e}")
-                return {"error": f"Could not fetch weather for {location}."} # Return error info
+        except Exception as e:
+            print(f"Error fetching weather for {location}: {e}")
+            return {"error": f"Could not fetch weather for {location}."} # Return error info
 
     def _sync_get_travel_duration(self, origin: str, destination: str, mode: str = "driving") -> str:
-         if not self.Maps_api_key or self.Maps_api_key == "YOUR_PROVIDED_KEY": # Check the actual key
+         if not self.maps_service or self.Maps_api_key == "YOUR_PROVIDED_KEY": # Check the actual key
             print("Error: Google Maps API Key is missing or invalid.")
             return "Error: Missing or invalid Google Maps API Key configuration."
          try:
-            gmaps = googlemaps.Client(key=self.Maps_api_key)
             now = datetime.now()
             print(f"Requesting directions: From='{origin}', To='{destination}', Mode='{mode}'")
-            directions_result = gmaps.directions(origin, destination, mode=mode, departure_time=now)
-            if directions_result:
-                leg = directions_result[0]['legs'][0]
-                duration_text = "Not available"
-                if mode == "driving" and 'duration_in_traffic' in leg:
-                    duration_text = leg['duration_in_traffic']['text']
-                    result = f"Estimated travel duration ({mode}, with current traffic): {duration_text}"
-                elif 'duration' in leg:
-                     duration_text = leg['duration']['text']
-                     result = f"Estimated travel duration ({mode}): {duration_text}"
-                else:
-                    result = f"Duration information not found in response for {mode}."
-                print(f"Directions Result: {result}")
-                return result
-            else:
-                print(f"No route found from {origin} to {destination} via {mode}.")
-                return f"Could not find a route from {origin} to {destination} via {mode}."
+            directions_result = self.maps_service.directions(origin, destination, mode=mode, departure_time=now,
+                                                            index=self.location_index)
+            return self._describe_travel_duration(directions_result, origin, destination, mode)
          except Exception as e:
             print(f"An unexpected error occurred during travel duration lookup: {e}")
-            return f"An unexpected error occurred: {e}"
+            raise # Counted against the Maps circuit breaker by the caller
+
+    def _describe_travel_duration(self, directions_result: list, origin: str, destination: str, mode: str) -> str:
+        if directions_result:
+            leg = directions_result[0]['legs'][0]
+            duration_text = "Not available"
+            if mode == "driving" and 'duration_in_traffic' in leg:
+                duration_text = leg['duration_in_traffic']['text']
+                result = f"Estimated travel duration ({mode}, with current traffic): {duration_text}"
+            elif 'duration' in leg:
+                 duration_text = leg['duration']['text']
+                 result = f"Estimated travel duration ({mode}): {duration_text}"
+            else:
+                result = f"Duration information not found in response for {mode}."
+            print(f"Directions Result: {result}")
+            return result
+        else:
+            print(f"No route found from {origin} to {destination} via {mode}.")
+            return f"Could not find a route from {origin} to {destination} via {mode}."
 
     async def get_travel_duration(self, origin: str, destination: str, mode: str = "driving") -> dict:
         """ Async wrapper to get travel duration and emit map update via SocketIO. """
@@ -188,9 +217,14 @@ class ADA:
             mode = "driving"
 
         try:
-            result_string = await asyncio.to_thread(
-                self._sync_get_travel_duration, origin, destination, mode
-            )
+            cached = self.maps_service.cached(origin, destination, mode, self.location_index) if self.maps_service else None
+            if cached is not None: # Never call Maps on the event loop, even if the entry expires meanwhile
+                result_string = self._describe_travel_duration(cached, origin, destination, mode)
+            else:
+                async with self.rate_limits.guard("maps"):
+                    result_string = await asyncio.to_thread(
+                        self._sync_get_travel_duration, origin, destination, mode
+                    )
 
             # --- Emit map_update from here ---
             if self.socketio and self.client_sid and not result_string.startswith("Error"): # Only emit if successful
@@ -199,7 +233,7 @@ class ADA:
                     'origin': origin
                 }
                 print(f"--- Emitting map_update event for SID: {self.client_sid} ---")
-                self.socketio.emit('map_update', map_payload, room=self.client_sid)
+                self._emit_widget('map_update', map_payload, key='map_update')
             # --- End Emit ---
 
             return {"duration_result": result_string} # Still return result for Gemini
@@ -208,11 +242,13 @@ class ADA:
             print(f"Error calling _sync_get_travel_duration via to_thread: {e}")
             return {"duration_result": f"Failed to execute travel duration request: {e}"}
 
-    async def _fetch_and_extract_snippet(self, session, url: str) -> dict | None:
+    async def _fetch_and_extract_snippet(self, session, url: str, timeout: float = 15) -> dict | None:
         """
         Fetches HTML from a URL, extracts title, meta description,
         and concatenates text from paragraph tags.
-        Returns a dictionary or None on failure.
+        Returns a dictionary or None on failure. Results are served from the
+        page cache while fresh and revalidated with a conditional request
+        once stale.
         """
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -221,8 +257,19 @@ class ADA:
         snippet = "No Description Found"
         page_text_summary = "Could not extract page text." # Default value
 
+        cached = await asyncio.to_thread(self.page_cache.get, url) if self.page_cache else None
+        if cached and cached.fresh:
+            print(f"  Page cache hit for {url}")
+            return cached.result
+        if cached:
+            headers.update(cached.conditional_headers())
+
         try:
-            async with session.get(url, headers=headers, timeout=15, ssl=False) as response: # Increased timeout slightly
+            async with session.get(url, headers=headers, timeout=timeout, ssl=False) as response:
+                if response.status == 304 and cached:
+                    print(f"  Page cache revalidated {url}")
+                    await asyncio.to_thread(self.page_cache.revalidated, url, response.headers)
+                    return cached.result
                 if response.status == 200:
                     html_content = await response.text()
                     soup = BeautifulSoup(html_content, 'lxml')
@@ -263,12 +310,15 @@ class ADA:
 
                     print(f"  Extracted: Title='{title}', Snippet='{snippet[:50]}...', Text='{page_text_summary[:50]}...' from {url}")
                     # --- Return enriched dictionary ---
-                    return {
+                    result = {
                         "url": url,
                         "title": title,
                         "meta_snippet": snippet, # Renamed for clarity
                         "page_content_summary": page_text_summary # Added page text
                     }
+                    if self.page_cache:
+                        await asyncio.to_thread(self.page_cache.put, url, result, response.headers)
+                    return result
                 else:
                     print(f"  Failed to fetch {url}: Status {response.status}")
                     return None # Return None on non-200 status
@@ -284,55 +334,48 @@ class ADA:
         # Return None if any exception occurred before successful extraction
         return None
     
-    def _sync_Google_Search(self, query: str, num_results: int = 5) -> list:
-        # ... (keep the previous working version that returns URLs) ...
-        print(f"Performing synchronous Google search for: '{query}'")
-        try:
-            results = list(Google_Search_sync(term=query, num_results=num_results, lang="en", timeout=1))
-            print(f"Found {len(results)} results.")
-            return results
-        except Exception as e:
-            print(f"Error during Google search for '{query}': {e}")
-            return []
-
-# Inside the ADA class in server/ADA_Online.py
-
-    async def get_search_results(self, query: str) -> dict:
+    async def get_search_results(self, query: str, deadline: Deadline | None = None) -> dict:
         """
         Async wrapper for Google search. Fetches URLs, then retrieves
         title, meta snippet, and a summary of page paragraph text for each.
         Emits results via SocketIO.
-        Returns a dictionary containing a list of result objects.
+        Returns a dictionary containing a list of result objects. Page fetches
+        are bounded by the deadline, and pages fetched so far are kept in
+        deadline.partial in case the search is cut off.
         """
         print(f"Received request for Google search with page content fetch: '{query}'")
         fetched_results = [] # This will store dicts: {"url":..., "title":..., "meta_snippet":..., "page_content_summary":...}
         try:
-            # Step 1: Get URLs (no change)
-            search_urls = await asyncio.to_thread(
-                self._sync_Google_Search, query, num_results=5
-            )
+            # Step 1: Get URLs from the configured search provider
+            print(f"Searching with the '{self.search_provider.name}' provider for: '{query}'")
+            async with self.rate_limits.guard("search"):
+                search_urls = await self.search_provider.search(query, num_results=5)
+            print(f"Found {len(search_urls)} results.")
             if not search_urls:
-                print("No URLs found by Google Search.")
+                print("No URLs found by search.")
                 # --- EMIT EMPTY RESULTS TO FRONTEND ---
                 if self.socketio and self.client_sid:
                     print(f"--- Emitting empty search_results_update event for SID: {self.client_sid} ---")
-                    self.socketio.emit('search_results_update', {"results": [], "query": query}, room=self.client_sid)
+                    self._emit_widget('search_results_update', {"results": [], "query": query}, key='search_results_update')
                 # --- END EMIT ---
                 return {"results": []} # Return for Gemini
 
             # Step 2: Fetch content concurrently (no change in logic)
             print(f"Fetching content for {len(search_urls)} URLs...")
+            # Step 3: Collect results as they arrive (Nones are failed fetches, already logged in helper)
+            fetch_timeout = deadline.timeout(15) if deadline else 15
             async with aiohttp.ClientSession() as session:
-                tasks = [self._fetch_and_extract_snippet(session, url) for url in search_urls]
-                results_from_gather = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # Step 3: Process results (filter Nones and Exceptions)
-            for result in results_from_gather:
-                if isinstance(result, dict): # Successfully fetched data
-                    fetched_results.append(result)
-                elif isinstance(result, Exception):
-                    print(f"   An error occurred during content fetching task: {result}")
-                # else: result is None (fetch/parse failed, already logged in helper)
+                tasks = [self._fetch_and_extract_snippet(session, url, fetch_timeout) for url in search_urls]
+                for next_result in asyncio.as_completed(tasks):
+                    try:
+                        result = await next_result
+                    except Exception as e:
+                        print(f"   An error occurred during content fetching task: {e}")
+                        continue
+                    if isinstance(result, dict): # Successfully fetched data
+                        fetched_results.append(result)
+                        if deadline:
+                            deadline.partial = {"results": list(fetched_results)}
 
             print(f"Finished fetching content. Got {len(fetched_results)} results.")
 
@@ -341,7 +384,7 @@ class ADA:
                  print(f"--- Emitting search_results_update event with {len(fetched_results)} results for SID: {self.client_sid} ---")
                  # Send the query along with the results for context
                  emit_payload = {"query": query, "results": fetched_results}
-                 self.socketio.emit('search_results_update', emit_payload, room=self.client_sid)
+                 self._emit_widget('search_results_update', emit_payload, key='search_results_update')
             # --- **** END EMIT **** ---
 
 
@@ -349,7 +392,7 @@ class ADA:
             print(f"Error running get_search_results for '{query}': {e}")
             # Optionally emit an error event to the frontend here as well
             if self.socketio and self.client_sid:
-                 self.socketio.emit('search_results_error', {"query": query, "error": str(e)}, room=self.client_sid)
+                 self.outbound.emit('search_results_error', {"query": query, "error": str(e)}, TEXT)
             return {"error": f"Failed to execute Google search with page content: {str(e)}"} # Return for Gemini
 
         # Format the final result for Gemini (no change here)
@@ -360,7 +403,7 @@ class ADA:
         return response_payload
     
     async def clear_queues(self, text=""):
-        queues_to_clear = [self.response_queue, self.audio_output_queue]
+        queues_to_clear = [self.response_queue]
         # Add self.video_frame_queue back if using streaming logic
         # queues_to_clear.append(self.video_frame_queue)
         for q in queues_to_clear:
@@ -373,12 +416,62 @@ class ADA:
         print(f"Processing input: '{message}', Final Turn: {is_final_turn_input}")
         if is_final_turn_input:
              await self.clear_queues() # Clear only before final input
-        await self.input_queue.put((message, is_final_turn_input))
+        if not await self.input_queue.put((message, is_final_turn_input)):
+            print(f"Input rejected for SID {self.client_sid}: session byte budget exhausted.")
+            if self.socketio and self.client_sid:
+                self.outbound.emit('error', {'message': 'Too much pending input; please try again.'}, TEXT)
+
+    def _client_backed_up(self) -> bool:
+        """ Speech or text to this client is backing up; optional work is skipped until it drains. """
+        return self.outbound.congested(AUDIO) or self.outbound.congested(TEXT)
+
+    def _emit_widget(self, event, data, key=None):
+        """ Queues an optional widget payload, unless the client's link is backed up. """
+        if self._client_backed_up():
+            print(f"Skipping {event} for SID {self.client_sid}: client link congested.")
+            return
+        self.outbound.emit(event, data, BULK, key=key)
 
     async def process_video_frame(self, frame_data_url):
-        """ Processes incoming video frame data URL """
-        self.latest_video_frame_data_url = frame_data_url
-        frame_data_url = None
+        """ Normalizes, scores and buffers an incoming video frame data URL """
+        if self._client_backed_up():
+            return # Frames are optional; don't spend time on them while replies queue up
+        try:
+            _, frame_bytes = split_data_url(frame_data_url)
+            frame = await self.frame_pipeline.process(frame_bytes)
+            if frame is None:
+                return # Pipeline saturated, frame dropped
+            self.frame_buffer.add(frame.data, frame.mime_type, score=frame.score)
+        except Exception as e:
+            print(f"Error buffering video frame: {e}")
+
+    async def _call_tool(self, function_call, deadline: Deadline) -> dict:
+        """ Runs one function call from Gemini within the deadline and returns its response dict. """
+        tool_call_name = function_call.name
+        tool_call_args = dict(function_call.args) # Convert Struct to dict
+        if tool_call_name not in self.available_functions:
+            print(f"!!! Error: Function '{tool_call_name}' is not available. !!!")
+            return {"error": f"Function {tool_call_name} not found or implemented."}
+        print(f"Executing function: {tool_call_name} with args: {tool_call_args}")
+        function_result = await run_tool(tool_call_name, self.available_functions[tool_call_name], tool_call_args, deadline)
+        print(f"Function {tool_call_name} returned: {function_result}")
+        return function_result
+
+    async def _send_message_stream(self, content):
+        """
+        Sends content on the chat through the Gemini rate limits and circuit
+        breaker. Returns the response stream, or None after telling the client
+        the request failed, so a quota error or outage ends the turn quickly.
+        """
+        try:
+            async with self.rate_limits.guard("gemini"):
+                return await self.chat.send_message_stream(content)
+        except Exception as e:
+            print(f"Gemini request failed: {e}")
+            if self.socketio and self.client_sid:
+                message = str(e) if isinstance(e, UpstreamUnavailable) else f'Gemini request failed: {e}'
+                self.outbound.emit('error', {'message': message}, TEXT)
+            return None
 
     async def run_gemini_session(self):
         """Manages the Gemini conversation session, handling text, video, and tool calls."""
@@ -395,22 +488,20 @@ class ADA:
 
                 # --- Prepare Content for Gemini ---
                 request_content = [message]
-                if self.latest_video_frame_data_url:
-                    try:
-                        header, encoded = self.latest_video_frame_data_url.split(",", 1)
-                        # Determine mime type from header (e.g., "data:image/jpeg;base64")
-                        mime_type = header.split(':')[1].split(';')[0] if ':' in header and ';' in header else "image/jpeg" # Default or parse
-                        frame_bytes = base64.b64decode(encoded)
-                        request_content.append(types.Part.from_bytes(data=frame_bytes, mime_type=mime_type))
-                        print(f"Included image frame with mime_type: {mime_type}")
-                    except Exception as e:
-                        print(f"Error processing video frame data URL: {e}")
-                    finally:
-                         self.latest_video_frame_data_url = None # Clear after use/attempt
+                best_frame = self.frame_buffer.best()
+                if best_frame:
+                    mime_type, frame_bytes = best_frame
+                    request_content.append(types.Part.from_bytes(data=frame_bytes, mime_type=mime_type))
+                    print(f"Included sharpest recent frame with mime_type: {mime_type}")
+                    self.frame_buffer.clear() # Clear after use so a frame is only sent once
 
                 # --- 1. Send Initial Request and Process First Response Stream ---
                 print("--- Sending request to Gemini ---")
-                response_stream = await self.chat.send_message_stream(request_content)
+                response_stream = await self._send_message_stream(request_content)
+                if response_stream is None: # Gemini failed or is unavailable; the turn ends with an error
+                    await self.response_queue.put(None)
+                    self.input_queue.task_done()
+                    continue
 
                 collected_function_calls = [] # Store detected function calls for later processing
                 processed_text_in_turn = False # Flag to see if we sent any text
@@ -429,73 +520,40 @@ class ADA:
                             # Stream text parts immediately for TTS
                             await self.response_queue.put(part.text)
                             if self.socketio and self.client_sid:
-                                self.socketio.emit('receive_text_chunk', {'text': part.text}, room=self.client_sid)
+                                await self.text_batcher.add(part.text)
                             processed_text_in_turn = True
 
                 # --- 2. Handle Function Calls (if any were detected) ---
                 if collected_function_calls:
                     print(f"--- Processing {len(collected_function_calls)} detected function call(s) ---")
-                    function_response_parts = []
-
-                    # Note: Currently handles multiple calls sequentially. Could be parallelized.
-                    for function_call in collected_function_calls:
-                        tool_call_name = function_call.name
-                        tool_call_args = dict(function_call.args) # Convert Struct to dict
-
-                        if tool_call_name in self.available_functions:
-                            function_to_call = self.available_functions[tool_call_name]
-                            print(f"Executing function: {tool_call_name} with args: {tool_call_args}")
-                            try:
-                                # Execute the function
-                                function_result = await function_to_call(**tool_call_args)
-                                print(f"Function {tool_call_name} returned: {function_result}")
-
-                                response_payload = function_result 
-
-                                function_response_parts.append(
-                                    types.Part.from_function_response(
-                                        name=tool_call_name,
-                                        response=response_payload # Pass the result dict directly
-                                    )
-                                )
-                            except Exception as e:
-                                print(f"!!! Error calling function {tool_call_name}: {e} !!!")
-                                # Handle error - maybe send an error response back?
-                                # For now, we might skip adding a response part or add an error part
-                                function_response_parts.append(
-                                     types.Part.from_function_response(
-                                        name=tool_call_name,
-                                        response={"error": f"Failed to execute function {tool_call_name}: {str(e)}"}
-                                    )
-                                )
-                        else:
-                            print(f"!!! Error: Function '{tool_call_name}' is not available. !!!")
-                            # Handle missing function - inform Gemini
-                            function_response_parts.append(
-                                types.Part.from_function_response(
-                                    name=tool_call_name,
-                                    response={"error": f"Function {tool_call_name} not found or implemented."}
-                                )
-                            )
+                    # All calls run concurrently within one deadline; overruns are answered as timed out
+                    deadline = Deadline()
+                    function_results = await asyncio.gather(
+                        *(self._call_tool(function_call, deadline) for function_call in collected_function_calls))
+                    function_response_parts = [
+                        types.Part.from_function_response(name=function_call.name, response=function_result)
+                        for function_call, function_result in zip(collected_function_calls, function_results)
+                    ]
 
                     # --- 3. Send Function Response(s) Back to Gemini ---
                     if function_response_parts:
                         print(f"--- Sending {len(function_response_parts)} function response(s) back to Gemini ---")
-                        response_stream_after_func = await self.chat.send_message_stream(function_response_parts) # Send ONLY the response parts
+                        response_stream_after_func = await self._send_message_stream(function_response_parts) # Send ONLY the response parts
 
                         # --- 4. Process Final Text Response from Gemini ---
-                        async for final_chunk in response_stream_after_func:
-                             if final_chunk.candidates and final_chunk.candidates[0].content and final_chunk.candidates[0].content.parts:
-                                for part in final_chunk.candidates[0].content.parts:
-                                     if part.text:
-                                        await self.response_queue.put(part.text)
-                                        if self.socketio and self.client_sid:
-                                            self.socketio.emit('receive_text_chunk', {'text': part.text}, room=self.client_sid)
-                                        processed_text_in_turn = True
-                        self.response_queue.put("")
+                        if response_stream_after_func is not None:
+                            async for final_chunk in response_stream_after_func:
+                                 if final_chunk.candidates and final_chunk.candidates[0].content and final_chunk.candidates[0].content.parts:
+                                    for part in final_chunk.candidates[0].content.parts:
+                                         if part.text:
+                                            await self.response_queue.put(part.text)
+                                            if self.socketio and self.client_sid:
+                                                await self.text_batcher.add(part.text)
+                                            processed_text_in_turn = True
 
                 # --- 5. Signal End of Response to TTS ---
                 print("--- Finished processing response for this turn. Signaling TTS end. ---")
+                await self.text_batcher.flush()
                 await self.response_queue.put(None) # Use None as a sentinel for the TTS loop
 
                 self.input_queue.task_done() # Mark input processed
@@ -508,7 +566,7 @@ class ADA:
             import traceback
             traceback.print_exc()
             if self.socketio and self.client_sid:
-                self.socketio.emit('error', {'message': f'Gemini session error: {str(e)}'}, room=self.client_sid)
+                self.outbound.emit('error', {'message': f'Gemini session error: {str(e)}'}, TEXT)
             # Try to signal TTS end even on error, might help cleanup
             try:
                  await self.response_queue.put(None)
@@ -525,11 +583,16 @@ class ADA:
 
     async def run_tts_and_audio_out(self):
         print("Starting TTS and Audio Output manager...")
-        uri = f"wss://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream-input?model_id=eleven_flash_v2_5&output_format=pcm_24000"
+        uri = f"wss://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream-input?model_id=eleven_flash_v2_5&output_format=pcm_24000&inactivity_timeout={TTS_INACTIVITY_TIMEOUT}"
+        loop = asyncio.get_running_loop()
+        attempt = 0 # Consecutive failed connections, for backoff
         while True:
             try:
-                async with websockets.connect(uri) as websocket:
+                async with self.rate_limits.guard("elevenlabs"):
+                    websocket = await websockets.connect(uri)
+                async with websocket:
                     self.tts_websocket = websocket
+                    connected_at = loop.time()
                     print("ElevenLabs WebSocket Connected.")
                     await websocket.send(json.dumps({"text": " ", "voice_settings": {"stability": 0.3, "similarity_boost": 0.9, "speed": 1.1}, "xi_api_key": ELEVENLABS_API_KEY,}))
                     async def tts_listener():
@@ -540,7 +603,7 @@ class ADA:
                                 if data.get("audio"):
                                     audio_chunk = base64.b64decode(data["audio"])
                                     if self.socketio and self.client_sid:
-                                        self.socketio.emit('receive_audio_chunk', {'audio': base64.b64encode(audio_chunk).decode('utf-8')}, room=self.client_sid)
+                                        await self.outbound.send('receive_audio_chunk', {'audio': audio_chunk}, AUDIO)
                                 elif data.get('isFinal'): pass
                         except websockets.exceptions.ConnectionClosedOK: print("TTS WebSocket listener closed normally.")
                         except websockets.exceptions.ConnectionClosedError as e: print(f"TTS WebSocket listener closed error: {e}")
@@ -550,10 +613,25 @@ class ADA:
                     listener_task = asyncio.create_task(tts_listener())
                     try:
                         while True:
-                            text_chunk = await self.response_queue.get()
+                            # Wait for text, but reconnect (and re-prime) right away if the socket closes while idle
+                            next_text = asyncio.ensure_future(self.response_queue.get())
+                            await asyncio.wait({next_text, listener_task}, return_when=asyncio.FIRST_COMPLETED)
+                            if not next_text.done():
+                                next_text.cancel()
+                                print("TTS WebSocket closed while idle; reconnecting.")
+                                if loop.time() - connected_at < TTS_MIN_CONNECTION_SECONDS:
+                                    # Closed right after connecting; count it as a failure and back off
+                                    get_upstream("elevenlabs").breaker.record_failure()
+                                    await self._wait_tts_retry(attempt)
+                                    attempt += 1
+                                else:
+                                    attempt = 0
+                                break
+                            text_chunk = next_text.result()
                             if text_chunk is None:
                                 print("End of text stream signal received for TTS.")
                                 await websocket.send(json.dumps({"text": ""}))
+                                attempt = 0
                                 break
                             await websocket.send(json.dumps({"text": text_chunk}))
                             print(f"Sent text to TTS: {text_chunk}")
@@ -566,19 +644,41 @@ class ADA:
                                 if not listener_task.cancelled(): await asyncio.wait_for(listener_task, timeout=5.0)
                             except asyncio.TimeoutError: print("Timeout waiting for TTS listener.")
                             except asyncio.CancelledError: print("TTS listener task already cancelled.")
-            except websockets.exceptions.ConnectionClosedError as e: print(f"ElevenLabs WebSocket connection error: {e}. Reconnecting..."); await asyncio.sleep(5)
+            except websockets.exceptions.ConnectionClosedError as e: print(f"ElevenLabs WebSocket connection error: {e}. Reconnecting..."); await self._wait_tts_retry(attempt); attempt += 1
             except asyncio.CancelledError: print("TTS main task cancelled."); break
-            except Exception as e: print(f"Error in TTS main loop: {e}"); await asyncio.sleep(5)
+            except Exception as e: print(f"Error in TTS main loop: {e}"); await self._wait_tts_retry(attempt); attempt += 1
             finally:
                  if self.tts_websocket:
                      try: await self.tts_websocket.close()
                      except Exception: pass
                  self.tts_websocket = None
 
+    async def _wait_tts_retry(self, attempt):
+        """
+        Waits before reconnecting to ElevenLabs. While its circuit is open, text
+        queued for speech is discarded so replies keep streaming as text only.
+        """
+        upstream = get_upstream("elevenlabs")
+        delay = upstream.retry_delay(attempt)
+        print(f"Reconnecting to ElevenLabs in {delay:.1f}s...")
+        if not upstream.breaker.is_open:
+            await asyncio.sleep(delay)
+            return
+        try:
+            await asyncio.wait_for(self._discard_tts_text(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _discard_tts_text(self):
+        while True:
+            await self.response_queue.get()
+            self.response_queue.task_done()
+
     async def start_all_tasks(self):
         print("Starting ADA background tasks...")
         if not self.tasks:
             loop = asyncio.get_running_loop()
+            self.outbound.start()
             gemini_task = loop.create_task(self.run_gemini_session())
             tts_task = loop.create_task(self.run_tts_and_audio_out())
             self.tasks = [gemini_task, tts_task]
@@ -590,6 +690,31 @@ class ADA:
         else:
             print("ADA tasks already running.")
 
+    def queue_stats(self) -> dict:
+        """ High-water marks and drop/merge/block counts of this session's queues. """
+        return {"input": self.input_queue.stats, "response": self.response_queue.stats,
+                "outbound": self.outbound.stats}
+
+    def hibernate(self):
+        """
+        Frees per-session memory of an idle, stopped session. The chat history
+        (which also holds every image sent with a prompt) is reduced to its text
+        and compressed; wake() rebuilds the chat from it.
+        """
+        for q in (self.input_queue, self.response_queue):
+            q.clear()
+        self.frame_buffer.clear()
+        turns = [(content.role, "".join(part.text for part in content.parts or [] if part.text))
+                 for content in self.chat.get_history()]
+        self.hibernated_history = compact_history(turns)
+        self.chat = None
+
+    def wake(self):
+        history = [types.Content(role=role, parts=[types.Part(text=text)])
+                   for role, text in restore_history(self.hibernated_history)]
+        self.chat = self.client.aio.chats.create(model=self.model, config=self.config, history=history)
+        self.hibernated_history = None
+
     async def stop_all_tasks(self):
         print("Stopping ADA background tasks...")
         tasks_to_cancel = list(self.tasks)
@@ -597,9 +722,11 @@ class ADA:
             if task and not task.done(): task.cancel()
         await asyncio.gather(*[t for t in tasks_to_cancel if t], return_exceptions=True)
         self.tasks = []
+        await self.outbound.stop()
         if self.tts_websocket:
             try: await self.tts_websocket.close(code=1000)
             except Exception as e: print(f"Error closing TTS websocket during stop: {e}")
             finally: self.tts_websocket = None
         self.gemini_session = None
+        print(f"Queue stats: {self.queue_stats()}")
         print("ADA tasks stopped.")
\ No newline at end of file
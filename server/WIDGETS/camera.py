@@ -1,24 +1,47 @@
 import cv2
 
-def open():
-    """Opens the default camera using OpenCV and displays the video feed. Press 'q' to exit."""
+from camera_broker import get_camera_broker
+
+camera = None  # Broker handle while the widget holds the camera open
 
+def open():
+    """Opens the default camera. The device is shared with any other consumer through the camera broker."""
+    global camera
+    if camera is None:
+        camera = get_camera_broker(0).acquire()
     return "Camera is open"
 
-    global cap  # Access the global cap variable
-    cap = cv2.VideoCapture(0)
+def close():
+    """Releases the widget's hold on the default camera."""
+    global camera
+    if camera is not None:
+        camera.release()
+        camera = None
+    return "Camera is closed"
 
-    if not cap.isOpened():
-        print("Error: Could not open camera.")
-        return
+def snapshot(max_edge=1024):
+    """Returns the newest camera frame as JPEG bytes, or None if no frame is available."""
+    if camera is None:
+        open()
+    return camera.snapshot_jpeg(max_edge=max_edge)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Error: Could not read frame.")
-            break
+def preview():
+    """Displays the shared camera feed in a window. Press 'q' to exit."""
+    broker = get_camera_broker(0).acquire()
+    last_seq = -1
+    try:
+        while True:
+            seq, frame = broker.latest_frame(timeout=2.0)
+            if frame is None:
+                print("Error: Could not read frame.")
+                break
 
-        cv2.imshow('Camera Feed', frame)
+            if seq != last_seq: # Only redraw when the broker has a new frame
+                cv2.imshow('Camera Feed', frame)
+                last_seq = seq
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        broker.release()
+        cv2.destroyWindow('Camera Feed')
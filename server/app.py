@@ -14,6 +14,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import ADA core
 from ADA.ADA_Online import ADA
+from session_manager import SessionManager
+from outbound import TEXT_BATCH_BYTES, TEXT_BATCH_MS
+from audio_processing import SEND_SAMPLE_RATE
+from wire_codec import negotiate
+from scaleout import message_queue_options, ADA_PORT
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +29,10 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 MAPS_API_KEY = os.getenv("MAPS_API_KEY")
 FLASK_SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "default_secret_key")
 REACT_APP_PORT = os.getenv("REACT_APP_PORT", "5173")
+# "legacy": one shared ADA from ADA/ADA_Online.py (default)
+# "online" / "live": one ADA per client from ADA_Online.py / ADA_Live_API.py
+ADA_ENGINE = os.getenv("ADA_ENGINE", "legacy")
+MIC_SAMPLE_RATE_RANGE = (8000, 96000) # Mic rates accepted from clients; chunks outside are dropped
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -34,36 +43,69 @@ socketio = SocketIO(app, cors_allowed_origins=[
     "http://localhost:3000",
     "http://127.0.0.1:3000",
     "*"  # For development
-])
+], **message_queue_options()) # Lets any worker emit to any client when several run
 
 # Initialize ADA instance
 ada = None
 ada_thread = None
 processing_lock = threading.Lock()
+sessions = None # Per-client engines when ADA_ENGINE is "online" or "live"
 
 def initialize_ada():
-    global ada
-    ada = ADA(
-        google_api_key=GOOGLE_API_KEY,
-        elevenlabs_api_key=ELEVENLABS_API_KEY,
-        maps_api_key=MAPS_API_KEY
-    )
+    global ada, sessions
+    if ADA_ENGINE == "live":
+        from ADA_Live_API import ADA as SessionADA
+        sessions = SessionManager(socketio, SessionADA)
+    elif ADA_ENGINE == "online":
+        from ADA_Online import ADA as SessionADA
+        sessions = SessionManager(socketio, SessionADA)
+    else:
+        ada = ADA(
+            google_api_key=GOOGLE_API_KEY,
+            elevenlabs_api_key=ELEVENLABS_API_KEY,
+            maps_api_key=MAPS_API_KEY
+        )
 
 # Initialize ADA on startup
 initialize_ada()
 
+def emit_text_response(response):
+    """ Streams a finished legacy response in batched chunks instead of one emit per few characters. """
+    for i in range(0, len(response), TEXT_BATCH_BYTES):
+        socketio.emit('receive_text_chunk', {'chunk': response[i:i + TEXT_BATCH_BYTES]})
+        time.sleep(TEXT_BATCH_MS / 1000)
+
 # Socket.IO event handlers
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
     print('Client connected')
+    if sessions:
+        # Per-client engines can switch to a compact encoding; tell the client which one (in JSON) first
+        wire_codec = negotiate(auth)
+        emit('wire_codec', {'codec': wire_codec})
+        sessions.connect(request.sid, wire_codec)
     emit('status_update', {'status': 'Connected to server'})
 
+@socketio.on('client_ready')
+def handle_client_ready(data=None):
+    """ Sent by the client when the user is about to interact; opens upstream connections ahead of the first turn. """
+    if sessions:
+        sessions.ready(request.sid)
+
 @socketio.on('disconnect')
 def handle_disconnect():
     print('Client disconnected')
+    if sessions:
+        sessions.disconnect(request.sid)
 
 @socketio.on('send_text_message')
 def handle_text_message(data):
+    if sessions:
+        text = data.get('message') or data.get('text', '')
+        if text:
+            sessions.send_text(request.sid, text)
+        return
+
     text = data.get('text', '')
     if not text:
         emit('status_update', {'status': 'Error: Empty message'})
@@ -77,13 +119,8 @@ def handle_text_message(data):
             try:
                 response = ada.process_text_input(text, socketio)
                 
-                # Send response in chunks to simulate streaming
                 if response:
-                    chunk_size = 10  # Characters per chunk
-                    for i in range(0, len(response), chunk_size):
-                        chunk = response[i:i+chunk_size]
-                        socketio.emit('receive_text_chunk', {'chunk': chunk})
-                        time.sleep(0.05)  # Small delay between chunks
+                    emit_text_response(response)
             except Exception as e:
                 print(f"Error processing text: {str(e)}")
                 socketio.emit('status_update', {'status': f'Error: {str(e)}'})
@@ -99,6 +136,12 @@ def handle_text_message(data):
 
 @socketio.on('send_transcribed_text')
 def handle_transcribed_text(data):
+    if sessions:
+        text = data.get('transcript') or data.get('text', '')
+        if text:
+            sessions.send_text(request.sid, text)
+        return
+
     text = data.get('text', '')
     if not text:
         return
@@ -111,13 +154,8 @@ def handle_transcribed_text(data):
             try:
                 response = ada.process_text_input(text, socketio)
                 
-                # Send response in chunks to simulate streaming
                 if response:
-                    chunk_size = 10  # Characters per chunk
-                    for i in range(0, len(response), chunk_size):
-                        chunk = response[i:i+chunk_size]
-                        socketio.emit('receive_text_chunk', {'chunk': chunk})
-                        time.sleep(0.05)  # Small delay between chunks
+                    emit_text_response(response)
             except Exception as e:
                 print(f"Error processing transcription: {str(e)}")
                 socketio.emit('status_update', {'status': f'Error: {str(e)}'})
@@ -136,6 +174,10 @@ def handle_video_frame(data):
     frame_data = data.get('frame', '')
     if not frame_data:
         return
+
+    if sessions:
+        sessions.send_video_frame(request.sid, frame_data) # Engines take the full data URL
+        return
     
     # Process video frame if ADA is ready
     if not processing_lock.locked():
@@ -149,6 +191,26 @@ def handle_video_frame(data):
         except Exception as e:
             print(f"Error processing video frame: {str(e)}")
 
+@socketio.on('send_audio_chunk')
+def handle_audio_chunk(data):
+    """ Binary mic PCM (16-bit mono) streamed straight into the client's live session. """
+    if not sessions:
+        return
+    if isinstance(data, dict):
+        pcm = data.get('audio')
+        raw_rate = data.get('sample_rate')
+    else:
+        pcm, raw_rate = data, None
+    try:
+        sample_rate = SEND_SAMPLE_RATE if raw_rate is None else int(raw_rate)
+    except (TypeError, ValueError, OverflowError):
+        sample_rate = 0
+    if not MIC_SAMPLE_RATE_RANGE[0] <= sample_rate <= MIC_SAMPLE_RATE_RANGE[1]:
+        print(f"Dropping audio chunk from SID {request.sid}: invalid sample rate {raw_rate!r}.")
+        return
+    if isinstance(pcm, (bytes, bytearray, memoryview)) and pcm:
+        sessions.send_audio_chunk(request.sid, bytes(pcm), sample_rate)
+
 # Routes
 @app.route('/')
 def index():
@@ -162,4 +224,9 @@ def health_check():
 if __name__ == '__main__':
     print("Starting ADA Combined Backend Server...")
     print(f"API Keys configured: Google={bool(GOOGLE_API_KEY)}, ElevenLabs={bool(ELEVENLABS_API_KEY)}, Maps={bool(MAPS_API_KEY)}")
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True)
+    print(f"ADA engine: {ADA_ENGINE}")
+    worker_id = os.getenv("ADA_WORKER_ID")
+    if worker_id is not None:
+        print(f"Worker {worker_id} on port {ADA_PORT}")
+    # The debug reloader would fork each worker again, so only use it for a plain single-process run
+    socketio.run(app, host='0.0.0.0', port=ADA_PORT, debug=worker_id is None)
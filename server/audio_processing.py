@@ -0,0 +1,278 @@
+# server/audio_processing.py
+import threading
+from collections import deque
+
+import numpy as np
+
+try:
+    import webrtcvad # Optional, more robust speech detector
+except ImportError:
+    webrtcvad = None
+
+SEND_SAMPLE_RATE = 16000  # What the Live API expects for input audio
+RESAMPLER_TAPS = 31       # Length of the anti-aliasing low-pass filter
+
+VAD_FRAME_MS = 20             # Analysis frame length (10/20/30 ms also suit webrtcvad)
+VAD_START_FRAMES = 3          # Consecutive speech frames needed to open the gate
+VAD_HANGOVER_MS = 400         # Silence tolerated inside a segment before it ends
+VAD_PREROLL_MS = 300          # Audio released from before the trigger so onsets are kept
+VAD_MIN_ENERGY_DB = -50.0     # Frames quieter than this (dBFS) are never speech
+VAD_NOISE_MARGIN_DB = 10.0    # Speech must be this much louder than the noise floor
+VAD_MAX_ZCR = 0.4             # Higher zero-crossing rates look like hiss, not voice
+
+PLAYBACK_TARGET_MS = 120      # Audio buffered before playback starts or resumes
+PLAYBACK_CAPACITY_MS = 30000  # Hard cap on buffered playback audio
+
+
+def _lowpass_kernel(cutoff: float, taps: int) -> np.ndarray:
+    """ Windowed-sinc low-pass FIR. cutoff is a fraction of the input sample rate (0..0.5). """
+    n = np.arange(taps, dtype=np.float64) - (taps - 1) / 2.0
+    kernel = 2.0 * cutoff * np.sinc(2.0 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+class PcmResampler:
+    """
+    Streaming resampler for 16-bit mono PCM (e.g. browser 44.1/48 kHz mic audio
+    down to 16 kHz). Each chunk is low-pass filtered and linearly interpolated
+    with NumPy; filter history and the fractional read position carry over
+    between chunks so chunk boundaries are seamless.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int = SEND_SAMPLE_RATE, taps: int = RESAMPLER_TAPS):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.ratio = src_rate / dst_rate
+        # Only downsampling needs anti-aliasing; keep a little headroom below the new Nyquist
+        self.kernel = _lowpass_kernel(0.45 / self.ratio, taps) if self.ratio > 1 else None
+        self.history = np.zeros(taps - 1, dtype=np.float32)
+        self.previous = np.float32(0.0) # Last filtered sample of the previous chunk
+        self.position = 0.0             # Next output position, in input samples from the chunk start
+
+    def process(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+        if samples.size == 0 or self.ratio == 1:
+            return pcm
+
+        if self.kernel is not None:
+            padded = np.concatenate((self.history, samples))
+            self.history = padded[-self.history.size:]
+            samples = np.convolve(padded, self.kernel, mode="valid")
+
+        # Index 0 is the last sample of the previous chunk, so positions in [-1, 0) interpolate across the boundary
+        extended = np.concatenate(([self.previous], samples))
+        positions = np.arange(self.position, samples.size - 1 + 1e-9, self.ratio)
+        out = np.interp(positions + 1.0, np.arange(extended.size), extended)
+
+        self.previous = samples[-1]
+        next_position = positions[-1] + self.ratio if positions.size else self.position
+        self.position = next_position - samples.size
+
+        return np.clip(np.rint(out), -32768, 32767).astype("<i2").tobytes()
+
+
+class VoiceActivityGate:
+    """
+    Lightweight voice-activity gate for 16-bit mono PCM. Audio is cut into
+    short frames and classified by energy and zero-crossing rate against an
+    adaptive noise floor (or by webrtcvad when it is installed and requested).
+    Only speech is passed on: a few frames of pre-roll are released when speech
+    starts so onsets are not clipped, a hangover keeps short pauses inside the
+    segment, and END is emitted once the segment is over.
+    """
+
+    END = object() # Marker returned after the last chunk of a speech segment
+
+    def __init__(self, sample_rate: int = SEND_SAMPLE_RATE, frame_ms: int = VAD_FRAME_MS,
+                 start_frames: int = VAD_START_FRAMES, hangover_ms: int = VAD_HANGOVER_MS,
+                 preroll_ms: int = VAD_PREROLL_MS, min_energy_db: float = VAD_MIN_ENERGY_DB,
+                 use_webrtc: bool = False, webrtc_mode: int = 2):
+        self.sample_rate = sample_rate
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * 2
+        self.start_frames = start_frames
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.preroll = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self.min_energy_db = min_energy_db
+        self.noise_floor_db = min_energy_db
+        self.webrtc = webrtcvad.Vad(webrtc_mode) if use_webrtc and webrtcvad else None
+
+        self.pending = b""      # Bytes that do not fill a whole frame yet
+        self.active = False     # Inside a speech segment
+        self.speech_run = 0     # Consecutive speech frames while inactive
+        self.silence_run = 0    # Consecutive non-speech frames while active
+
+    def is_speech(self, frame: bytes) -> bool:
+        if self.webrtc:
+            return self.webrtc.is_speech(frame, self.sample_rate)
+
+        samples = np.frombuffer(frame, dtype="<i2").astype(np.float32)
+        energy_db = 10.0 * np.log10(np.mean(samples * samples) + 1e-9) - 90.3 # dBFS for 16-bit audio
+        signs = np.signbit(samples)
+        zero_crossing_rate = np.count_nonzero(signs[1:] != signs[:-1]) / samples.size
+
+        speech = (energy_db > max(self.min_energy_db, self.noise_floor_db + VAD_NOISE_MARGIN_DB)
+                  and zero_crossing_rate < VAD_MAX_ZCR)
+        if not speech:
+            # Track the background level slowly so the threshold follows the room
+            self.noise_floor_db += 0.05 * (energy_db - self.noise_floor_db)
+        return speech
+
+    def process(self, pcm: bytes) -> list:
+        """
+        Feeds a chunk of PCM through the gate. Returns a list containing bytes
+        to forward (speech, coalesced per call) and/or VoiceActivityGate.END.
+        """
+        data = self.pending + pcm
+        whole = len(data) - len(data) % self.frame_bytes
+        self.pending = data[whole:]
+
+        output = []
+        speech = bytearray()
+        for offset in range(0, whole, self.frame_bytes):
+            frame = data[offset:offset + self.frame_bytes]
+            voiced = self.is_speech(frame)
+
+            if not self.active:
+                self.preroll.append(frame)
+                self.speech_run = self.speech_run + 1 if voiced else 0
+                if self.speech_run >= self.start_frames:
+                    self.active = True
+                    self.silence_run = 0
+                    speech.extend(b"".join(self.preroll)) # Includes the triggering frames
+                    self.preroll.clear()
+                continue
+
+            speech.extend(frame)
+            self.silence_run = 0 if voiced else self.silence_run + 1
+            if self.silence_run >= self.hangover_frames:
+                self.active = False
+                self.speech_run = 0
+                output.append(bytes(speech))
+                output.append(self.END)
+                speech = bytearray()
+
+        if speech:
+            output.append(bytes(speech))
+        return [item for item in output if item]
+
+    def flush(self) -> list:
+        """ Ends any open segment, e.g. when the mic is closed. """
+        if not self.active:
+            return []
+        self.active = False
+        self.speech_run = 0
+        return [self.END]
+
+
+class PcmRingBuffer:
+    """
+    Fixed-size, thread-safe byte ring for PCM shared between a PortAudio
+    callback thread and the asyncio side. Storage is allocated once; when a
+    write would overflow, the oldest audio is dropped and counted.
+    """
+
+    def __init__(self, capacity_bytes: int):
+        self.capacity = capacity_bytes
+        self.buffer = bytearray(capacity_bytes)
+        self.start = 0   # Index of the oldest byte
+        self.size = 0    # Bytes currently stored
+        self.dropped_bytes = 0
+        self.lock = threading.Lock()
+
+    def write(self, data: bytes) -> int:
+        """ Appends data, dropping the oldest bytes if needed. Returns bytes dropped. """
+        with self.lock:
+            return self._write(data)
+
+    def _write(self, data) -> int:
+        data = memoryview(data)
+        dropped = 0
+        if len(data) > self.capacity:
+            dropped += len(data) - self.capacity
+            data = data[-self.capacity:]
+        overflow = self.size + len(data) - self.capacity
+        if overflow > 0:
+            self.start = (self.start + overflow) % self.capacity
+            self.size -= overflow
+            dropped += overflow
+
+        end = (self.start + self.size) % self.capacity
+        first = min(len(data), self.capacity - end)
+        self.buffer[end:end + first] = data[:first]
+        self.buffer[:len(data) - first] = data[first:]
+        self.size += len(data)
+        self.dropped_bytes += dropped
+        return dropped
+
+    def read(self, max_bytes: int) -> bytes:
+        """ Removes and returns up to max_bytes of the oldest data. """
+        with self.lock:
+            return self._read(max_bytes)
+
+    def _read(self, max_bytes: int) -> bytes:
+        count = min(max_bytes, self.size)
+        first = min(count, self.capacity - self.start)
+        data = bytes(self.buffer[self.start:self.start + first]) + bytes(self.buffer[:count - first])
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+        return data
+
+    def available(self) -> int:
+        with self.lock:
+            return self.size
+
+    def clear(self):
+        with self.lock:
+            self.start = 0
+            self.size = 0
+
+
+class JitterBuffer(PcmRingBuffer):
+    """
+    Playback buffer read by the PortAudio output callback. Playback only
+    starts (or restarts after running dry) once target_latency_ms of audio is
+    buffered, which smooths out network jitter. Running dry mid-stream counts
+    as an underrun and is padded with silence; the tail of a stream that was
+    marked finished plays out without waiting for the target.
+    """
+
+    def __init__(self, sample_rate: int, target_latency_ms: int = PLAYBACK_TARGET_MS,
+                 capacity_ms: int = PLAYBACK_CAPACITY_MS, sample_width: int = 2):
+        bytes_per_ms = sample_rate * sample_width // 1000
+        super().__init__(capacity_ms * bytes_per_ms)
+        self.target_bytes = target_latency_ms * bytes_per_ms
+        self.priming = True    # Waiting for target_bytes before playing
+        self.draining = False  # The current stream has ended; play out the rest
+        self.underruns = 0
+
+    def write(self, data: bytes) -> int:
+        with self.lock:
+            self.draining = False
+            return self._write(data)
+
+    def end_of_stream(self):
+        with self.lock:
+            self.draining = True
+
+    def clear(self):
+        """ Drops queued audio, e.g. when the model is interrupted. """
+        with self.lock:
+            self.start = 0
+            self.size = 0
+            self.priming = True
+
+    def read_frames(self, num_bytes: int) -> bytes:
+        """ Always returns exactly num_bytes, padding with silence. Called from the audio thread. """
+        with self.lock:
+            if self.priming:
+                if self.size >= self.target_bytes or (self.draining and self.size > 0):
+                    self.priming = False
+                else:
+                    return bytes(num_bytes)
+            data = self._read(num_bytes)
+            if len(data) < num_bytes:
+                if not self.draining:
+                    self.underruns += 1
+                self.priming = True
+                data += bytes(num_bytes - len(data))
+            return data
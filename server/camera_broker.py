@@ -0,0 +1,122 @@
+# server/camera_broker.py
+import threading
+import time
+
+import cv2
+
+CAMERA_IDLE_SLEEP = 0.01 # Back-off after a failed read so a missing camera does not spin
+
+
+class CameraBroker:
+    """
+    Owns one camera device. A background thread opens it once and keeps
+    draining it, so the driver never builds up a backlog of stale frames; only
+    the newest frame is kept, in a lock-protected slot. Any number of consumers
+    (the Live loop, widgets, a preview) read snapshots at their own pace.
+    The device is opened on the first acquire() and released after the last
+    release().
+    """
+
+    def __init__(self, device_index: int = 0):
+        self.device_index = device_index
+        self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
+        self.frame = None       # Newest BGR frame
+        self.frame_seq = 0      # Increments on every new frame
+        self.frame_time = 0.0
+        self.encoded = {}       # (quality, max_edge) -> (frame_seq, jpeg bytes)
+        self.users = 0
+        self.opened = False
+        self.thread = None
+
+    def acquire(self):
+        """ Registers a consumer, starting the capture thread if needed. Returns self. """
+        with self.lock:
+            self.users += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._capture_loop, name=f"camera-{self.device_index}", daemon=True)
+                self.thread.start()
+        return self
+
+    def release(self):
+        """ Unregisters a consumer; the capture thread closes the device once nobody is left. """
+        with self.lock:
+            self.users = max(0, self.users - 1)
+
+    def _stop_locked(self, cap):
+        # Called with the lock held, so a concurrent acquire() either keeps this thread or starts a fresh one
+        cap.release()
+        self.thread = None
+        self.opened = False
+        self.frame = None
+        self.encoded.clear()
+        self.new_frame.notify_all()
+
+    def _capture_loop(self):
+        cap = cv2.VideoCapture(self.device_index)
+        if not cap.isOpened():
+            print(f"Error: Could not open camera {self.device_index}.")
+            with self.lock:
+                self._stop_locked(cap)
+            return
+        self.opened = True
+        print(f"Camera {self.device_index} opened.")
+        while True:
+            ret, frame = cap.read() # Blocks until the driver delivers the next frame
+            with self.lock:
+                if self.users == 0:
+                    self._stop_locked(cap)
+                    break
+                if ret:
+                    self.frame = frame
+                    self.frame_seq += 1
+                    self.frame_time = time.monotonic()
+                    self.new_frame.notify_all()
+            if not ret:
+                time.sleep(CAMERA_IDLE_SLEEP)
+        print(f"Camera {self.device_index} released.")
+
+    def latest_frame(self, timeout: float | None = None):
+        """ Returns (frame_seq, BGR frame) for the newest frame, waiting up to timeout for the first one. """
+        with self.lock:
+            if self.frame is None and timeout:
+                self.new_frame.wait_for(lambda: self.frame is not None or self.thread is None, timeout=timeout)
+            return self.frame_seq, self.frame
+
+    def snapshot_jpeg(self, max_edge: int = 1024, quality: int = 80, timeout: float | None = 2.0) -> bytes | None:
+        """
+        JPEG of the newest frame, shrunk so its longest edge is at most max_edge.
+        Consumers asking for the same settings share one encode per frame.
+        """
+        seq, frame = self.latest_frame(timeout)
+        if frame is None:
+            return None
+        key = (quality, max_edge)
+        with self.lock:
+            cached = self.encoded.get(key)
+        if cached and cached[0] == seq:
+            return cached[1]
+
+        height, width = frame.shape[:2]
+        scale = max_edge / max(height, width)
+        if scale < 1:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            return None
+        jpeg = jpeg.tobytes()
+        with self.lock:
+            self.encoded[key] = (seq, jpeg)
+        return jpeg
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_camera_broker(device_index: int = 0) -> CameraBroker:
+    """ Returns the process-wide broker for a camera device. """
+    with _brokers_lock:
+        if device_index not in _brokers:
+            _brokers[device_index] = CameraBroker(device_index)
+        return _brokers[device_index]
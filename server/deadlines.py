@@ -0,0 +1,65 @@
+# server/deadlines.py
+import asyncio
+import inspect
+import os
+import time
+
+TURN_BUDGET_SECONDS = float(os.getenv("ADA_TURN_BUDGET_SECONDS", "10"))  # Time tools get to answer one model request
+
+
+class Deadline:
+    """
+    Point in time by which a turn's tools must have answered. Tools that
+    take a `deadline` argument get their own child, can size their upstream
+    timeouts from remaining(), and can store what they have so far in
+    `partial`, which is returned if they are cut off.
+    """
+
+    def __init__(self, seconds: float = TURN_BUDGET_SECONDS, expires_at: float | None = None):
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + seconds
+        self.partial = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, upper: float) -> float:
+        """ The smaller of upper and the time left, for upstream timeouts. """
+        return min(upper, self.remaining())
+
+    def child(self) -> "Deadline":
+        return Deadline(expires_at=self.expires_at)
+
+
+def _accepts_deadline(function) -> bool:
+    try:
+        return "deadline" in inspect.signature(function).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+async def run_tool(name: str, function, args: dict, deadline: Deadline) -> dict:
+    """
+    Runs one tool call within the turn's deadline. A tool that overruns is
+    cancelled and answered with a structured timeout, carrying its partial
+    result if it stored one; a tool that raises is answered with its error.
+    Either way the model gets a response and the turn moves on.
+    """
+    call_deadline = deadline.child()
+    if _accepts_deadline(function):
+        args = dict(args, deadline=call_deadline)
+    try:
+        return await asyncio.wait_for(function(**args), timeout=call_deadline.remaining())
+    except asyncio.TimeoutError:
+        print(f"Tool {name} timed out{' with a partial result' if call_deadline.partial else ''}.")
+        response = {"status": "timed_out", "error": f"{name} did not finish in time."}
+        if call_deadline.partial:
+            response["status"] = "partial"
+            response["partial_result"] = call_deadline.partial
+        return response
+    except Exception as e:
+        print(f"Error executing function {name}: {e}")
+        return {"error": f"Failed to execute function {name}: {str(e)}"}
@@ -0,0 +1,109 @@
+# server/frame_buffer.py
+import base64
+import io
+import time
+from collections import deque
+
+import numpy as np
+import PIL.Image
+
+FRAME_BUFFER_SIZE = 8          # How many recent frames each session keeps
+FRAME_WINDOW_SECONDS = 3.0     # Only frames this recent are candidates for a turn
+FRAME_MAX_AGE_SECONDS = 60.0   # Frames older than this are discarded
+SHARPNESS_EDGE = 160           # Longest edge of the grayscale thumbnail that gets scored
+
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """ Variance of the 4-neighbour Laplacian of a 2-D grayscale array. """
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return 0.0
+    # Computed with array slicing (no per-pixel Python loop)
+    laplacian = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] +
+        gray[1:-1, :-2] + gray[1:-1, 2:] -
+        4.0 * gray[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def image_sharpness(img: PIL.Image.Image) -> float:
+    """ Scores an already decoded image on a small grayscale thumbnail. """
+    gray = img.convert("L")
+    gray.thumbnail((SHARPNESS_EDGE, SHARPNESS_EDGE))
+    return laplacian_variance(np.asarray(gray, dtype=np.float32))
+
+
+def sharpness_score(image_bytes: bytes) -> float:
+    """
+    Scores how sharp an encoded image is using the variance of the Laplacian
+    on a small grayscale thumbnail. Higher means sharper; blurry frames score low.
+    """
+    img = PIL.Image.open(io.BytesIO(image_bytes))
+    # draft() lets the JPEG decoder downscale in the DCT domain, so we never decode full size
+    img.draft("L", (SHARPNESS_EDGE, SHARPNESS_EDGE))
+    return image_sharpness(img)
+
+
+def split_data_url(frame_data_url: str) -> tuple[str, bytes]:
+    """ Splits a 'data:image/jpeg;base64,...' URL into (mime_type, raw bytes). """
+    header, encoded = frame_data_url.split(",", 1)
+    mime_type = header.split(':')[1].split(';')[0] if ':' in header and ';' in header else "image/jpeg"
+    return mime_type, base64.b64decode(encoded)
+
+
+class FrameRingBuffer:
+    """
+    Per-session ring buffer of recent video frames, each tagged with its arrival
+    time and sharpness score, so a turn can attach the clearest recent frame
+    instead of whichever one happened to arrive last.
+    """
+
+    def __init__(self, max_frames: int = FRAME_BUFFER_SIZE, window_seconds: float = FRAME_WINDOW_SECONDS,
+                 max_age: float = FRAME_MAX_AGE_SECONDS):
+        self.window_seconds = window_seconds
+        self.max_age = max_age # Older frames are dropped rather than kept around
+        self.frames = deque(maxlen=max_frames)  # (timestamp, mime_type, image_bytes, score)
+
+    def prune(self):
+        """ Drops frames older than max_age so an idle session does not hold on to them. """
+        cutoff = time.monotonic() - self.max_age
+        while self.frames and self.frames[0][0] < cutoff:
+            self.frames.popleft()
+
+    def add(self, image_bytes: bytes, mime_type: str = "image/jpeg", timestamp: float | None = None,
+            score: float | None = None) -> float:
+        """ Scores (unless a score is given) and stores a frame. Returns its sharpness score. """
+        if score is None:
+            try:
+                score = sharpness_score(image_bytes)
+            except Exception as e:
+                print(f"Error scoring video frame: {e}")
+                score = 0.0
+        self.frames.append((timestamp if timestamp is not None else time.monotonic(), mime_type, image_bytes, score))
+        self.prune()
+        return score
+
+    def add_data_url(self, frame_data_url: str) -> float:
+        """ Decodes a data URL from the client and stores the frame. """
+        mime_type, image_bytes = split_data_url(frame_data_url)
+        return self.add(image_bytes, mime_type)
+
+    def best(self, window_seconds: float | None = None) -> tuple[str, bytes] | None:
+        """
+        Returns (mime_type, image_bytes) for the sharpest frame seen in the last
+        window_seconds. Falls back to the newest frame if none are that recent.
+        """
+        self.prune()
+        if not self.frames:
+            return None
+        window = self.window_seconds if window_seconds is None else window_seconds
+        cutoff = time.monotonic() - window
+        candidates = [f for f in self.frames if f[0] >= cutoff] or [self.frames[-1]]
+        _, mime_type, image_bytes, _ = max(candidates, key=lambda f: f[3])
+        return mime_type, image_bytes
+
+    def clear(self):
+        self.frames.clear()
+
+    def __len__(self):
+        return len(self.frames)
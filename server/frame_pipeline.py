@@ -0,0 +1,114 @@
+# server/frame_pipeline.py
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import PIL.Image
+
+from frame_buffer import image_sharpness
+
+FRAME_MAX_EDGE = int(os.getenv("FRAME_MAX_EDGE", "1024"))          # Longest edge sent upstream
+FRAME_JPEG_QUALITY = int(os.getenv("FRAME_JPEG_QUALITY", "70"))    # Re-encode quality
+FRAME_WORKERS = int(os.getenv("FRAME_WORKERS", "2"))               # Threads shared by all sessions
+FRAME_MAX_PENDING = int(os.getenv("FRAME_MAX_PENDING", "8"))       # Frames in flight before new ones are dropped
+FRAME_CACHE_SIZE = int(os.getenv("FRAME_CACHE_SIZE", "64"))        # Normalized frames kept by content hash
+
+NormalizedFrame = namedtuple("NormalizedFrame", ["data", "mime_type", "size", "score"])
+
+
+def normalize_frame(image_bytes: bytes, max_edge: int = FRAME_MAX_EDGE, quality: int = FRAME_JPEG_QUALITY) -> NormalizedFrame:
+    """
+    Decodes an image, shrinks it so its longest edge is at most max_edge,
+    and re-encodes it as a JPEG at the target quality. Also scores its
+    sharpness while the pixels are already decoded.
+    """
+    img = PIL.Image.open(io.BytesIO(image_bytes))
+    # Let the JPEG decoder do most of the downscaling for big camera frames
+    img.draft("RGB", (max_edge, max_edge))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img.thumbnail((max_edge, max_edge))
+
+    image_io = io.BytesIO()
+    img.save(image_io, format="jpeg", quality=quality)
+    return NormalizedFrame(image_io.getvalue(), "image/jpeg", img.size, image_sharpness(img))
+
+
+class FramePipeline:
+    """
+    Normalizes client video frames (decode, resize, re-encode) on a small
+    bounded thread pool so the event loop never does codec work, and caches
+    results by content hash so repeated frames are only processed once.
+    """
+
+    def __init__(self, max_edge: int = FRAME_MAX_EDGE, quality: int = FRAME_JPEG_QUALITY,
+                 workers: int = FRAME_WORKERS, max_pending: int = FRAME_MAX_PENDING,
+                 cache_size: int = FRAME_CACHE_SIZE):
+        self.max_edge = max_edge
+        self.quality = quality
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-pipeline")
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.dropped = 0
+
+    def _cache_get(self, key):
+        with self.lock:
+            frame = self.cache.get(key)
+            if frame is not None:
+                self.cache.move_to_end(key)
+            return frame
+
+    def _cache_put(self, key, frame):
+        with self.lock:
+            self.cache[key] = frame
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    async def process(self, image_bytes: bytes) -> NormalizedFrame | None:
+        """
+        Returns the normalized frame, or None if the pool is saturated and the
+        frame was dropped (a newer frame will be along shortly).
+        """
+        key = hashlib.blake2b(image_bytes, digest_size=16).digest()
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return None
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            frame = await loop.run_in_executor(self.executor, normalize_frame, image_bytes, self.max_edge, self.quality)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+        self._cache_put(key, frame)
+        return frame
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_shared_pipeline = None
+_shared_pipeline_lock = threading.Lock()
+
+
+def get_frame_pipeline() -> FramePipeline:
+    """ Returns the process-wide pipeline shared by every session. """
+    global _shared_pipeline
+    with _shared_pipeline_lock:
+        if _shared_pipeline is None:
+            _shared_pipeline = FramePipeline()
+        return _shared_pipeline
@@ -0,0 +1,49 @@
+# server/genai_clients.py
+import os
+import threading
+
+import httpx
+from google import genai
+from google.genai import types
+
+GENAI_MAX_CONNECTIONS = int(os.getenv("GENAI_MAX_CONNECTIONS", "20"))          # Upper bound per client
+GENAI_MAX_KEEPALIVE = int(os.getenv("GENAI_MAX_KEEPALIVE", "10"))              # Idle connections kept open
+GENAI_KEEPALIVE_SECONDS = float(os.getenv("GENAI_KEEPALIVE_SECONDS", "60"))    # How long an idle connection is kept
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _http_options(api_version: str | None):
+    limits = httpx.Limits(max_connections=GENAI_MAX_CONNECTIONS,
+                          max_keepalive_connections=GENAI_MAX_KEEPALIVE,
+                          keepalive_expiry=GENAI_KEEPALIVE_SECONDS)
+    # The engines use client.aio, whose httpx pool is configured separately from the sync one
+    try:
+        return types.HttpOptions(api_version=api_version, client_args={"limits": limits},
+                                 async_client_args={"limits": limits})
+    except (TypeError, ValueError):
+        pass
+    try:
+        return types.HttpOptions(api_version=api_version, client_args={"limits": limits})
+    except (TypeError, ValueError):
+        # Older SDKs have no client_args; they still share the client's default pool
+        return types.HttpOptions(api_version=api_version)
+
+
+def get_genai_client(api_key: str | None = None, api_version: str | None = None) -> genai.Client:
+    """
+    Returns the process-wide genai client for (api_key, api_version), creating
+    it on first use. Sessions share the client and with it its HTTP connection
+    pool (bounded, with keep-alive), so creating a session opens nothing new.
+    The client's async API pools connections per event loop; the per-client
+    engines all run on the SessionManager loop and therefore share one pool.
+    """
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    key = (api_key, api_version)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = genai.Client(api_key=api_key, http_options=_http_options(api_version))
+            _clients[key] = client
+        return client
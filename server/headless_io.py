@@ -0,0 +1,203 @@
+# server/headless_io.py
+"""
+File-backed audio/video sources and sinks plus a local stub of the Live API,
+so the realtime pipeline in multimodal_live_api.py can run on hosts without
+a microphone, speaker, camera or network access.
+"""
+import asyncio
+import contextlib
+import io
+import math
+import os
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+import PIL.Image
+
+from audio_processing import PcmResampler
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class Pacer:
+    """ Sleeps so items come out at real-time rate, or not at all when realtime is False. """
+
+    def __init__(self, realtime: bool = True):
+        self.realtime = realtime
+        self.start = None
+
+    async def wait_until(self, media_seconds: float):
+        if not self.realtime:
+            await asyncio.sleep(0) # Still yield so other tasks run
+            return
+        if self.start is None:
+            self.start = time.monotonic()
+        delay = self.start + media_seconds - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def wav_chunks(path: str, sample_rate: int, chunk_frames: int, realtime: bool = True):
+    """ Yields 16-bit mono PCM chunks at sample_rate from a WAV file, paced like a microphone. """
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wav.getnchannels()
+        resampler = PcmResampler(wav.getframerate(), sample_rate) if wav.getframerate() != sample_rate else None
+        src_chunk = max(1, round(chunk_frames * wav.getframerate() / sample_rate))
+        pacer = Pacer(realtime)
+        sent_frames = 0
+
+        while True:
+            data = wav.readframes(src_chunk)
+            if not data:
+                break
+            if channels > 1: # Downmix to mono
+                samples = np.frombuffer(data, dtype="<i2").reshape(-1, channels)
+                data = samples.mean(axis=1).astype("<i2").tobytes()
+            if resampler:
+                data = resampler.process(data)
+            sent_frames += len(data) // 2
+            await pacer.wait_until(sent_frames / sample_rate)
+            yield data
+
+
+class WavSink:
+    """ Writes received 16-bit mono PCM to a WAV file instead of a speaker. """
+
+    def __init__(self, path: str, sample_rate: int):
+        self.wav = wave.open(path, "wb")
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(sample_rate)
+        self.bytes_written = 0
+
+    def write(self, pcm: bytes):
+        self.wav.writeframes(pcm)
+        self.bytes_written += len(pcm)
+
+    def close(self):
+        self.wav.close()
+
+
+def _encode_jpeg(img: PIL.Image.Image, max_edge: int = 1024) -> bytes:
+    img = img.convert("RGB")
+    img.thumbnail([max_edge, max_edge])
+    image_io = io.BytesIO()
+    img.save(image_io, format="jpeg")
+    return image_io.getvalue()
+
+
+async def video_frames(path: str, interval: float = 1.0, realtime: bool = True):
+    """
+    Yields JPEG bytes every `interval` seconds of media time from either a
+    directory of images (sorted by name, one per interval) or a video file.
+    """
+    pacer = Pacer(realtime)
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+        for index, name in enumerate(names):
+            await pacer.wait_until(index * interval)
+            with PIL.Image.open(os.path.join(path, name)) as img:
+                yield await asyncio.to_thread(_encode_jpeg, img)
+        return
+
+    import cv2 # Only needed for video files
+
+    cap = await asyncio.to_thread(cv2.VideoCapture, path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, round(fps * interval))
+        index = 0
+        while True:
+            ok, frame = await asyncio.to_thread(cap.read)
+            if not ok:
+                break
+            if index % step == 0:
+                await pacer.wait_until(index / fps)
+                img = PIL.Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                yield await asyncio.to_thread(_encode_jpeg, img)
+            index += 1
+    finally:
+        cap.release()
+
+
+# --- Stub Live endpoint ---
+
+class StubLiveSession:
+    """
+    Minimal stand-in for a Live API session. Every completed user turn (text
+    with end_of_turn, or the end of an audio segment) is answered with a short
+    tone as PCM audio plus a line of text. Traffic is counted for benchmarks.
+    """
+
+    def __init__(self, reply_seconds: float = 1.0, sample_rate: int = 24000, chunk_frames: int = 2400):
+        self.reply_seconds = reply_seconds
+        self.sample_rate = sample_rate
+        self.chunk_frames = chunk_frames
+        self.turns = asyncio.Queue()
+        self.stats = {"audio_bytes": 0, "image_bytes": 0, "text_turns": 0, "audio_turns": 0}
+        self.turn_started = None
+        self.latencies = [] # Seconds from end of user turn to first reply chunk
+
+    async def send(self, input=None, end_of_turn=False):
+        if isinstance(input, str):
+            if end_of_turn:
+                self.stats["text_turns"] += 1
+                await self._end_turn(f"You said: {input}")
+            return
+        if isinstance(input, dict):
+            data = input.get("data", b"")
+            mime_type = input.get("mime_type", "")
+            kind = "audio_bytes" if mime_type.startswith("audio/") else "image_bytes"
+            self.stats[kind] += len(data)
+            return
+        if getattr(input, "audio_stream_end", False):
+            self.stats["audio_turns"] += 1
+            await self._end_turn("I heard you.")
+
+    async def _end_turn(self, text):
+        self.turn_started = time.monotonic()
+        await self.turns.put(text)
+
+    def _reply_audio(self):
+        t = np.arange(int(self.reply_seconds * self.sample_rate)) / self.sample_rate
+        tone = (np.sin(2 * math.pi * 440.0 * t) * 8000).astype("<i2").tobytes()
+        step = self.chunk_frames * 2
+        return [tone[i:i + step] for i in range(0, len(tone), step)]
+
+    async def receive(self):
+        """ Yields the responses for one model turn, like session.receive(). """
+        text = await self.turns.get()
+        first = True
+        for chunk in self._reply_audio():
+            if first and self.turn_started is not None:
+                self.latencies.append(time.monotonic() - self.turn_started)
+                first = False
+            yield SimpleNamespace(data=chunk, text=None, server_content=None)
+            await asyncio.sleep(0)
+        yield SimpleNamespace(data=None, text=text + "\n", server_content=SimpleNamespace(interrupted=False, turn_complete=True))
+
+    def summary(self) -> str:
+        latency = f", mean reply latency {1000 * sum(self.latencies) / len(self.latencies):.1f} ms" if self.latencies else ""
+        return f"Stub session traffic: {self.stats}{latency}"
+
+
+class StubLiveClient:
+    """ Exposes .aio.live.connect(model=..., config=...) like genai.Client. """
+
+    def __init__(self, **session_kwargs):
+        self.session_kwargs = session_kwargs
+        self.sessions = []
+        self.aio = SimpleNamespace(live=SimpleNamespace(connect=self.connect))
+
+    @contextlib.asynccontextmanager
+    async def connect(self, model=None, config=None):
+        session = StubLiveSession(**self.session_kwargs)
+        self.sessions.append(session)
+        try:
+            yield session
+        finally:
+            print(session.summary())
@@ -0,0 +1,196 @@
+# server/live_session.py
+import asyncio
+import enum
+from collections import deque
+
+import websockets
+from google.genai import types
+
+from resilience import backoff_delay
+
+RECONNECT_BASE_DELAY = 0.5    # Seconds before the first reconnect attempt (before jitter)
+RECONNECT_MAX_DELAY = 15.0    # Upper bound on the backoff between attempts
+RECONNECT_MAX_ATTEMPTS = 8    # Consecutive failed connects before giving up
+HISTORY_TURNS = 20            # Turns kept for replay when a session cannot be resumed
+HISTORY_CHARS_PER_TURN = 2000 # Long turns are truncated in the replayed history
+
+
+class SessionState(enum.Enum):
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    RECONNECTING = "reconnecting"
+    CLOSED = "closed"
+
+
+class SessionLifecycle:
+    """
+    Tracks the state of a Gemini Live session so senders can block until it is
+    usable instead of polling. Every state change wakes all waiters.
+    """
+
+    def __init__(self):
+        self.state = SessionState.CONNECTING
+        self.session = None
+        self._changed = asyncio.Condition()
+        self._send_lock = asyncio.Lock()
+
+    async def _set(self, state, session=None):
+        async with self._changed:
+            self.state = state
+            self.session = session
+            self._changed.notify_all()
+
+    async def set_connected(self, session):
+        await self._set(SessionState.CONNECTED, session)
+
+    async def set_reconnecting(self):
+        await self._set(SessionState.RECONNECTING)
+
+    async def set_closed(self):
+        await self._set(SessionState.CLOSED)
+
+    def reset(self):
+        """ Returns a closed lifecycle to CONNECTING so it can be run again. """
+        self.state = SessionState.CONNECTING
+        self.session = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state is SessionState.CONNECTED and self.session is not None
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state is SessionState.CLOSED
+
+    async def wait_ready(self):
+        """ Blocks until the session is connected. Returns None once it is closed for good. """
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.is_ready or self.is_closed)
+            return self.session if self.is_ready else None
+
+    async def wait_closed(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.is_closed)
+
+    async def _wait_replaced(self, session):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.session is not session or self.is_closed)
+
+    async def send(self, input, end_of_turn: bool = False) -> bool:
+        """
+        Waits for a live session and sends input on it. Sends from different
+        tasks (text, frames, tool responses) are serialized but never wait on
+        the receive side. If the connection drops mid-send the input is retried
+        on the next session. Returns False if the session closed for good.
+        """
+        while True:
+            session = await self.wait_ready()
+            if session is None:
+                return False
+            try:
+                async with self._send_lock:
+                    await session.send(input=input, end_of_turn=end_of_turn)
+                return True
+            except websockets.exceptions.ConnectionClosed:
+                # The connection dropped under us; hold the input until a new session is up
+                await self._wait_replaced(session)
+
+
+class ReconnectingLiveSession(SessionLifecycle):
+    """
+    Keeps a Gemini Live connection alive across network drops. Reconnects with
+    jittered exponential backoff (and, given an Upstream, not before its
+    circuit breaker lets calls through again), resumes with the latest session resumption
+    handle when the server gave one, and otherwise replays a compacted text
+    history so the model keeps its context. Senders waiting on the lifecycle
+    simply block while reconnecting, so their inputs are held rather than lost.
+    """
+
+    def __init__(self, client, model, config, max_attempts: int = RECONNECT_MAX_ATTEMPTS,
+                 history_turns: int = HISTORY_TURNS, status_callback=None, upstream=None):
+        super().__init__()
+        self.client = client
+        self.model = model
+        self.config = config
+        self.max_attempts = max_attempts
+        self.history = deque(maxlen=history_turns) # (role, text) pairs, oldest first
+        self.resumption_handle = None
+        self.status_callback = status_callback
+        self.upstream = upstream # Optional resilience.Upstream whose breaker tracks connect failures
+
+    def record_turn(self, role: str, text: str):
+        """ Remembers a finished user or model turn for replay after a fresh reconnect. """
+        text = text.strip()
+        if text:
+            self.history.append((role, text[:HISTORY_CHARS_PER_TURN]))
+
+    def update_resumption(self, update):
+        """ Stores the newest handle from a session_resumption_update message. """
+        if update and getattr(update, "resumable", False) and getattr(update, "new_handle", None):
+            self.resumption_handle = update.new_handle
+
+    def _connect_config(self):
+        # Always ask for resumption updates; pass the handle once we have one
+        resumption = types.SessionResumptionConfig(handle=self.resumption_handle)
+        return self.config.model_copy(update={"session_resumption": resumption})
+
+    def _history_content(self):
+        return types.LiveClientContent(
+            turns=[types.Content(role=role, parts=[types.Part(text=text)]) for role, text in self.history],
+            turn_complete=False,
+        )
+
+    def _notify(self, message):
+        print(message)
+        if self.status_callback:
+            try:
+                self.status_callback(message)
+            except Exception as e:
+                print(f"Error in live session status callback: {e}")
+
+    async def run(self, receiver):
+        """
+        Connects and calls receiver(session) for every live connection. When the
+        receiver returns or raises, the connection is treated as dropped and
+        re-established, until max_attempts consecutive failures.
+        """
+        failures = 0
+        try:
+            while True:
+                resumed = self.resumption_handle is not None
+                connected = False
+                try:
+                    async with self.client.aio.live.connect(model=self.model, config=self._connect_config()) as session:
+                        if not resumed and self.history:
+                            # No server-side state to resume, so rebuild context from our own history
+                            await session.send(input=self._history_content(), end_of_turn=False)
+                            print(f"Replayed {len(self.history)} history turns into new live session.")
+                        await self.set_connected(session)
+                        print(f"Gemini live session {'resumed' if resumed else 'connected'}.")
+                        connected = True
+                        failures = 0
+                        if self.upstream:
+                            self.upstream.breaker.record_success()
+                        await receiver(session)
+                    print("Gemini live session ended by server.")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failures += 1
+                    if self.upstream:
+                        self.upstream.breaker.record_failure()
+                    print(f"Gemini live session dropped ({failures}/{self.max_attempts}): {e}")
+                    if resumed and not connected:
+                        # A stale handle can be why we failed; fall back to history replay next time
+                        self.resumption_handle = None
+                    if failures >= self.max_attempts:
+                        raise
+
+                await self.set_reconnecting()
+                delay = backoff_delay(failures, RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY)
+                if self.upstream:
+                    delay = max(delay, self.upstream.breaker.retry_after())
+                self._notify(f"Reconnecting to Gemini in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+        finally:
+            await self.set_closed()
@@ -0,0 +1,120 @@
+# server/location_index.py
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+LEARNED_ALIASES_MAX = 2048  # Place strings remembered from upstream answers
+
+US_STATES = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "florida": "fl", "georgia": "ga",
+    "hawaii": "hi", "idaho": "id", "illinois": "il", "indiana": "in", "iowa": "ia",
+    "kansas": "ks", "kentucky": "ky", "louisiana": "la", "maine": "me", "maryland": "md",
+    "massachusetts": "ma", "michigan": "mi", "minnesota": "mn", "mississippi": "ms", "missouri": "mo",
+    "montana": "mt", "nebraska": "ne", "nevada": "nv", "new hampshire": "nh", "new jersey": "nj",
+    "new mexico": "nm", "new york": "ny", "north carolina": "nc", "north dakota": "nd", "ohio": "oh",
+    "oklahoma": "ok", "oregon": "or", "pennsylvania": "pa", "rhode island": "ri", "south carolina": "sc",
+    "south dakota": "sd", "tennessee": "tn", "texas": "tx", "utah": "ut", "vermont": "vt",
+    "virginia": "va", "washington": "wa", "west virginia": "wv", "wisconsin": "wi", "wyoming": "wy",
+    "district of columbia": "dc",
+}
+STATE_CODES = set(US_STATES.values())
+AMBIGUOUS_STATES = {"georgia"} # Also a country; "Tbilisi, Georgia" must not become "tbilisi, ga"
+
+COUNTRIES = {
+    "usa": "us", "united states": "us", "united states of america": "us", "america": "us",
+    "uk": "uk", "united kingdom": "uk", "great britain": "uk", "england": "uk",
+}
+COUNTRY_CODES = set(COUNTRIES.values())
+
+# Common spoken or shorthand names, applied to the whole normalized string
+ALIASES = {
+    "nyc": "new york, ny",
+    "new york city": "new york, ny",
+    "new york": "new york, ny",
+    "manhattan": "new york, ny",
+    "la": "los angeles, ca",
+    "sf": "san francisco, ca",
+    "san fran": "san francisco, ca",
+    "dc": "washington, dc",
+    "washington dc": "washington, dc",
+    "philly": "philadelphia, pa",
+    "vegas": "las vegas, nv",
+    "atl": "atlanta, ga",
+    "nola": "new orleans, la",
+}
+
+_FILLER_PREFIXES = ("the city of ", "city of ", "the ")
+
+
+def normalize_location(text: str) -> str:
+    """
+    Canonical key for a free-text place: lowercase ASCII, no punctuation or
+    ZIP codes, the trailing US state as a two-letter code, a trailing
+    country dropped after a state, and shorthand names expanded. "NYC",
+    "new york, ny" and "New York City" all become "new york, ny". Only the
+    state/country position is rewritten, so the "Washington" in
+    "..., Washington, DC" stays a city. Keys are for caching only; upstream
+    services get the text as the user said it.
+    """
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii").lower()
+    text = re.sub(r"[^\w\s,]", " ", text.replace(".", "")) # "D.C." -> "dc", "St." -> "st"
+    text = re.sub(r"\b\d{5}(?:\s+\d{4})?\b", " ", text) # ZIP codes
+    parts = [" ".join(part.split()) for part in text.split(",")]
+    parts = [part for part in parts if part]
+    if not parts:
+        return ""
+    for prefix in _FILLER_PREFIXES:
+        if parts[0].startswith(prefix) and len(parts[0]) > len(prefix):
+            parts[0] = parts[0][len(prefix):]
+    if len(parts) == 1 and parts[0] not in ALIASES:
+        # "vinings ga" -> "vinings, ga"
+        words = parts[0].rsplit(" ", 1)
+        if len(words) == 2 and words[1] in STATE_CODES:
+            parts = words
+    if len(parts) > 1:
+        parts[-1] = COUNTRIES.get(parts[-1], parts[-1])
+        # The state is the last part, or the one before a trailing country
+        state = len(parts) - 2 if parts[-1] in COUNTRY_CODES and len(parts) > 2 else len(parts) - 1
+        if parts[state] not in AMBIGUOUS_STATES:
+            parts[state] = US_STATES.get(parts[state], parts[state])
+        if parts[-1] == "us" and len(parts) > 2 and parts[-2] in STATE_CODES:
+            parts.pop() # "new york, ny, usa" -> "new york, ny"
+    key = ", ".join(parts)
+    return ALIASES.get(key, key)
+
+
+class LocationIndex:
+    """
+    Maps free-text places to canonical keys so that caches keyed by place
+    hit for near-duplicate strings from voice transcripts. On top of the
+    static normalization it learns aliases from upstream answers, e.g. that
+    "the big apple" resolved to "New York, NY, USA". Keep one per session:
+    learned aliases can be user-relative ("home", "work").
+    """
+
+    def __init__(self, max_learned: int = LEARNED_ALIASES_MAX):
+        self.learned = OrderedDict() # normalized text -> canonical key
+        self.max_learned = max_learned
+        self.lock = threading.Lock()
+
+    def key(self, text: str) -> str:
+        normalized = normalize_location(text)
+        with self.lock:
+            canonical = self.learned.get(normalized)
+            if canonical is not None:
+                self.learned.move_to_end(normalized)
+                return canonical
+        return normalized
+
+    def learn(self, text: str, resolved: str):
+        """ Records that text names the place the upstream called resolved. """
+        normalized, canonical = normalize_location(text), normalize_location(resolved)
+        if not normalized or not canonical or normalized == canonical:
+            return
+        with self.lock:
+            self.learned[normalized] = canonical
+            self.learned.move_to_end(normalized)
+            while len(self.learned) > self.max_learned:
+                self.learned.popitem(last=False)
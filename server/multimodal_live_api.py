@@ -28,25 +28,39 @@ The default is "camera". To share your screen run:
 ```
 python Get_started_LiveAPI.py --mode screen
 ```
+
+## Headless runs
+
+Devices can be swapped for files, and the Live API for a local stub, so the
+pipeline runs on machines without a mic, speaker, camera or network:
+
+```
+python multimodal_live_api.py --audio-in question.wav --audio-out reply.wav --video-in frames/ --stub
+```
+
+`--video-in` takes a video file or a directory of JPEG/PNG images. With
+`--audio-in`, `--mode` defaults to "none", so no camera is opened unless asked
+for. pyaudio, mss and OpenCV are only imported by the device paths that need
+them, and `--stub` needs no `GOOGLE_API_KEY`. Inputs are
+paced in real time; add `--fast` to push them through as quickly as possible.
+The run ends once the input audio is used up and the last reply has arrived.
 """
 
 import asyncio
-import base64
-import io
 import os
 import sys
 import traceback
 
-import cv2
-import pyaudio
-import PIL.Image
-import mss
-
 import argparse
 
-from google import genai
+from google.genai import types
 from dotenv import load_dotenv # Added for API key loading
 
+from audio_processing import VoiceActivityGate, PcmRingBuffer, JitterBuffer, PLAYBACK_TARGET_MS
+from headless_io import wav_chunks, WavSink, video_frames, StubLiveClient
+from realtime_queue import RealtimeQueue
+from genai_clients import get_genai_client
+
 # --- Load Environment Variables ---
 load_dotenv()
 
@@ -56,11 +70,12 @@ if sys.version_info < (3, 11, 0):
     asyncio.TaskGroup = taskgroup.TaskGroup
     asyncio.ExceptionGroup = exceptiongroup.ExceptionGroup
 
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 SEND_SAMPLE_RATE = 16000
 RECEIVE_SAMPLE_RATE = 24000
 CHUNK_SIZE = 1024
+MIC_BUFFER_SECONDS = 2 # Mic audio the ring holds if the sender falls behind
+FINAL_REPLY_TIMEOUT = 30 # Seconds a headless run waits for the reply to its last input
 
 MODEL = "models/gemini-2.0-flash-live-001"
 
@@ -68,18 +83,53 @@ DEFAULT_MODE = "camera"
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-client = genai.Client(api_key=GOOGLE_API_KEY,http_options={"api_version": "v1beta"})
-
 CONFIG = {"response_modalities": ["AUDIO"]}
 
-pya = pyaudio.PyAudio()
+pyaudio = None # Set by get_pyaudio()
+pya = None
+
+
+def get_pyaudio():
+    # Imported and created on first use so headless runs need neither PortAudio nor audio devices
+    global pyaudio, pya
+    if pya is None:
+        import pyaudio as portaudio
+        pyaudio = portaudio
+        pya = pyaudio.PyAudio()
+    return pya
 
 
 class AudioLoop:
-    def __init__(self, video_mode=DEFAULT_MODE):
+    def __init__(self, video_mode=DEFAULT_MODE, use_vad=True, playback_latency_ms=PLAYBACK_TARGET_MS,
+                 audio_in=None, audio_out=None, video_in=None, realtime=True, live_client=None,
+                 monitor=0, region=None):
         self.video_mode = video_mode
+        self.screen = None
+        if video_mode == "screen" and not video_in:
+            from screen_capture import ScreenCapturer # mss is only needed to capture a real screen
+            self.screen = ScreenCapturer(monitor=monitor, region=region)
+        self.camera = None
+        # Headless sources/sinks: files instead of mic, speaker and camera
+        self.audio_in = audio_in
+        self.audio_out = audio_out
+        self.video_in = video_in
+        self.realtime = realtime
+        self.audio_sink = None
+        # The real client needs GOOGLE_API_KEY, so it is only made when no stub is given
+        self.live_client = live_client or get_genai_client(GOOGLE_API_KEY, "v1beta")
+        self.turn_complete = asyncio.Event()
+        self.turns_requested = 0 # Audio segments ended by us
+        self.turns_completed = 0 # Model turns finished
+        # Only speech segments are uploaded; silence stays local
+        self.vad = VoiceActivityGate(sample_rate=SEND_SAMPLE_RATE) if use_vad else None
+
+        # PortAudio callbacks and the asyncio tasks hand audio over through these preallocated rings
+        self.mic_buffer = PcmRingBuffer(SEND_SAMPLE_RATE * 2 * MIC_BUFFER_SECONDS)
+        self.mic_ready = None
+        self.mic_overflows = 0
+        self.playback = JitterBuffer(RECEIVE_SAMPLE_RATE, target_latency_ms=playback_latency_ms)
+        self.loop = None
 
-        self.audio_in_queue = None
         self.out_queue = None
 
         self.session = None
@@ -98,158 +148,209 @@ class AudioLoop:
                 break
             await self.session.send(input=text or ".", end_of_turn=True)
 
-    def _get_frame(self, cap):
-        # Read the frameq
-        ret, frame = cap.read()
-        # Check if the frame was read successfully
-        if not ret:
+    def _get_frame(self):
+        # The broker thread keeps the camera drained; this only encodes its newest frame
+        image_bytes = self.camera.snapshot_jpeg(max_edge=1024)
+        if image_bytes is None:
             return None
-        # Fix: Convert BGR to RGB color space
-        # OpenCV captures in BGR but PIL expects RGB format
-        # This prevents the blue tint in the video feed
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = PIL.Image.fromarray(frame_rgb)  # Now using RGB frame
-        img.thumbnail([1024, 1024])
-
-        image_io = io.BytesIO()
-        img.save(image_io, format="jpeg")
-        image_io.seek(0)
-
-        mime_type = "image/jpeg"
-        image_bytes = image_io.read()
-        return {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode()}
+        return {"mime_type": "image/jpeg", "data": image_bytes}
 
     async def get_frames(self):
-        # This takes about a second, and will block the whole program
-        # causing the audio pipeline to overflow if you don't to_thread it.
-        cap = await asyncio.to_thread(
-            cv2.VideoCapture, 0
-        )  # 0 represents the default camera
-
-        while True:
-            frame = await asyncio.to_thread(self._get_frame, cap)
-            if frame is None:
-                break
-
-            await asyncio.sleep(1.0)
+        from camera_broker import get_camera_broker # cv2 is only needed for a real camera
+        # Shared with any other consumer of the same camera (widgets, previews)
+        self.camera = get_camera_broker(0).acquire()  # 0 represents the default camera
+        try:
+            while True:
+                await asyncio.sleep(1.0) # Pace first, so each frame is sent as soon as it is grabbed
 
-            await self.out_queue.put(frame)
+                frame = await asyncio.to_thread(self._get_frame)
+                if frame is None:
+                    break
 
-        # Release the VideoCapture object
-        cap.release()
+                await self.out_queue.put_video(frame)
+        finally:
+            self.camera.release()
 
     def _get_screen(self):
-        sct = mss.mss()
-        monitor = sct.monitors[0]
-
-        i = sct.grab(monitor)
-
-        mime_type = "image/jpeg"
-        image_bytes = mss.tools.to_png(i.rgb, i.size)
-        img = PIL.Image.open(io.BytesIO(image_bytes))
-
-        image_io = io.BytesIO()
-        img.save(image_io, format="jpeg")
-        image_io.seek(0)
-
-        image_bytes = image_io.read()
-        return {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode()}
+        # Encodes straight from the raw capture buffer; None when nothing on screen changed
+        image_bytes = self.screen.capture()
+        if image_bytes is None:
+            return None
+        return {"mime_type": "image/jpeg", "data": image_bytes}
 
     async def get_screen(self):
 
         while True:
-            frame = await asyncio.to_thread(self._get_screen)
-            if frame is None:
-                break
-
             await asyncio.sleep(1.0)
 
-            await self.out_queue.put(frame)
+            frame = await asyncio.to_thread(self._get_screen)
+            if frame is not None:
+                await self.out_queue.put_video(frame)
 
     async def send_realtime(self):
         while True:
             msg = await self.out_queue.get()
             await self.session.send(input=msg)
 
+    async def get_file_frames(self):
+        async for image_bytes in video_frames(self.video_in, interval=1.0, realtime=self.realtime):
+            await self.out_queue.put_video({"mime_type": "image/jpeg", "data": image_bytes})
+
+    async def _forward_audio(self, data):
+        if not self.vad:
+            await self.out_queue.put_audio({"data": data, "mime_type": "audio/pcm"})
+            return
+        for item in self.vad.process(data):
+            if item is VoiceActivityGate.END:
+                await self._end_audio_segment()
+            else:
+                await self.out_queue.put_audio({"data": item, "mime_type": "audio/pcm"})
+
+    async def _end_audio_segment(self):
+        # Tell the server the utterance is over so it can respond right away
+        self.turns_requested += 1
+        await self.out_queue.put_audio(types.LiveClientRealtimeInput(audio_stream_end=True))
+
+    async def listen_file_audio(self):
+        """ Feeds a WAV file through the same path as the mic, then waits for the last reply. """
+        async for data in wav_chunks(self.audio_in, SEND_SAMPLE_RATE, CHUNK_SIZE, realtime=self.realtime):
+            await self._forward_audio(data)
+        if not self.vad or self.vad.flush():
+            await self._end_audio_segment()
+        try:
+            while self.turns_completed < self.turns_requested:
+                self.turn_complete.clear()
+                await asyncio.wait_for(self.turn_complete.wait(), timeout=FINAL_REPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("Timed out waiting for the final reply.")
+
+    def _mic_callback(self, in_data, frame_count, time_info, status):
+        # Runs on the PortAudio thread: copy into the ring and wake the asyncio side
+        if status & pyaudio.paInputOverflow:
+            self.mic_overflows += 1
+        self.mic_buffer.write(in_data)
+        try:
+            self.loop.call_soon_threadsafe(self.mic_ready.set)
+        except RuntimeError:
+            pass # Event loop already closed during shutdown
+        return (None, pyaudio.paContinue)
+
     async def listen_audio(self):
+        pya = get_pyaudio()
         mic_info = pya.get_default_input_device_info()
+        self.loop = asyncio.get_running_loop()
+        self.mic_ready = asyncio.Event()
         self.audio_stream = await asyncio.to_thread(
             pya.open,
-            format=FORMAT,
+            format=pyaudio.paInt16,
             channels=CHANNELS,
             rate=SEND_SAMPLE_RATE,
             input=True,
             input_device_index=mic_info["index"],
             frames_per_buffer=CHUNK_SIZE,
+            stream_callback=self._mic_callback,
         )
-        if __debug__:
-            kwargs = {"exception_on_overflow": False}
-        else:
-            kwargs = {}
         while True:
-            data = await asyncio.to_thread(self.audio_stream.read, CHUNK_SIZE, **kwargs)
-            await self.out_queue.put({"data": data, "mime_type": "audio/pcm"})
+            await self.mic_ready.wait()
+            self.mic_ready.clear()
+            data = self.mic_buffer.read(self.mic_buffer.capacity) # Everything captured since the last wake-up
+            if data:
+                await self._forward_audio(data)
 
     async def receive_audio(self):
-        "Background task to reads from the websocket and write pcm chunks to the output queue"
+        "Background task to reads from the websocket and write pcm chunks to the playback buffer"
         while True:
             turn = self.session.receive()
+            interrupted = False
             async for response in turn:
                 if data := response.data:
-                    self.audio_in_queue.put_nowait(data)
+                    if self.audio_sink:
+                        self.audio_sink.write(data)
+                    else:
+                        self.playback.write(data)
                     continue
                 if text := response.text:
                     print(text, end="")
+                if response.server_content and response.server_content.interrupted:
+                    interrupted = True
 
             # If you interrupt the model, it sends a turn_complete.
-            # For interruptions to work, we need to stop playback.
-            # So empty out the audio queue because it may have loaded
-            # much more audio than has played yet.
-            while not self.audio_in_queue.empty():
-                self.audio_in_queue.get_nowait()
+            # For interruptions to work, we need to stop playback, so drop
+            # whatever audio is still buffered. Otherwise let the tail play out.
+            if interrupted:
+                self.playback.clear()
+            else:
+                self.playback.end_of_stream()
+            self.turns_completed += 1
+            self.turn_complete.set()
+
+    def _speaker_callback(self, in_data, frame_count, time_info, status):
+        # Runs on the PortAudio thread; the jitter buffer pads with silence when empty
+        return (self.playback.read_frames(frame_count * CHANNELS * 2), pyaudio.paContinue)
 
     async def play_audio(self):
+        pya = get_pyaudio()
         stream = await asyncio.to_thread(
             pya.open,
-            format=FORMAT,
+            format=pyaudio.paInt16,
             channels=CHANNELS,
             rate=RECEIVE_SAMPLE_RATE,
             output=True,
+            frames_per_buffer=CHUNK_SIZE,
+            stream_callback=self._speaker_callback,
         )
-        while True:
-            bytestream = await self.audio_in_queue.get()
-            await asyncio.to_thread(stream.write, bytestream)
+        try:
+            await asyncio.Future() # Playback runs on the PortAudio thread until cancelled
+        finally:
+            stream.stop_stream()
+            stream.close()
+            print(f"Playback underruns: {self.playback.underruns}, mic overflows: {self.mic_overflows}, "
+                  f"realtime queue: {self.out_queue.stats}")
 
     async def run(self):
+        if self.audio_out:
+            self.audio_sink = WavSink(self.audio_out, RECEIVE_SAMPLE_RATE)
         try:
             async with (
-                client.aio.live.connect(model=MODEL, config=CONFIG) as session,
+                self.live_client.aio.live.connect(model=MODEL, config=CONFIG) as session,
                 asyncio.TaskGroup() as tg,
             ):
                 self.session = session
 
-                self.audio_in_queue = asyncio.Queue()
-                self.out_queue = asyncio.Queue(maxsize=5)
+                # Raw-bytes frames; audio is always sent ahead of queued video
+                self.out_queue = RealtimeQueue()
 
-                send_text_task = tg.create_task(self.send_text())
                 tg.create_task(self.send_realtime())
-                tg.create_task(self.listen_audio())
-                if self.video_mode == "camera":
+                if self.audio_in:
+                    # Headless: the run ends when the file is used up and answered
+                    exit_task = tg.create_task(self.listen_file_audio())
+                else:
+                    exit_task = tg.create_task(self.send_text())
+                    tg.create_task(self.listen_audio())
+                if self.video_in:
+                    tg.create_task(self.get_file_frames())
+                elif self.video_mode == "camera":
                     tg.create_task(self.get_frames())
                 elif self.video_mode == "screen":
                     tg.create_task(self.get_screen())
 
                 tg.create_task(self.receive_audio())
-                tg.create_task(self.play_audio())
+                if not self.audio_sink:
+                    tg.create_task(self.play_audio())
 
-                await send_text_task
+                await exit_task
                 raise asyncio.CancelledError("User requested exit")
 
         except asyncio.CancelledError:
             pass
         except ExceptionGroup as EG:
-            self.audio_stream.close()
+            if getattr(self, "audio_stream", None):
+                self.audio_stream.close()
             traceback.print_exception(EG)
+        finally:
+            if self.audio_sink:
+                self.audio_sink.close()
+                print(f"Wrote {self.audio_sink.bytes_written // 2 / RECEIVE_SAMPLE_RATE:.2f}s of audio to {self.audio_out}")
 
 
 if __name__ == "__main__":
@@ -257,10 +358,44 @@ if __name__ == "__main__":
     parser.add_argument(
         "--mode",
         type=str,
-        default=DEFAULT_MODE,
-        help="pixels to stream from",
+        help=f"pixels to stream from (default: {DEFAULT_MODE}, or none with --audio-in)",
         choices=["camera", "screen", "none"],
     )
+    parser.add_argument(
+        "--no-vad",
+        action="store_true",
+        help="stream all microphone audio, including silence",
+    )
+    parser.add_argument(
+        "--playback-latency-ms",
+        type=int,
+        default=PLAYBACK_TARGET_MS,
+        help="audio buffered before playback starts (jitter buffer target)",
+    )
+    parser.add_argument("--monitor", type=int, default=0, help="mss monitor index for screen mode (0 = all monitors)")
+    parser.add_argument("--region", type=str, help="screen region to capture as left,top,width,height")
+    parser.add_argument("--audio-in", type=str, help="WAV file to use instead of the microphone")
+    parser.add_argument("--audio-out", type=str, help="WAV file to write replies to instead of the speaker")
+    parser.add_argument("--video-in", type=str, help="video file or directory of images to use instead of camera/screen")
+    parser.add_argument("--fast", action="store_true", help="feed file inputs as fast as possible instead of in real time")
+    parser.add_argument("--stub", action="store_true", help="talk to a local stub instead of the Live API")
     args = parser.parse_args()
-    main = AudioLoop(video_mode=args.mode)
+    region = None
+    if args.region:
+        left, top, width, height = (int(v) for v in args.region.split(","))
+        region = {"left": left, "top": top, "width": width, "height": height}
+    # Headless runs stay off the camera unless asked for it
+    video_mode = args.mode or ("none" if args.audio_in else DEFAULT_MODE)
+    main = AudioLoop(
+        video_mode=video_mode,
+        use_vad=not args.no_vad,
+        playback_latency_ms=args.playback_latency_ms,
+        audio_in=args.audio_in,
+        audio_out=args.audio_out,
+        video_in=args.video_in,
+        realtime=not args.fast,
+        live_client=StubLiveClient() if args.stub else None,
+        monitor=args.monitor,
+        region=region,
+    )
     asyncio.run(main.run())
\ No newline at end of file
@@ -0,0 +1,186 @@
+# server/outbound.py
+import asyncio
+import os
+import time
+from collections import deque
+
+from wire_codec import JsonCodec
+
+# Priority classes, highest first
+AUDIO = 0 # receive_audio_chunk
+TEXT = 1  # receive_text_chunk, status and error messages
+BULK = 2  # Widget payloads: search results, maps, weather, code
+
+OUTBOUND_LIMITS = {AUDIO: 64, TEXT: 256, BULK: 16} # Items buffered per class
+BULK_STALE_SECONDS = 15.0 # Widget updates older than this are not worth sending any more
+
+TEXT_BATCH_MS = int(os.getenv("TEXT_BATCH_MS", "30"))         # How long text deltas are coalesced before an emit
+TEXT_BATCH_BYTES = int(os.getenv("TEXT_BATCH_BYTES", "512"))  # Emit early once this much text is pending
+
+
+class OutboundScheduler:
+    """
+    Per-client Socket.IO emitter with priority classes. Audio and text share
+    one sender that always takes audio first; bulk widget payloads have their
+    own sender, which only starts an emit while no audio or text is waiting, so
+    a large search result can never hold up speech. Each class has a bounded
+    buffer: send() waits for room (backpressure on the engine), emit() never
+    waits and drops the oldest item instead. Bulk items emitted with a key
+    replace a still-queued item with the same key, and stale ones are dropped.
+    Must be used from the event loop that runs the engine.
+    """
+
+    def __init__(self, socketio, client_sid, limits: dict | None = None, stale_seconds: float = BULK_STALE_SECONDS,
+                 codec=None):
+        self.socketio = socketio
+        self.client_sid = client_sid
+        self.codec = codec or JsonCodec() # Negotiated wire encoding for this client
+        self.limits = dict(OUTBOUND_LIMITS, **(limits or {}))
+        self.stale_seconds = stale_seconds
+        self.lanes = {priority: deque() for priority in self.limits}
+        self.realtime_ready = asyncio.Event() # Audio or text was queued
+        self.realtime_idle = asyncio.Event()  # No audio or text is waiting
+        self.realtime_idle.set()
+        self.bulk_ready = asyncio.Event()
+        self.space = asyncio.Event()          # An item left some lane
+        self.tasks = []
+        self.stats = {"sent": 0, "dropped": 0, "superseded": 0, "stale": 0, "blocked": 0, "high_water": 0}
+
+    def start(self):
+        if not self.tasks:
+            loop = asyncio.get_running_loop()
+            self.tasks = [loop.create_task(self._realtime_sender()), loop.create_task(self._bulk_sender())]
+
+    async def stop(self):
+        """ Stops sending; anything still queued is discarded. """
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        for lane in self.lanes.values():
+            lane.clear()
+        self.realtime_idle.set()
+
+    def congested(self, priority: int = AUDIO) -> bool:
+        """ True once a class is more than half full, a hint to slow down or skip optional output. """
+        return len(self.lanes[priority]) > self.limits[priority] // 2
+
+    def emit(self, event, data, priority: int = TEXT, key=None) -> bool:
+        """ Queues an emit without waiting. Returns False if an older item had to be dropped to make room. """
+        lane = self.lanes[priority]
+        if key is not None:
+            for item in lane:
+                if item[2] == key:
+                    lane.remove(item)
+                    self.stats["superseded"] += 1
+                    break
+        room = len(lane) < self.limits[priority]
+        if not room:
+            lane.popleft()
+            self.stats["dropped"] += 1
+        lane.append((event, data, key, time.monotonic()))
+        self.stats["high_water"] = max(self.stats["high_water"], len(lane))
+        if priority == BULK:
+            self.bulk_ready.set()
+        else:
+            self.realtime_idle.clear()
+            self.realtime_ready.set()
+        return room
+
+    async def send(self, event, data, priority: int = TEXT, key=None):
+        """ Queues an emit, waiting while this class's buffer is full. """
+        if len(self.lanes[priority]) >= self.limits[priority]:
+            self.stats["blocked"] += 1
+        while len(self.lanes[priority]) >= self.limits[priority]:
+            self.space.clear()
+            await self.space.wait()
+        self.emit(event, data, priority, key)
+
+    def _encode_and_emit(self, event, data):
+        self.socketio.emit(event, self.codec.encode(data), room=self.client_sid)
+
+    async def _emit(self, item):
+        event, data, _, _ = item
+        try:
+            # Encoding and Socket.IO writes (which can block on a slow client) stay off the event loop
+            await asyncio.to_thread(self._encode_and_emit, event, data)
+            self.stats["sent"] += 1
+        except Exception as e:
+            print(f"Error emitting {event} to SID {self.client_sid}: {e}")
+
+    async def _realtime_sender(self):
+        audio, text = self.lanes[AUDIO], self.lanes[TEXT]
+        while True:
+            if not audio and not text:
+                self.realtime_idle.set()
+                self.realtime_ready.clear()
+                await self.realtime_ready.wait()
+                continue
+            item = (audio or text).popleft()
+            self.space.set()
+            await self._emit(item)
+
+    async def _bulk_sender(self):
+        bulk = self.lanes[BULK]
+        while True:
+            if not bulk:
+                self.bulk_ready.clear()
+                await self.bulk_ready.wait()
+                continue
+            await self.realtime_idle.wait() # Audio and text always go first
+            if not bulk:
+                continue
+            item = bulk.popleft()
+            self.space.set()
+            if time.monotonic() - item[3] > self.stale_seconds:
+                self.stats["stale"] += 1
+                continue
+            await self._emit(item)
+
+
+class TextBatcher:
+    """
+    Coalesces streamed text deltas into fewer receive_text_chunk emits. Text is
+    held for at most window_ms, or until max_bytes are pending, then sent as
+    one chunk; flush() sends the remainder right away and is called at turn end.
+    """
+
+    def __init__(self, outbound: OutboundScheduler, event: str = "receive_text_chunk",
+                 window_ms: int = TEXT_BATCH_MS, max_bytes: int = TEXT_BATCH_BYTES):
+        self.outbound = outbound
+        self.event = event
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.parts = []
+        self.size = 0
+        self.timer = None
+
+    async def add(self, text: str):
+        if not text:
+            return
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.max_bytes or self.window <= 0:
+            await self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush_nowait)
+
+    def _take(self) -> str:
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        text = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        return text
+
+    def flush_nowait(self):
+        """ Emits pending text without waiting, e.g. from cleanup code that must not block. """
+        text = self._take()
+        if text:
+            self.outbound.emit(self.event, {"text": text}, TEXT)
+
+    async def flush(self):
+        text = self._take()
+        if text:
+            await self.outbound.send(self.event, {"text": text}, TEXT)
@@ -0,0 +1,168 @@
+# server/page_cache.py
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+
+PAGE_CACHE_PATH = os.getenv("ADA_PAGE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "ada_page_cache.sqlite3"))
+PAGE_CACHE_MAX_MB = float(os.getenv("ADA_PAGE_CACHE_MAX_MB", "64"))            # Stored (compressed) results; 0 disables the cache
+PAGE_CACHE_DEFAULT_TTL = float(os.getenv("ADA_PAGE_CACHE_DEFAULT_TTL", "3600"))  # Freshness when a page sends no cache headers
+
+
+def freshness_lifetime(headers, default_ttl: float = PAGE_CACHE_DEFAULT_TTL) -> float | None:
+    """
+    Seconds a response may be reused without revalidation, from its
+    Cache-Control or Expires header. None if it must not be stored at all;
+    0 if it may be stored but has to be revalidated every time.
+    """
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    if "max-age" in directives:
+        try:
+            return max(0.0, float(directives["max-age"]))
+        except ValueError:
+            return 0.0
+    if headers.get("Expires"):
+        try:
+            return max(0.0, parsedate_to_datetime(headers["Expires"]).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0.0 # Invalid Expires means already expired
+    return default_ttl
+
+
+class CachedPage:
+    def __init__(self, result: dict, etag: str | None, last_modified: str | None, fresh_until: float):
+        self.result = result
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh_until = fresh_until
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+    def conditional_headers(self) -> dict:
+        """ Request headers that let the server answer 304 Not Modified. """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    On-disk cache of extracted search page results keyed by URL, in one
+    SQLite file shared by all worker processes (WAL mode, so readers never
+    wait on a writer). Results are stored as compressed JSON together with
+    their validators; stale entries are revalidated with a conditional
+    request. When the stored results outgrow max_bytes, the least recently
+    used pages are evicted. Calls block briefly; use them via to_thread.
+    """
+
+    def __init__(self, path: str = PAGE_CACHE_PATH, max_bytes: int = int(PAGE_CACHE_MAX_MB * 1024 * 1024),
+                 default_ttl: float = PAGE_CACHE_DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            fresh_until REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            result BLOB NOT NULL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def get(self, url: str) -> CachedPage | None:
+        """ The cached page for url, fresh or stale, or None. """
+        with self.lock:
+            row = self.db.execute("SELECT etag, last_modified, fresh_until, result FROM pages WHERE url = ?",
+                                  (url,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.db.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        etag, last_modified, fresh_until, blob = row
+        page = CachedPage(json.loads(zlib.decompress(blob)), etag, last_modified, fresh_until)
+        if page.fresh:
+            self.stats["hits"] += 1
+        return page
+
+    def put(self, url: str, result: dict, headers):
+        """ Stores a freshly fetched result unless its headers forbid it. """
+        lifetime = freshness_lifetime(headers, self.default_ttl)
+        if lifetime is None:
+            return
+        blob = zlib.compress(json.dumps(result).encode("utf-8"))
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (url, headers.get("ETag"), headers.get("Last-Modified"), now + lifetime, now, len(blob), blob))
+            self.stats["stored"] += 1
+            self._evict()
+
+    def revalidated(self, url: str, headers):
+        """ Extends a stale entry after the server answered 304 Not Modified. """
+        lifetime = freshness_lifetime(headers, self.default_ttl)
+        with self.lock:
+            if lifetime is None:
+                self.db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                return
+            self.db.execute("UPDATE pages SET fresh_until = ?, etag = COALESCE(?, etag), "
+                            "last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                            (time.time() + lifetime, headers.get("ETag"), headers.get("Last-Modified"), url))
+            self.stats["revalidated"] += 1
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so we don't evict on every store
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for url, size in self.db.execute("SELECT url, size FROM pages ORDER BY accessed_at"):
+            if freed >= excess:
+                break
+            victims.append((url,))
+            freed += size
+        self.db.executemany("DELETE FROM pages WHERE url = ?", victims)
+        self.stats["evicted"] += len(victims)
+
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache | None:
+    """ Returns the process-wide page cache, or None if it is disabled or cannot be opened. """
+    global _page_cache
+    if PAGE_CACHE_MAX_MB <= 0:
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            try:
+                _page_cache = PageCache()
+            except sqlite3.Error as e:
+                print(f"Page cache disabled, could not open {PAGE_CACHE_PATH}: {e}")
+                return None
+        return _page_cache
@@ -0,0 +1,147 @@
+# server/place_services.py
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import googlemaps
+import python_weather
+
+from location_index import LocationIndex, normalize_location
+
+WEATHER_CACHE_SECONDS = float(os.getenv("ADA_WEATHER_CACHE_SECONDS", "600"))        # Conditions change slowly
+DIRECTIONS_CACHE_SECONDS = float(os.getenv("ADA_DIRECTIONS_CACHE_SECONDS", "300"))  # Traffic does not
+PLACE_CACHE_SIZE = 512       # Entries kept per cache
+MAPS_TIMEOUT_SECONDS = 10    # Per request; tool deadlines cut the wait short, not the request
+MAPS_RETRY_SECONDS = 20      # Total time googlemaps may spend retrying one call
+
+
+class TtlCache:
+    """ Small thread-safe LRU cache whose entries expire after ttl seconds. """
+
+    def __init__(self, ttl: float, max_entries: int = PLACE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key, count: bool = True):
+        with self.lock:
+            entry = self.entries.get(key)
+            hit = entry is not None and entry[0] > time.monotonic()
+            if count:
+                self.stats["hits" if hit else "misses"] += 1
+            if not hit:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class WeatherService:
+    """
+    Long-lived python_weather clients (one per event loop and unit, since
+    each owns an aiohttp session bound to its loop) with forecasts cached
+    per canonical place, so "NYC" and "New York City" share one lookup.
+    """
+
+    def __init__(self, ttl: float = WEATHER_CACHE_SECONDS):
+        self.cache = TtlCache(ttl)
+        self.clients = weakref.WeakKeyDictionary() # Event loop -> {unit: client}
+
+    def _client(self, unit):
+        clients = self.clients.setdefault(asyncio.get_running_loop(), {})
+        client = clients.get(unit)
+        if client is None:
+            client = clients[unit] = python_weather.Client(unit=unit)
+        return client
+
+    def cached(self, location: str, unit=python_weather.IMPERIAL):
+        """ The cached forecast for location, or None; never makes a request. """
+        return self.cache.get((normalize_location(location), unit), count=False)
+
+    async def get(self, location: str, unit=python_weather.IMPERIAL):
+        key = normalize_location(location)
+        weather = self.cache.get((key, unit))
+        if weather is None:
+            weather = await self._client(unit).get(location)
+            self.cache.put((key, unit), weather)
+        return weather
+
+    async def close(self):
+        """ Closes the clients of the running event loop, e.g. before an asyncio.run() ends. """
+        for client in self.clients.pop(asyncio.get_running_loop(), {}).values():
+            await client.close()
+
+
+class MapsService:
+    """
+    One googlemaps client (and with it one pooled HTTP session) per API
+    key, shared by all sessions, with directions cached per geocoded
+    origin, destination and mode. Calls block; run them via to_thread.
+
+    The shared cache is only written under keys made from the addresses
+    Maps resolved, never under what a user typed: text like "home" means a
+    different place per user. Pass the session's LocationIndex, which
+    learns what its own text resolved to, so repeat questions hit the cache.
+    """
+
+    def __init__(self, api_key: str, ttl: float = DIRECTIONS_CACHE_SECONDS):
+        self.client = googlemaps.Client(key=api_key, timeout=MAPS_TIMEOUT_SECONDS, retry_timeout=MAPS_RETRY_SECONDS)
+        self.cache = TtlCache(ttl)
+
+    @staticmethod
+    def _key(origin: str, destination: str, mode: str, index: LocationIndex | None):
+        key = index.key if index else normalize_location
+        return key(origin), key(destination), mode
+
+    def cached(self, origin: str, destination: str, mode: str = "driving", index: LocationIndex | None = None):
+        """ Cached directions, or None; never makes a request. """
+        return self.cache.get(self._key(origin, destination, mode, index), count=False)
+
+    def directions(self, origin: str, destination: str, mode: str = "driving", departure_time=None,
+                   index: LocationIndex | None = None) -> list:
+        result = self.cache.get(self._key(origin, destination, mode, index))
+        if result is None:
+            result = self.client.directions(origin, destination, mode=mode, departure_time=departure_time)
+            if result:
+                leg = result[0]['legs'][0]
+                start, end = leg.get('start_address', ''), leg.get('end_address', '')
+                resolved = (normalize_location(start), normalize_location(end), mode)
+                if resolved[0] and resolved[1]:
+                    self.cache.put(resolved, result)
+                if index is not None:
+                    # Geocoded addresses are reliable enough to teach the session's index (weather areas are not)
+                    index.learn(origin, start)
+                    index.learn(destination, end)
+        return result
+
+
+_weather_service = WeatherService()
+_maps_services = {}
+_maps_services_lock = threading.Lock()
+
+
+def get_weather_service() -> WeatherService:
+    return _weather_service
+
+
+def get_maps_service(api_key: str) -> MapsService | None:
+    """ Returns the process-wide MapsService for api_key, creating it on first use; None if the key is rejected. """
+    with _maps_services_lock:
+        service = _maps_services.get(api_key)
+        if service is None:
+            try:
+                service = _maps_services[api_key] = MapsService(api_key)
+            except ValueError as e: # googlemaps validates the key format up front
+                print(f"Error: Could not create Google Maps client: {e}")
+        return service
@@ -0,0 +1,54 @@
+# server/realtime_queue.py
+import asyncio
+from collections import deque
+
+REALTIME_AUDIO_MAX = 32  # Audio chunks (and end-of-speech markers) waiting to be sent
+REALTIME_VIDEO_MAX = 1   # Video frames waiting; a newer frame replaces the oldest
+
+
+class RealtimeQueue:
+    """
+    Outbound queue for realtime inputs with separate audio and video lanes.
+    Items are sent as raw bytes ({"data": bytes, "mime_type": ...}) and only
+    encoded once, by the SDK. get() always drains audio first, so a queued
+    image never delays speech. A full audio lane makes put_audio() wait
+    (backpressure on the mic side); a full video lane drops the oldest frame,
+    since only the newest picture is worth sending.
+    """
+
+    def __init__(self, audio_max: int = REALTIME_AUDIO_MAX, video_max: int = REALTIME_VIDEO_MAX):
+        self.audio = deque()
+        self.video = deque()
+        self.audio_max = audio_max
+        self.video_max = video_max
+        self.changed = asyncio.Condition()
+        self.stats = {"dropped_frames": 0, "audio_blocked": 0, "audio_high_water": 0}
+
+    async def put_audio(self, item):
+        """ Queues PCM or a control message such as audio_stream_end, keeping their order. """
+        async with self.changed:
+            if len(self.audio) >= self.audio_max:
+                self.stats["audio_blocked"] += 1
+            await self.changed.wait_for(lambda: len(self.audio) < self.audio_max)
+            self.audio.append(item)
+            self.stats["audio_high_water"] = max(self.stats["audio_high_water"], len(self.audio))
+            self.changed.notify_all()
+
+    async def put_video(self, item):
+        """ Queues a video frame, dropping the oldest waiting frame if the lane is full. """
+        async with self.changed:
+            if len(self.video) >= self.video_max:
+                self.video.popleft()
+                self.stats["dropped_frames"] += 1
+            self.video.append(item)
+            self.changed.notify_all()
+
+    async def get(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.audio or self.video)
+            item = self.audio.popleft() if self.audio else self.video.popleft()
+            self.changed.notify_all()
+            return item
+
+    def qsize(self) -> int:
+        return len(self.audio) + len(self.video)
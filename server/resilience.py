@@ -0,0 +1,229 @@
+# server/resilience.py
+import asyncio
+import contextlib
+import os
+import random
+import threading
+import time
+
+BREAKER_FAILURES = int(os.getenv("ADA_BREAKER_FAILURES", "5"))                  # Consecutive failures that open a circuit
+BREAKER_RESET_SECONDS = float(os.getenv("ADA_BREAKER_RESET_SECONDS", "30"))     # How long an open circuit fails fast
+RATE_LIMIT_MAX_WAIT = float(os.getenv("ADA_RATE_LIMIT_MAX_WAIT", "2"))          # Longest a call waits for a token
+BACKOFF_BASE_DELAY = 0.5  # Seconds before the first retry (before jitter)
+BACKOFF_MAX_DELAY = 15.0  # Upper bound on the delay between retries
+
+# (requests per second, burst) for each upstream, shared by the whole process
+UPSTREAM_RATES = {
+    "gemini": (10, 20),
+    "elevenlabs": (5, 10),
+    "maps": (10, 10),
+    "weather": (2, 5),
+    "search": (1, 3),  # The scraper gets blocked quickly when hammered
+}
+# (requests per second, burst) for each upstream, per connected client
+CLIENT_RATES = {
+    "gemini": (1, 5),
+    "elevenlabs": (1, 5),
+    "maps": (0.5, 3),
+    "weather": (0.5, 3),
+    "search": (0.2, 2),
+}
+# Errors that mean the upstream itself is unreachable or struggling, matched by class name so
+# no client library has to be imported here (googlemaps, aiohttp, httpx, websockets)
+TRANSPORT_ERRORS = {"Timeout", "TimeoutException", "TransportError", "ClientConnectionError", "ClientPayloadError",
+                    "ServerDisconnectedError", "ConnectionClosed", "InvalidHandshake"}
+# Status strings some APIs (googlemaps) report for quota and server trouble
+OVERLOADED_STATUSES = {"OVER_QUERY_LIMIT", "OVER_DAILY_LIMIT", "RESOURCE_EXHAUSTED", "UNKNOWN_ERROR", "UNAVAILABLE"}
+
+
+class UpstreamUnavailable(Exception):
+    """ Raised instead of calling an upstream that is failing or over its rate. """
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class RateLimitedError(UpstreamUnavailable):
+    pass
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_DELAY, cap: float = BACKOFF_MAX_DELAY) -> float:
+    """ Exponential backoff for the given retry attempt (0-based), jittered so clients don't retry in step. """
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Whether an error says the upstream is down or overloaded (transport
+    errors, timeouts, 5xx, quota) rather than that this one request was bad
+    (unknown place, no route, 4xx, parse errors). Only the former should
+    count against a circuit breaker shared by every client.
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in TRANSPORT_ERRORS for cls in type(error).__mro__):
+        return True
+    for attribute in ("status", "status_code", "code"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int) and not isinstance(status, bool):
+            return status == 429 or status >= 500
+        if isinstance(status, str):
+            return status.upper() in OVERLOADED_STATUSES
+    return isinstance(error, OSError) # Socket-level errors that carry no status
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average with bursts of up to `burst`.
+    Waiters reserve their token up front, so they are served in order.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock() # Process-wide buckets are shared across event loops
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    async def acquire(self, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        """ Takes a token, waiting up to max_wait seconds for one; raises RateLimitedError if that is not enough. """
+        with self.lock:
+            self._refill()
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                raise RateLimitedError(f"Rate limit reached, next slot in {wait:.1f}s")
+            self.tokens -= 1
+        if wait:
+            await asyncio.sleep(wait)
+
+    def refund(self):
+        """ Returns a token taken for a call that was then not made. """
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures; while open, allow() is False
+    so callers fail fast. After reset_seconds calls are let through again, and
+    the next result closes the circuit or opens it for another period.
+    """
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_seconds
+
+    def allow(self) -> bool:
+        return not self.is_open
+
+    def retry_after(self) -> float:
+        """ Seconds until an open circuit lets calls through again (0 when closed). """
+        if not self.is_open:
+            return 0.0
+        return self.reset_seconds - (time.monotonic() - self.opened_at)
+
+    def record_success(self):
+        if self.opened_at is not None:
+            print(f"Circuit for {self.name} closed.")
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.opened_at is not None or self.consecutive_failures >= self.failures:
+            if not self.is_open:
+                print(f"Circuit for {self.name} opened for {self.reset_seconds:.0f}s after {self.consecutive_failures} failures.")
+            self.opened_at = time.monotonic()
+
+
+class Upstream:
+    """ Process-wide rate limit and circuit breaker for one upstream service. """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(name)
+
+    def check(self):
+        """ Raises CircuitOpenError while the circuit is open. """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable, retrying in {self.breaker.retry_after():.0f}s")
+
+    def retry_delay(self, attempt: int) -> float:
+        """ Delay before reconnect attempt `attempt`: jittered backoff, but at least until the circuit closes. """
+        return max(backoff_delay(attempt), self.breaker.retry_after())
+
+    @contextlib.asynccontextmanager
+    async def guard(self, client_bucket: TokenBucket | None = None):
+        """
+        Wraps one call to the upstream: fails fast with UpstreamUnavailable
+        while the circuit is open or the rate limits are exhausted, and
+        records the outcome. Errors about the request itself (see
+        is_upstream_failure) pass through without counting as failures.
+        """
+        self.check()
+        if client_bucket:
+            await client_bucket.acquire()
+        try:
+            await self.bucket.acquire()
+        except RateLimitedError:
+            if client_bucket:
+                client_bucket.refund() # The call is not made, so the client keeps its share
+            raise
+        try:
+            yield self
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success() # It answered; the request was the problem
+            raise
+        self.breaker.record_success()
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """ Returns the process-wide Upstream for name, creating it on first use. """
+    with _upstreams_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            upstream = Upstream(name, *UPSTREAM_RATES.get(name, (10, 10)))
+            _upstreams[name] = upstream
+        return upstream
+
+
+class ClientLimits:
+    """ Per-client token buckets, so one busy client cannot use up a shared upstream rate. """
+
+    def __init__(self, rates: dict | None = None):
+        self.buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in (rates or CLIENT_RATES).items()}
+
+    def guard(self, name: str):
+        """ Upstream.guard for name, also charged to this client's bucket. """
+        return get_upstream(name).guard(self.buckets.get(name))
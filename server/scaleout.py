@@ -0,0 +1,105 @@
+# server/scaleout.py
+"""
+Multi-worker deployment helpers for app.py. To start four workers on ports
+5000-5003:
+
+```
+python scaleout.py --workers 4
+```
+
+Every worker is a full server process with its own SessionManager, so the
+ADA engine for a connection lives in the worker that accepted it. A load
+balancer with sticky routing (e.g. nginx ip_hash) keeps each client on one
+worker, and a Socket.IO message queue lets any worker emit to any client.
+
+SOCKETIO_MESSAGE_QUEUE selects the queue:
+    (unset)              single process, no queue
+    local                in-process stand-in, for tests that run several
+                         Socket.IO servers in one process
+    redis://..., amqp://..., kafka://...
+                         passed to Flask-SocketIO as message_queue
+"""
+import argparse
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+
+import socketio
+
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "ada-socketio")
+ADA_WORKERS = int(os.getenv("ADA_WORKERS", "2"))
+ADA_PORT = int(os.getenv("ADA_PORT", "5000"))  # Port of this worker (first worker when launching several)
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """
+    In-process stand-in for a message queue. Every manager on the same channel
+    in this process receives every published message, including its own, just
+    as with Redis, so several Socket.IO servers can be tested together.
+    """
+
+    name = "local"
+    _subscribers = {}  # channel -> list of inbox queues
+    _subscribers_lock = threading.Lock()
+
+    def __init__(self, channel=SOCKETIO_CHANNEL, write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.inbox = queue.Queue()
+        if not write_only:
+            with self._subscribers_lock:
+                self._subscribers.setdefault(channel, []).append(self.inbox)
+
+    def _publish(self, data):
+        with self._subscribers_lock:
+            inboxes = list(self._subscribers.get(self.channel, []))
+        for inbox in inboxes:
+            inbox.put(data)
+
+    def _listen(self):
+        while True:
+            yield self.inbox.get()
+
+
+def message_queue_options(url: str = SOCKETIO_MESSAGE_QUEUE) -> dict:
+    """ Extra SocketIO(...) keyword arguments for the configured message queue. """
+    if not url:
+        return {}
+    if url == "local":
+        return {"client_manager": LocalPubSubManager()}
+    return {"message_queue": url, "channel": SOCKETIO_CHANNEL}
+
+
+def run_workers(script: str, workers: int = ADA_WORKERS, base_port: int = ADA_PORT):
+    """
+    Starts `workers` copies of script on consecutive ports and waits for them.
+    Each child is told its port through ADA_PORT.
+    """
+    if workers > 1 and not SOCKETIO_MESSAGE_QUEUE:
+        print("Warning: several workers without SOCKETIO_MESSAGE_QUEUE; emits only reach clients of the same worker.")
+    children = []
+    for index in range(workers):
+        env = dict(os.environ, ADA_PORT=str(base_port + index), ADA_WORKER_ID=str(index))
+        children.append(subprocess.Popen([sys.executable, script], env=env))
+        print(f"Started worker {index} (pid {children[-1].pid}) on port {base_port + index}")
+
+    def stop(signum, frame):
+        for child in children:
+            if child.poll() is None:
+                child.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for child in children:
+        child.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=ADA_WORKERS, help="number of worker processes")
+    parser.add_argument("--port", type=int, default=ADA_PORT, help="port of the first worker")
+    args = parser.parse_args()
+    run_workers(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"), args.workers, args.port)
@@ -0,0 +1,83 @@
+# server/screen_capture.py
+import io
+import threading
+import time
+
+import mss
+import numpy as np
+import PIL.Image
+
+SCREEN_MAX_EDGE = 1024          # Longest edge of the image sent upstream
+SCREEN_JPEG_QUALITY = 70
+SCREEN_DIFF_THRESHOLD = 16      # Per-channel change that counts a pixel as different
+SCREEN_KEYFRAME_INTERVAL = 10.0 # Seconds between frames sent even if nothing changed
+
+
+class ScreenCapturer:
+    """
+    Grabs a monitor or region with mss and encodes it straight from the raw
+    BGRA buffer: no PNG round trip, one downsample, one JPEG encode. Frames are
+    compared with the previous one and unchanged screens are not encoded at
+    all. Anything that is sent is the whole screen, since the model takes
+    each image as the current view; a frame still goes out every
+    keyframe_interval so context stays fresh.
+    """
+
+    def __init__(self, monitor: int = 0, region: dict | None = None, max_edge: int = SCREEN_MAX_EDGE,
+                 quality: int = SCREEN_JPEG_QUALITY, diff_threshold: int = SCREEN_DIFF_THRESHOLD,
+                 keyframe_interval: float = SCREEN_KEYFRAME_INTERVAL):
+        self.monitor = monitor
+        self.region = region # {"left", "top", "width", "height"}; overrides monitor
+        self.max_edge = max_edge
+        self.quality = quality
+        self.diff_threshold = diff_threshold
+        self.keyframe_interval = keyframe_interval
+        self.previous = None       # Last downsampled frame as an RGB array
+        self.last_keyframe = 0.0
+        self.local = threading.local() # mss handles must stay on the thread that made them
+        self.stats = {"captured": 0, "skipped": 0, "sent": 0}
+
+    def _sct(self):
+        if not hasattr(self.local, "sct"):
+            self.local.sct = mss.mss()
+        return self.local.sct
+
+    def _grab(self) -> PIL.Image.Image:
+        sct = self._sct()
+        shot = sct.grab(self.region or sct.monitors[self.monitor])
+        # Wrap the raw BGRA buffer; the "BGRX" raw mode swizzles to RGB while decoding in one pass
+        img = PIL.Image.frombuffer("RGB", shot.size, shot.bgra, "raw", "BGRX", 0, 1)
+        factor = max(1, max(img.size) // self.max_edge)
+        if factor > 1:
+            img = img.reduce(factor) # Cheap box downsample before any resampling filter
+        if max(img.size) > self.max_edge:
+            img.thumbnail((self.max_edge, self.max_edge))
+        return img
+
+    def _changed(self, frame: np.ndarray) -> bool:
+        """ Whether frame differs visibly from the previous one (always True for the first or a resized frame). """
+        if self.previous is None or self.previous.shape != frame.shape:
+            return True
+        return bool((np.abs(frame.astype(np.int16) - self.previous.astype(np.int16)) > self.diff_threshold).any())
+
+    def _encode(self, img: PIL.Image.Image) -> bytes:
+        image_io = io.BytesIO()
+        img.save(image_io, format="jpeg", quality=self.quality)
+        return image_io.getvalue()
+
+    def capture(self) -> bytes | None:
+        """ Returns JPEG bytes of the whole screen, or None if it is unchanged. """
+        img = self._grab()
+        frame = np.asarray(img)
+        self.stats["captured"] += 1
+        now = time.monotonic()
+
+        changed = self._changed(frame)
+        self.previous = frame
+        if not changed and now - self.last_keyframe < self.keyframe_interval:
+            self.stats["skipped"] += 1
+            return None
+
+        self.last_keyframe = now
+        self.stats["sent"] += 1
+        return self._encode(img)
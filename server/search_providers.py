@@ -0,0 +1,186 @@
+# server/search_providers.py
+"""
+Web search backends for the search tools. ADA_SEARCH_PROVIDER selects one:
+
+    google   async scrape of Google's result page (default)
+    fixture  canned results from ADA_SEARCH_FIXTURE, a JSON file mapping
+             queries to URL lists ("*" matches any other query), for tests
+             and benchmarks that must not touch the network
+
+Whichever is selected is wrapped in CachedSearch, which limits concurrent
+searches and caches results for a while.
+"""
+import asyncio
+import json
+import os
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+SEARCH_PROVIDER = os.getenv("ADA_SEARCH_PROVIDER", "google")
+SEARCH_FIXTURE = os.getenv("ADA_SEARCH_FIXTURE", "")
+SEARCH_CONCURRENCY = int(os.getenv("ADA_SEARCH_CONCURRENCY", "4"))           # Searches in flight per process
+SEARCH_CACHE_SECONDS = float(os.getenv("ADA_SEARCH_CACHE_SECONDS", "600"))   # How long a query's results are reused
+SEARCH_CACHE_SIZE = 256   # Queries kept in the result cache
+SEARCH_TIMEOUT = 5        # Seconds for one result page request
+
+GOOGLE_SEARCH_URL = "https://www.google.com/search"
+# Google serves the plain HTML page parse_results understands only to text browsers; a desktop
+# browser User-Agent gets the JavaScript page instead, which has no parseable results
+GOOGLE_HEADERS = {
+    'User-Agent': 'Lynx/2.8.9rel.1 libwww-FM/2.14 SSL-MM/1.4.1 OpenSSL/1.1.1d',
+    'Accept': '*/*',
+}
+GOOGLE_COOKIES = {'CONSENT': 'PENDING+987', 'SOCS': 'CAESHAgBEhIaAB'} # Skips the consent page
+
+
+class SearchProvider(ABC):
+    """ Returns up to num_results result URLs for a query. """
+
+    name = "base"
+
+    @abstractmethod
+    async def search(self, query: str, num_results: int = 5) -> list:
+        ...
+
+
+class GoogleSearchProvider(SearchProvider):
+    """ Fetches and parses Google's result page with aiohttp; no thread, no pause between results. """
+
+    name = "google"
+
+    def __init__(self, lang: str = "en", timeout: float = SEARCH_TIMEOUT):
+        self.lang = lang
+        self.timeout = timeout
+
+    async def search(self, query: str, num_results: int = 5) -> list:
+        params = {"q": query, "num": num_results + 2, "hl": self.lang, "safe": "active"}
+        async with aiohttp.ClientSession(cookies=GOOGLE_COOKIES) as session:
+            async with session.get(GOOGLE_SEARCH_URL, params=params, headers=GOOGLE_HEADERS,
+                                   timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                response.raise_for_status()
+                html = await response.text()
+        urls = self.parse_results(html)
+        if not urls and html:
+            # Most likely Google changed the page; say so rather than look like a query without results
+            print(f"Warning: No results parsed from Google's result page for '{query}'.")
+        return urls[:num_results]
+
+    @staticmethod
+    def parse_results(html: str) -> list:
+        """ Result URLs from a Google (text browser) result page, in order and without duplicates. """
+        soup = BeautifulSoup(html, "lxml")
+        urls = []
+        for block in soup.select("div.ezO2md"): # One per result; its first link is the result itself
+            link = block.find("a", href=True)
+            if link is None:
+                continue
+            href = link["href"]
+            if href.startswith("/url?"):
+                href = parse_qs(urlparse(href).query).get("q", [""])[0]
+            if href.startswith("http") and href not in urls:
+                urls.append(href)
+        return urls
+
+
+class FixtureSearchProvider(SearchProvider):
+    """ Canned results from a dict or JSON file, with an optional delay to stand in for network latency. """
+
+    name = "fixture"
+
+    def __init__(self, path: str = SEARCH_FIXTURE, results: dict | None = None, delay: float = 0.0):
+        if results is None and path:
+            with open(path, "r", encoding="utf-8") as f:
+                results = json.load(f)
+        self.results = {query.strip().lower(): urls for query, urls in (results or {}).items()}
+        self.delay = delay
+
+    async def search(self, query: str, num_results: int = 5) -> list:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        urls = self.results.get(query.strip().lower(), self.results.get("*", []))
+        return list(urls[:num_results])
+
+
+class CachedSearch(SearchProvider):
+    """
+    Wraps a provider with a limit on concurrent searches and a TTL/LRU cache
+    of recent results keyed by normalized query. Concurrent identical queries
+    share one fetch. Empty results are not cached.
+    """
+
+    def __init__(self, provider: SearchProvider, concurrency: int = SEARCH_CONCURRENCY,
+                 ttl: float = SEARCH_CACHE_SECONDS, max_entries: int = SEARCH_CACHE_SIZE):
+        self.provider = provider
+        self.name = provider.name
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache = OrderedDict() # (query, num_results) -> (expires_at, urls)
+        self.semaphores = weakref.WeakKeyDictionary() # Event loop -> semaphore
+        self.inflight = weakref.WeakKeyDictionary()   # Event loop -> {key: fetch task}
+        self.stats = {"hits": 0, "joined": 0, "misses": 0}
+
+    def _cached(self, key):
+        entry = self.cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.cache.move_to_end(key)
+            return list(entry[1])
+        return None
+
+    async def search(self, query: str, num_results: int = 5) -> list:
+        key = (" ".join(query.lower().split()), num_results)
+        urls = self._cached(key)
+        if urls is not None:
+            self.stats["hits"] += 1
+            return urls
+        loop = asyncio.get_running_loop()
+        inflight = self.inflight.setdefault(loop, {})
+        task = inflight.get(key)
+        if task is None:
+            self.stats["misses"] += 1
+            task = inflight[key] = loop.create_task(self._fetch(key, query, num_results))
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+        else:
+            self.stats["joined"] += 1 # Same query already being fetched; share its result
+        # Shielded so a caller cut off by its deadline doesn't cancel the fetch for the others
+        return list(await asyncio.shield(task))
+
+    async def _fetch(self, key, query: str, num_results: int) -> list:
+        loop = asyncio.get_running_loop()
+        semaphore = self.semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self.semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        async with semaphore:
+            urls = await self.provider.search(query, num_results)
+        if urls:
+            self.cache[key] = (time.monotonic() + self.ttl, list(urls))
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return urls
+
+
+SEARCH_PROVIDERS = {
+    "google": GoogleSearchProvider,
+    "fixture": FixtureSearchProvider,
+}
+
+_search_provider = None
+
+
+def get_search_provider() -> SearchProvider:
+    """ Returns the process-wide, cached search provider selected by ADA_SEARCH_PROVIDER. """
+    global _search_provider
+    if _search_provider is None:
+        provider_class = SEARCH_PROVIDERS.get(SEARCH_PROVIDER)
+        if provider_class is None:
+            print(f"Error: Unknown search provider '{SEARCH_PROVIDER}', using 'google'.")
+            provider_class = GoogleSearchProvider
+        _search_provider = CachedSearch(provider_class())
+    return _search_provider
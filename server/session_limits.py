@@ -0,0 +1,153 @@
+# server/session_limits.py
+import asyncio
+import json
+import os
+import zlib
+
+SESSION_BYTE_BUDGET = int(os.getenv("ADA_SESSION_BYTE_BUDGET", str(8 * 1024 * 1024)))  # Queued bytes allowed per session
+SESSION_HIBERNATE_SECONDS = float(os.getenv("ADA_SESSION_HIBERNATE_SECONDS", "900"))    # Idle time before a session is hibernated
+MEMORY_CEILING_MB = int(os.getenv("ADA_MEMORY_CEILING_MB", "0"))                         # Process RSS that triggers shedding; 0 = off
+HIBERNATED_HISTORY_TURNS = 40  # Text turns kept when a session's history is compacted
+
+# Per-stage queue bounds shared by the web engines
+INPUT_QUEUE_SIZE = 8          # User turns waiting for the model
+RESPONSE_QUEUE_SIZE = 32      # Text chunks waiting for TTS
+COALESCE_MAX_BYTES = 2048     # Largest text item a COALESCE queue builds by merging
+
+# Full-queue policies for BudgetedQueue
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+
+
+def payload_size(item) -> int:
+    """ Approximate bytes held by a queued item (bytes, str, or tuples/lists/dicts of them). """
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return len(item)
+    if isinstance(item, str):
+        return len(item)
+    if isinstance(item, (tuple, list)):
+        return sum(payload_size(i) for i in item)
+    if isinstance(item, dict):
+        return sum(payload_size(v) for v in item.values())
+    return 0
+
+
+class ByteBudget:
+    """ Byte allowance shared by all queues of one session. """
+
+    def __init__(self, limit: int = SESSION_BYTE_BUDGET):
+        self.limit = limit
+        self.used = 0
+        self.high_water = 0
+        self.rejected = 0
+
+    def fits(self, size: int) -> bool:
+        return self.used + size <= self.limit
+
+    def charge(self, size: int):
+        self.used += size
+        self.high_water = max(self.high_water, self.used)
+
+    def release(self, size: int):
+        self.used = max(0, self.used - size)
+
+
+class BudgetedQueue(asyncio.Queue):
+    """
+    Bounded asyncio.Queue between two pipeline stages. Items are charged to a
+    session ByteBudget. A put that would exceed the budget is rejected and
+    put()/put_nowait() return False; only DROP_OLDEST queues first make room
+    by dropping their oldest items, since the others hold user turns and
+    end-of-turn markers that must not be lost silently.
+
+    What happens when the queue is full depends on its policy:
+        BLOCK        put() waits for the consumer, which throttles the
+                     producer (and through it the upstream connection)
+        DROP_OLDEST  the oldest item is discarded; for realtime data where
+                     only recent items are worth sending
+        COALESCE     a text item is appended to the newest queued text item
+                     while that stays under max_item_bytes, otherwise put()
+                     waits as with BLOCK; markers such as None never merge
+
+    stats records the high-water mark (most items queued at once) and how
+    often puts were dropped, coalesced, blocked or rejected.
+    """
+
+    def __init__(self, budget: ByteBudget, maxsize: int = 0, policy: str = BLOCK,
+                 max_item_bytes: int = COALESCE_MAX_BYTES):
+        super().__init__(maxsize=maxsize)
+        self.budget = budget
+        self.policy = policy
+        self.max_item_bytes = max_item_bytes
+        self.stats = {"high_water": 0, "dropped": 0, "coalesced": 0, "blocked": 0, "rejected": 0}
+
+    async def put(self, item):
+        if self.policy == DROP_OLDEST:
+            return self.put_nowait(item)
+        if self.full():
+            if self.policy == COALESCE and self._coalesce(item):
+                return True
+            self.stats["blocked"] += 1
+        return await super().put(item)  # Waits for room, then calls put_nowait()
+
+    def put_nowait(self, item):
+        if self.full():
+            if self.policy == DROP_OLDEST:
+                self._drop_oldest()
+            elif self.policy == COALESCE and self._coalesce(item):
+                return True
+        size = payload_size(item)
+        while self.policy == DROP_OLDEST and not self.budget.fits(size) and not self.empty():
+            self._drop_oldest()
+        if not self.budget.fits(size):
+            self.budget.rejected += 1
+            self.stats["rejected"] += 1
+            return False
+        super().put_nowait(item)  # Raises QueueFull if still full (BLOCK, or nothing to merge into)
+        self.stats["high_water"] = max(self.stats["high_water"], self.qsize())
+        return True
+
+    def _drop_oldest(self):
+        self.get_nowait()
+        self.task_done()
+        self.stats["dropped"] += 1
+
+    def _coalesce(self, item) -> bool:
+        if not self._queue or not isinstance(item, str) or not isinstance(self._queue[-1], str):
+            return False
+        size = payload_size(item)
+        if payload_size(self._queue[-1]) + size > self.max_item_bytes or not self.budget.fits(size):
+            return False
+        self._queue[-1] += item
+        self.budget.charge(size)
+        self.stats["coalesced"] += 1
+        return True
+
+    def _put(self, item):
+        self.budget.charge(payload_size(item))
+        super()._put(item)
+
+    def _get(self):
+        item = super()._get()
+        self.budget.release(payload_size(item))
+        return item
+
+    def clear(self):
+        """ Drops everything queued, e.g. when the session hibernates. """
+        while not self.empty():
+            self.get_nowait()
+            self.task_done()
+
+
+def compact_history(turns, max_turns: int = HIBERNATED_HISTORY_TURNS) -> bytes:
+    """ Serializes (role, text) turns, newest max_turns only, into a compressed blob. """
+    turns = [(role, text) for role, text in turns if text][-max_turns:]
+    return zlib.compress(json.dumps(turns).encode("utf-8"))
+
+
+def restore_history(blob: bytes | None) -> list:
+    """ Inverse of compact_history: a list of (role, text) pairs. """
+    if not blob:
+        return []
+    return [tuple(turn) for turn in json.loads(zlib.decompress(blob).decode("utf-8"))]
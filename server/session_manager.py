@@ -0,0 +1,195 @@
+# server/session_manager.py
+import asyncio
+import os
+import threading
+import time
+
+import psutil
+
+from session_limits import SESSION_HIBERNATE_SECONDS, MEMORY_CEILING_MB
+
+# "connect": open Gemini and TTS as soon as a client connects (default)
+# "ready": wait for the client's client_ready hint or its first input
+PRECONNECT = os.getenv("ADA_PRECONNECT", "connect")
+UPSTREAM_IDLE_SECONDS = float(os.getenv("ADA_UPSTREAM_IDLE_SECONDS", "300")) # Close upstream sockets after this long without input
+IDLE_CHECK_SECONDS = 10
+SHED_MIN_IDLE_SECONDS = 60 # Sessions with more recent input are never shed for memory
+
+
+class SessionManager:
+    """
+    Owns one ADA engine per connected Socket.IO client. All engines run on a
+    single background asyncio loop; Socket.IO handlers hand work to it with
+    run_coroutine_threadsafe so they never block on the engines.
+
+    An engine is "warm" while its tasks, and with them the Gemini and TTS
+    connections, are running. Engines are warmed up ahead of the first turn
+    (on connect or on the client's ready hint) so it pays no handshake cost,
+    cooled down after UPSTREAM_IDLE_SECONDS without input, and warmed up again
+    by the next input. After SESSION_HIBERNATE_SECONDS an idle engine is also
+    hibernated: queued data and frames are dropped and its history compacted.
+    While the process is over MEMORY_CEILING_MB, one of the least recently
+    active sessions is hibernated, or once all are, evicted, per idle check.
+    """
+
+    def __init__(self, socketio, engine_factory):
+        self.socketio = socketio
+        self.engine_factory = engine_factory # callable(socketio_instance, client_sid, wire_codec) -> ADA
+        self.sessions = {}                   # client_sid -> ADA, only touched on the loop
+        self.warm = set()                    # client_sids whose engine tasks are running
+        self.last_activity = {}              # client_sid -> monotonic time of the last input
+        self.hibernated = set()              # client_sids whose engines hold only compacted state
+        self.process = psutil.Process()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name="ada-sessions", daemon=True)
+        self.thread.start()
+        self.submit(self._idle_watch())
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """ Schedules a coroutine on the session loop from any thread. """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    # --- Work that runs on the session loop ---
+
+    async def _start(self, client_sid, wire_codec="json"):
+        if client_sid in self.sessions:
+            return
+        ada = self.engine_factory(socketio_instance=self.socketio, client_sid=client_sid, wire_codec=wire_codec)
+        self.sessions[client_sid] = ada
+        self.last_activity[client_sid] = time.monotonic()
+        if PRECONNECT == "connect":
+            await self._warm_up(client_sid)
+
+    async def _stop(self, client_sid):
+        ada = self.sessions.pop(client_sid, None)
+        self.warm.discard(client_sid)
+        self.hibernated.discard(client_sid)
+        self.last_activity.pop(client_sid, None)
+        if ada:
+            await ada.stop_all_tasks()
+
+    async def _warm_up(self, client_sid):
+        """ Starts the engine's tasks, which connect to Gemini and prime the TTS socket. """
+        ada = self.sessions.get(client_sid)
+        if not ada or client_sid in self.warm:
+            return
+        self.warm.add(client_sid)
+        if client_sid in self.hibernated:
+            self.hibernated.discard(client_sid)
+            ada.wake()
+        await ada.start_all_tasks()
+
+    async def _cool_down(self, client_sid):
+        """ Closes the engine's upstream connections; history and buffers are kept. """
+        ada = self.sessions.get(client_sid)
+        if not ada or client_sid not in self.warm:
+            return
+        self.warm.discard(client_sid)
+        print(f"Closing idle upstream connections for SID {client_sid}.")
+        await ada.stop_all_tasks()
+
+    async def _hibernate(self, client_sid):
+        ada = self.sessions.get(client_sid)
+        if not ada or client_sid in self.hibernated:
+            return
+        await self._cool_down(client_sid)
+        print(f"Hibernating idle session for SID {client_sid}.")
+        try:
+            ada.hibernate()
+        except Exception as e:
+            print(f"Error hibernating session for SID {client_sid}: {e}")
+            return
+        self.hibernated.add(client_sid)
+
+    async def _evict(self, client_sid):
+        print(f"Evicting session for SID {client_sid} to free memory.")
+        await self._stop(client_sid)
+        try:
+            self.socketio.server.disconnect(client_sid)
+        except Exception as e:
+            print(f"Error disconnecting SID {client_sid}: {e}")
+
+    def _over_ceiling(self) -> bool:
+        return MEMORY_CEILING_MB > 0 and self.process.memory_info().rss > MEMORY_CEILING_MB * 1024 * 1024
+
+    async def _shed_memory(self):
+        """
+        Sheds one session, least recently active first: hibernates it if any
+        idle session is still awake, else evicts one. RSS lags behind freed
+        memory, so the next _idle_watch tick decides whether to shed another.
+        """
+        cutoff = time.monotonic() - SHED_MIN_IDLE_SECONDS
+        idle = [sid for sid in self.sessions if self.last_activity.get(sid, 0) < cutoff]
+        if not idle:
+            return
+        oldest_first = sorted(idle, key=lambda sid: self.last_activity.get(sid, 0))
+        awake = [sid for sid in oldest_first if sid not in self.hibernated]
+        if awake:
+            await self._hibernate(awake[0])
+        else:
+            await self._evict(oldest_first[0])
+
+    async def _idle_watch(self):
+        while True:
+            await asyncio.sleep(IDLE_CHECK_SECONDS)
+            try:
+                await self._check_idle()
+            except Exception as e: # One failing session must not stop the watch for all of them
+                print(f"Error in idle session check: {e}")
+
+    async def _check_idle(self):
+        now = time.monotonic()
+        for client_sid in list(self.sessions):
+            idle = now - self.last_activity.get(client_sid, now)
+            if idle > SESSION_HIBERNATE_SECONDS:
+                await self._hibernate(client_sid)
+            elif idle > UPSTREAM_IDLE_SECONDS:
+                await self._cool_down(client_sid)
+        if self._over_ceiling():
+            await self._shed_memory()
+
+    async def _ready(self, client_sid):
+        self.last_activity[client_sid] = time.monotonic()
+        await self._warm_up(client_sid)
+
+    async def _dispatch(self, client_sid, method_name, *args, activity=True, **kwargs):
+        ada = self.sessions.get(client_sid)
+        if not ada:
+            print(f"No ADA session for SID {client_sid}; dropping {method_name}.")
+            return
+        if activity: # User input; video frames alone neither warm nor keep a session warm
+            self.last_activity[client_sid] = time.monotonic()
+            await self._warm_up(client_sid)
+        method = getattr(ada, method_name, None)
+        if not method:
+            print(f"ADA engine does not support {method_name}.")
+            return
+        try:
+            await method(*args, **kwargs)
+        except Exception as e:
+            print(f"Error in {method_name} for SID {client_sid}: {e}")
+
+    # --- Entry points for Socket.IO handlers ---
+
+    def connect(self, client_sid, wire_codec="json"):
+        self.submit(self._start(client_sid, wire_codec))
+
+    def disconnect(self, client_sid):
+        self.submit(self._stop(client_sid))
+
+    def ready(self, client_sid):
+        """ Client hint that the user is about to talk; warms the engine up if it is not already. """
+        self.submit(self._ready(client_sid))
+
+    def send_text(self, client_sid, text):
+        self.submit(self._dispatch(client_sid, "process_input", text, is_final_turn_input=True))
+
+    def send_video_frame(self, client_sid, frame_data_url):
+        self.submit(self._dispatch(client_sid, "process_video_frame", frame_data_url, activity=False))
+
+    def send_audio_chunk(self, client_sid, pcm, sample_rate):
+        self.submit(self._dispatch(client_sid, "process_audio_chunk", pcm, sample_rate))
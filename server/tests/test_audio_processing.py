@@ -0,0 +1,62 @@
+import numpy as np
+
+from audio_processing import JitterBuffer, PcmRingBuffer, PcmResampler, VoiceActivityGate
+
+
+def tone(seconds, rate, freq=220.0, amplitude=8000):
+    t = np.arange(int(seconds * rate)) / rate
+    return (np.sin(2 * np.pi * freq * t) * amplitude).astype("<i2").tobytes()
+
+
+def silence(seconds, rate):
+    return bytes(int(seconds * rate) * 2)
+
+
+def test_resampler_output_length():
+    out = PcmResampler(48000, 16000).process(tone(1.0, 48000))
+    assert abs(len(out) // 2 - 16000) <= 1
+
+
+def test_resampler_chunks_match_one_pass():
+    pcm = tone(0.5, 44100)
+    whole = np.frombuffer(PcmResampler(44100, 16000).process(pcm), dtype="<i2")
+    resampler = PcmResampler(44100, 16000)
+    chunked = np.frombuffer(b"".join(resampler.process(pcm[i:i + 882]) for i in range(0, len(pcm), 882)), dtype="<i2")
+    assert abs(len(chunked) - len(whole)) <= 1
+    n = min(len(chunked), len(whole))
+    assert np.max(np.abs(chunked[:n].astype(int) - whole[:n].astype(int))) <= 2 # No clicks at chunk boundaries
+
+
+def test_resampler_passes_through_same_rate():
+    pcm = tone(0.1, 16000)
+    assert PcmResampler(16000, 16000).process(pcm) == pcm
+
+
+def test_vad_drops_silence():
+    gate = VoiceActivityGate()
+    assert gate.process(silence(1.0, 16000)) == []
+    assert gate.flush() == []
+
+
+def test_vad_passes_speech_then_ends_segment():
+    gate = VoiceActivityGate()
+    items = gate.process(silence(0.5, 16000) + tone(0.5, 16000) + silence(1.0, 16000))
+    assert items[-1] is VoiceActivityGate.END
+    speech = b"".join(item for item in items if item is not VoiceActivityGate.END)
+    assert len(speech) >= len(tone(0.5, 16000)) # Speech plus pre-roll and hangover
+
+
+def test_ring_buffer_keeps_newest_bytes():
+    ring = PcmRingBuffer(8)
+    ring.write(b"abcdef")
+    ring.write(b"ghij")
+    assert ring.available() == 8
+    assert ring.read(8) == b"cdefghij"
+
+
+def test_jitter_buffer_pads_with_silence_until_filled():
+    buffer = JitterBuffer(16000, target_latency_ms=10) # 320 bytes
+    buffer.write(b"\x01\x00" * 100)
+    assert buffer.read_frames(4) == bytes(4) # Still priming
+    buffer.end_of_stream()
+    assert buffer.read_frames(4) == b"\x01\x00\x01\x00"
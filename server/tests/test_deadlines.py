@@ -0,0 +1,41 @@
+import asyncio
+
+from deadlines import Deadline, run_tool
+
+
+def test_run_tool_returns_result():
+    async def tool(x):
+        return {"value": x * 2}
+    assert asyncio.run(run_tool("tool", tool, {"x": 21}, Deadline(1))) == {"value": 42}
+
+
+def test_run_tool_times_out_with_partial_result():
+    async def slow_search(query, deadline):
+        deadline.partial = {"results": [f"first hit for {query}"]}
+        await asyncio.sleep(10)
+    response = asyncio.run(run_tool("search", slow_search, {"query": "ada"}, Deadline(0.05)))
+    assert response["status"] == "partial"
+    assert response["partial_result"] == {"results": ["first hit for ada"]}
+
+
+def test_run_tool_times_out_without_partial_result():
+    async def slow():
+        await asyncio.sleep(10)
+    response = asyncio.run(run_tool("slow", slow, {}, Deadline(0.05)))
+    assert response["status"] == "timed_out"
+
+
+def test_run_tool_reports_errors():
+    async def broken():
+        raise ValueError("bad input")
+    response = asyncio.run(run_tool("broken", broken, {}, Deadline(1)))
+    assert "bad input" in response["error"]
+
+
+def test_child_deadline_shares_expiry():
+    deadline = Deadline(5)
+    child = deadline.child()
+    assert child.expires_at == deadline.expires_at
+    assert child.partial is None
+    assert deadline.timeout(1) == 1
+    assert Deadline(0).expired
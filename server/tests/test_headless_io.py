@@ -0,0 +1,57 @@
+import asyncio
+import wave
+
+import numpy as np
+
+from headless_io import StubLiveClient, WavSink, wav_chunks
+
+
+def write_wav(path, pcm, rate):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+
+
+def test_wav_chunks_resamples_to_the_requested_rate(tmp_path):
+    path = tmp_path / "in.wav"
+    write_wav(path, bytes(48000 * 2), 48000) # One second at 48 kHz
+
+    async def read():
+        return [chunk async for chunk in wav_chunks(str(path), 16000, 1024, realtime=False)]
+    chunks = asyncio.run(read())
+    assert abs(sum(len(chunk) for chunk in chunks) // 2 - 16000) <= 2
+    assert max(len(chunk) for chunk in chunks) <= 1024 * 2 + 4
+
+
+def test_wav_sink_writes_pcm(tmp_path):
+    path = tmp_path / "out.wav"
+    sink = WavSink(str(path), 24000)
+    sink.write(bytes(4800))
+    sink.close()
+    with wave.open(str(path), "rb") as wav:
+        assert wav.getframerate() == 24000
+        assert wav.getnframes() == 2400
+
+
+def test_stub_session_answers_each_turn():
+    client = StubLiveClient(reply_seconds=0.2)
+
+    async def run():
+        async with client.aio.live.connect(model="stub") as session:
+            await session.send(input={"data": bytes(3200), "mime_type": "audio/pcm"})
+            await session.send(input=type("End", (), {"audio_stream_end": True})())
+            replies = [response async for response in session.receive()]
+            await session.send(input="hi", end_of_turn=True)
+            text_replies = [response async for response in session.receive()]
+            return session, replies, text_replies
+
+    session, replies, text_replies = asyncio.run(run())
+    audio = b"".join(r.data for r in replies if r.data)
+    assert len(audio) == int(0.2 * 24000) * 2
+    assert replies[-1].text == "I heard you.\n"
+    assert replies[-1].server_content.turn_complete
+    assert text_replies[-1].text == "You said: hi\n"
+    assert session.stats == {"audio_bytes": 3200, "image_bytes": 0, "text_turns": 1, "audio_turns": 1}
+    assert len(session.latencies) == 2
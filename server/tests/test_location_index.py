@@ -0,0 +1,38 @@
+import pytest
+
+from location_index import LocationIndex, normalize_location
+
+
+@pytest.mark.parametrize("text, key", [
+    ("NYC", "new york, ny"),
+    ("new york, ny", "new york, ny"),
+    ("New York City", "new york, ny"),
+    ("  Vinings GA ", "vinings, ga"),
+    ("D.C.", "washington, dc"),
+    ("Portland, Oregon, USA", "portland, or"),
+    ("Atlanta, GA 30303, USA", "atlanta, ga"),
+    ("São Paulo", "sao paulo"),
+    # Only the trailing state/country position is rewritten
+    ("1600 Pennsylvania Ave NW, Washington, DC 20500, USA", "1600 pennsylvania ave nw, washington, dc"),
+    ("350 5th Ave, New York, NY 10118, USA", "350 5th ave, new york, ny"),
+    ("Tbilisi, Georgia", "tbilisi, georgia"),
+    ("London, England", "london, uk"),
+    ("", ""),
+])
+def test_normalize_location(text, key):
+    assert normalize_location(text) == key
+
+
+def test_learned_aliases_stay_in_their_index():
+    mine, theirs = LocationIndex(), LocationIndex()
+    mine.learn("home", "123 Main St, Springfield, IL 62701, USA")
+    assert mine.key("Home") == "123 main st, springfield, il"
+    assert theirs.key("home") == "home"
+
+
+def test_learned_aliases_are_bounded():
+    index = LocationIndex(max_learned=2)
+    for i in range(3):
+        index.learn(f"place {i}", f"{i} Main St, Springfield, IL")
+    assert index.key("place 0") == "place 0"
+    assert index.key("place 2") == "2 main st, springfield, il"
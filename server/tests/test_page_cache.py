@@ -0,0 +1,59 @@
+import random
+import time
+
+from page_cache import PageCache, freshness_lifetime
+
+
+def make_cache(tmp_path, **kwargs):
+    return PageCache(path=str(tmp_path / "pages.sqlite3"), **kwargs)
+
+
+def test_freshness_lifetime_from_headers():
+    assert freshness_lifetime({"Cache-Control": "public, max-age=60"}) == 60
+    assert freshness_lifetime({"Cache-Control": "no-cache"}) == 0
+    assert freshness_lifetime({"Cache-Control": "no-store"}) is None
+    assert freshness_lifetime({"Expires": "Thu, 01 Jan 1970 00:00:00 GMT"}) == 0
+    assert freshness_lifetime({"Expires": "not a date"}) == 0
+    assert freshness_lifetime({}, default_ttl=42) == 42
+
+
+def test_fresh_page_is_served(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("https://example.com/a", {"title": "A"}, {"Cache-Control": "max-age=60", "ETag": '"v1"'})
+    page = cache.get("https://example.com/a")
+    assert page.fresh
+    assert page.result == {"title": "A"}
+    assert cache.stats["hits"] == 1
+    assert cache.get("https://example.com/missing") is None
+
+
+def test_stale_page_revalidates(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("https://example.com/a", {"title": "A"},
+              {"Cache-Control": "no-cache", "ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    page = cache.get("https://example.com/a")
+    assert not page.fresh
+    assert page.conditional_headers() == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+    cache.revalidated("https://example.com/a", {"Cache-Control": "max-age=60", "ETag": '"v2"'})
+    page = cache.get("https://example.com/a")
+    assert page.fresh and page.etag == '"v2"'
+    assert cache.stats["revalidated"] == 1
+
+
+def test_no_store_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("https://example.com/a", {"title": "A"}, {"Cache-Control": "no-store"})
+    assert cache.get("https://example.com/a") is None
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=2500)
+    rng = random.Random(0)
+    blob = {"text": "".join(chr(rng.randrange(33, 123)) for _ in range(2000))} # Compresses poorly
+    cache.put("https://example.com/old", blob, {})
+    time.sleep(0.01)
+    cache.put("https://example.com/new", blob, {})
+    assert cache.get("https://example.com/old") is None
+    assert cache.get("https://example.com/new") is not None
+    assert cache.stats["evicted"] == 1
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, RateLimitedError, TokenBucket, Upstream, is_upstream_failure
+
+
+class ApiError(Exception):
+    """ Shaped like googlemaps.exceptions.ApiError. """
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def test_token_bucket_allows_burst_then_limits():
+    bucket = TokenBucket(rate=0.001, burst=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    with pytest.raises(RateLimitedError):
+        asyncio.run(bucket.acquire(max_wait=0.1))
+    bucket.refund()
+    assert bucket.try_acquire()
+
+
+def test_circuit_breaker_opens_and_closes():
+    breaker = CircuitBreaker("test", failures=2, reset_seconds=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+    assert 0 < breaker.retry_after() <= 60
+    breaker.record_success()
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize("error, counts", [
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (HTTPError(503), True),
+    (HTTPError(429), True),
+    (ApiError("OVER_QUERY_LIMIT"), True),
+    (HTTPError(404), False),
+    (ApiError("NOT_FOUND"), False),
+    (ValueError("unparseable"), False),
+    (KeyError("legs"), False),
+])
+def test_is_upstream_failure(error, counts):
+    assert is_upstream_failure(error) is counts
+
+
+def test_guard_counts_only_upstream_failures():
+    async def call(upstream, error):
+        with pytest.raises(type(error)):
+            async with upstream.guard():
+                raise error
+
+    async def run():
+        upstream = Upstream("test", rate=100, burst=100)
+        upstream.breaker.failures = 2
+        for _ in range(5):
+            await call(upstream, ApiError("NOT_FOUND")) # A user typo, not an outage
+        assert upstream.breaker.allow()
+        for _ in range(2):
+            await call(upstream, asyncio.TimeoutError())
+        with pytest.raises(CircuitOpenError):
+            async with upstream.guard():
+                pass
+    asyncio.run(run())
+
+
+def test_guard_refunds_client_token_when_process_is_limited():
+    async def run():
+        upstream = Upstream("test", rate=0.001, burst=1)
+        client = TokenBucket(rate=0.001, burst=2)
+        async with upstream.guard(client):
+            pass
+        with pytest.raises(RateLimitedError):
+            async with upstream.guard(client):
+                pass
+        assert client.try_acquire() # Still has its second token
+    asyncio.run(run())
@@ -0,0 +1,31 @@
+from scaleout import LocalPubSubManager, message_queue_options
+
+
+def test_local_pubsub_delivers_to_every_subscriber():
+    first = LocalPubSubManager(channel="test-delivery")
+    second = LocalPubSubManager(channel="test-delivery")
+    other = LocalPubSubManager(channel="test-other")
+    first._publish({"method": "emit", "event": "status"})
+    assert first.inbox.get_nowait() == {"method": "emit", "event": "status"} # Including the publisher, like Redis
+    assert second.inbox.get_nowait() == {"method": "emit", "event": "status"}
+    assert other.inbox.empty()
+
+
+def test_write_only_manager_does_not_subscribe():
+    writer = LocalPubSubManager(channel="test-write-only", write_only=True)
+    reader = LocalPubSubManager(channel="test-write-only")
+    writer._publish("hello")
+    assert reader.inbox.get_nowait() == "hello"
+    assert writer.inbox.empty()
+
+
+def test_listen_yields_published_messages():
+    manager = LocalPubSubManager(channel="test-listen")
+    manager._publish("one")
+    assert next(manager._listen()) == "one"
+
+
+def test_message_queue_options():
+    assert message_queue_options("") == {}
+    assert isinstance(message_queue_options("local")["client_manager"], LocalPubSubManager)
+    assert message_queue_options("redis://localhost:6379")["message_queue"] == "redis://localhost:6379"
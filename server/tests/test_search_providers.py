@@ -0,0 +1,33 @@
+import os
+
+from search_providers import GOOGLE_HEADERS, GoogleSearchProvider
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_results_saved_page():
+    urls = GoogleSearchProvider.parse_results(read_fixture("google_results_lynx.html"))
+    # One URL per result block, unwrapped from /url?q=, without header, footer,
+    # sitelinks, "People also ask" entries or duplicates
+    assert urls == [
+        "https://docs.python.org/3/library/asyncio.html",
+        "https://realpython.com/async-io-python/",
+        "https://stackoverflow.com/questions/49005651/how-does-asyncio-actually-work",
+        "https://docs.python.org/3/library/asyncio.html#module-asyncio",
+        "https://superfastpython.com/python-asyncio/",
+    ]
+
+
+def test_parse_results_javascript_page():
+    # What a desktop browser User-Agent gets: results are rendered by script
+    html = "<html><body><div id='search'><script>window.google={kEI:'x'};</script></div></body></html>"
+    assert GoogleSearchProvider.parse_results(html) == []
+
+
+def test_requests_text_browser_page():
+    assert GOOGLE_HEADERS["User-Agent"].startswith("Lynx/")
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from session_limits import (BLOCK, COALESCE, DROP_OLDEST, BudgetedQueue, ByteBudget, compact_history,
+                            restore_history)
+
+
+def test_drop_oldest_replaces_oldest_when_full():
+    q = BudgetedQueue(ByteBudget(1024), maxsize=2, policy=DROP_OLDEST)
+    for item in (b"a", b"b", b"c"):
+        assert q.put_nowait(item)
+    assert list(q._queue) == [b"b", b"c"]
+    assert q.stats["dropped"] == 1
+
+
+def test_block_raises_queue_full_like_asyncio():
+    q = BudgetedQueue(ByteBudget(1024), maxsize=1, policy=BLOCK)
+    q.put_nowait("first")
+    with pytest.raises(asyncio.QueueFull):
+        q.put_nowait("second")
+
+
+def test_block_waits_for_the_consumer():
+    async def run():
+        q = BudgetedQueue(ByteBudget(1024), maxsize=1, policy=BLOCK)
+        await q.put("first")
+        waiting = asyncio.ensure_future(q.put("second"))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        assert q.get_nowait() == "first"
+        assert await waiting
+        assert q.stats["blocked"] == 1
+    asyncio.run(run())
+
+
+def test_coalesce_merges_text_but_not_markers():
+    async def run():
+        q = BudgetedQueue(ByteBudget(1024), maxsize=1, policy=COALESCE)
+        await q.put("Hello")
+        await q.put(", world")
+        assert list(q._queue) == ["Hello, world"]
+        assert q.stats["coalesced"] == 1
+        assert not q._coalesce(None)
+    asyncio.run(run())
+
+
+def test_budget_eviction_only_for_drop_oldest():
+    budget = ByteBudget(10)
+    turns = BudgetedQueue(budget, maxsize=8, policy=BLOCK)
+    text = BudgetedQueue(budget, maxsize=8, policy=COALESCE)
+    frames = BudgetedQueue(budget, maxsize=8, policy=DROP_OLDEST)
+    assert turns.put_nowait("abcdef")
+    assert text.put_nowait(None) # End-of-turn markers cost nothing
+    assert not turns.put_nowait("ghijk") # Rejected, and nothing queued was dropped
+    assert list(turns._queue) == ["abcdef"] and list(text._queue) == [None]
+    assert turns.stats["rejected"] == 1
+
+    assert frames.put_nowait(b"1234")
+    assert frames.put_nowait(b"5678") # Makes room by dropping its own oldest frame
+    assert list(frames._queue) == [b"5678"]
+    assert budget.used == 10
+
+
+def test_budget_released_on_get():
+    budget = ByteBudget(100)
+    q = BudgetedQueue(budget, maxsize=4, policy=BLOCK)
+    q.put_nowait(b"x" * 40)
+    assert budget.used == 40
+    q.get_nowait()
+    assert budget.used == 0
+    assert budget.high_water == 40
+
+
+def test_history_round_trip_keeps_newest_text_turns():
+    turns = [("user", f"question {i}") for i in range(5)] + [("model", "")]
+    blob = compact_history(turns, max_turns=3)
+    assert restore_history(blob) == [("user", "question 2"), ("user", "question 3"), ("user", "question 4")]
+    assert restore_history(None) == []
@@ -0,0 +1,89 @@
+# server/wire_codec.py
+import base64
+import os
+import zlib
+
+try:
+    import msgpack # Optional, compact binary encoding for clients that support it
+except ImportError:
+    msgpack = None
+
+WIRE_CODEC = os.getenv("WIRE_CODEC", "auto")                                   # "auto" honours the client's offer; "json" forces JSON
+WIRE_COMPRESS_MIN_BYTES = int(os.getenv("WIRE_COMPRESS_MIN_BYTES", "1024"))   # Smaller packets are never compressed
+WIRE_COMPRESS_LEVEL = 1           # Fast zlib level; large payloads are mostly text and compress well anyway
+WIRE_COMPRESS_MIN_SAVING = 0.1    # Keep the compressed form only if it is at least 10% smaller
+
+# First byte of every msgpack packet
+PACKET_PLAIN = 0x00
+PACKET_DEFLATE = 0x01 # zlib stream follows
+
+
+def _base64_bytes(value):
+    """ JSON cannot carry bytes, so raw payloads (e.g. PCM audio) go out as base64 strings. """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode("utf-8")
+    if isinstance(value, dict):
+        return {k: _base64_bytes(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_base64_bytes(v) for v in value]
+    return value
+
+
+class JsonCodec:
+    """ The default Socket.IO encoding: plain dicts, bytes as base64 strings. """
+
+    name = "json"
+
+    def encode(self, data):
+        return _base64_bytes(data)
+
+
+class MsgpackCodec:
+    """
+    Packs each event payload with MessagePack into one binary attachment, so
+    bytes travel raw instead of as base64. Packets of at least min_bytes are
+    zlib-compressed when that actually saves space (search results do, PCM
+    audio does not). The first byte says which form follows.
+    """
+
+    name = "msgpack"
+
+    def __init__(self, min_bytes: int = WIRE_COMPRESS_MIN_BYTES):
+        self.min_bytes = min_bytes
+        self.stats = {"packets": 0, "compressed": 0, "raw_bytes": 0, "wire_bytes": 0}
+
+    def encode(self, data) -> bytes:
+        packed = msgpack.packb(data, use_bin_type=True)
+        packet = bytes((PACKET_PLAIN,)) + packed
+        if len(packed) >= self.min_bytes:
+            deflated = zlib.compress(packed, WIRE_COMPRESS_LEVEL)
+            if len(deflated) <= len(packed) * (1 - WIRE_COMPRESS_MIN_SAVING):
+                packet = bytes((PACKET_DEFLATE,)) + deflated
+                self.stats["compressed"] += 1
+        self.stats["packets"] += 1
+        self.stats["raw_bytes"] += len(packed)
+        self.stats["wire_bytes"] += len(packet)
+        return packet
+
+
+def negotiate(auth) -> str:
+    """
+    Picks the codec for a new connection from the client's offer, sent as
+    Socket.IO auth data: {"codecs": ["msgpack", "json"]} in order of
+    preference. Anything unsupported falls back to JSON.
+    """
+    offered = auth.get("codecs", []) if isinstance(auth, dict) else []
+    if WIRE_CODEC == "json":
+        return "json"
+    for name in offered:
+        if name == "msgpack" and msgpack:
+            return "msgpack"
+        if name == "json":
+            return "json"
+    return "json"
+
+
+def get_codec(name: str):
+    if name == "msgpack" and msgpack:
+        return MsgpackCodec()
+    return JsonCodec()